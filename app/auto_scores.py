@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自动评测分数（eval_result/combined_scores.csv）加载
+
+- load_auto_scores：解析CSV为 {(模型, sample_id): {'semantic', 'temporal', 'motion', 'world'}}
+- cached_auto_scores：按文件 (mtime, size) 缓存（versioned_cache）；CSV被重新生成后下一次调用自动重新加载，
+  评测服务（盲评覆盖层）和 scripts/human_auto_correlation.py 共用
+"""
+
+import csv
+from pathlib import Path
+
+from versioned_cache import cached, file_tag
+
+# CSV列 → 维度名（world 对应人工评分的 realism）
+AUTO_COLUMNS = (('S_base', 'semantic'), ('S_event', 'temporal'), ('S_motion', 'motion'), ('S_world', 'world'))
+
+MODEL_ALIASES = {
+    'cogfun': 'cogfun',
+    'cogvideo_5b': 'cogvideo_5b',
+    'cogvideo5b': 'cogvideo_5b',
+    'videocrafter': 'videocrafter',
+    'crafter': 'videocrafter',
+    'sora': 'sora',
+    'wan21': 'wan21',
+    'kling': 'kling',
+    'jimeng': 'jimeng',
+    'opensora': 'opensora',
+}
+
+
+def canonical_model(name, aliases=MODEL_ALIASES):
+    return aliases.get(name, name)
+
+
+def _safe_float(val):
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return None
+
+
+def load_auto_scores(csv_path, aliases=MODEL_ALIASES) -> dict:
+    """解析自动评测CSV，文件不存在时返回空字典"""
+    lookup: dict[tuple[str, str], dict[str, float | None]] = {}
+    csv_path = Path(csv_path)
+    if not csv_path.exists():
+        return lookup
+    with csv_path.open('r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            model = row.get('modelname')
+            clip_id = row.get('ID')
+            if not model or not clip_id:
+                continue
+            entry = lookup.setdefault(
+                (canonical_model(model, aliases), clip_id),
+                {'semantic': None, 'temporal': None, 'motion': None, 'world': None}
+            )
+            for src_key, dst_key in AUTO_COLUMNS:
+                value = _safe_float(row.get(src_key))
+                if value is not None:
+                    entry[dst_key] = value
+    return lookup
+
+
+@cached(lambda csv_path, aliases=MODEL_ALIASES: file_tag(csv_path),
+        key=lambda csv_path, aliases=MODEL_ALIASES: str(csv_path), name='auto_scores')
+def cached_auto_scores(csv_path, aliases=MODEL_ALIASES) -> dict:
+    """按 (路径, mtime, size) 缓存的 load_auto_scores；每次调用只做一次 stat"""
+    return load_auto_scores(csv_path, aliases)
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite 慢查询日志（评测页面、监控、导出和维护工具共用的连接入口）
+
+- connect(db, source=...)：AIV_SQL_TRACE=1 时返回带计时的连接，否则就是普通的 sqlite3.connect
+- 计时方式：set_trace_callback 标记每条语句开始（含隐式 BEGIN/COMMIT、executescript 中的各条），
+  连接/游标的 execute*/fetch*/commit 调用内的时间计入当前语句；
+  进度回调（每 AIV_SQL_PROGRESS_OPS 条VM指令一次）记录VM的推进，调用内最长的“无进展”间隔
+  即为等待时间——多为 busy_timeout 等锁（也可能是提交时的磁盘同步）
+- 超过 AIV_SLOW_MS（默认100ms）或等待超过 AIV_BUSY_MS（默认20ms）的语句写入
+  logs/slow_queries.jsonl（AIV_SQL_LOG 可修改），记录归一化SQL（字面量→?）和参数形状；
+  另每30秒写一条 stats 记录（各语句的调用次数/总耗时增量），供 tools/slow_query_report.py 汇总
+
+用法：
+    from db_trace import connect
+    conn = connect(DB_PATH, source='monitor', timeout=10.0)
+"""
+
+import atexit
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+ENABLED = os.getenv('AIV_SQL_TRACE', '0') == '1'
+SLOW_MS = float(os.getenv('AIV_SLOW_MS', '100'))
+BUSY_MS = float(os.getenv('AIV_BUSY_MS', '20'))
+PROGRESS_OPS = int(os.getenv('AIV_SQL_PROGRESS_OPS', '1000'))
+LOG_PATH = Path(os.getenv('AIV_SQL_LOG') or PROJECT_ROOT / 'logs' / 'slow_queries.jsonl')
+STATS_INTERVAL = 30.0
+
+_TXN_HEADS = ('BEGIN', 'COMMIT', 'END', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+
+_RE_SPACE = re.compile(r'\s+')
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b')
+_RE_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_RE_ROWS = re.compile(r'(\(\?, \.\.\.\)|\(\?\))(?:\s*,\s*\1)+')
+
+_lock = threading.Lock()
+_stats = {}  # (source, sql) -> [calls, total_ms, max_ms, wait_ms, slow, shape]
+_last_stats = time.time()
+
+
+@lru_cache(maxsize=4096)
+def normalize_sql(sql):
+    """归一化SQL：压缩空白，字面量替换为 ?，IN 列表/多行 VALUES 折叠"""
+    s = _RE_SPACE.sub(' ', sql).strip().rstrip(';')
+    s = _RE_STRING.sub('?', s)
+    s = _RE_NUMBER.sub('?', s)
+    s = _RE_LIST.sub('(?, ...)', s)
+    s = _RE_ROWS.sub(r'\1, ...', s)
+    return s[:500]
+
+
+def _type_name(v):
+    if v is None:
+        return 'null'
+    if isinstance(v, (bool, int)):
+        return 'int'
+    if isinstance(v, float):
+        return 'real'
+    if isinstance(v, str):
+        return 'text'
+    if isinstance(v, (bytes, bytearray, memoryview)):
+        return 'blob'
+    return type(v).__name__
+
+
+def param_shape(params):
+    """参数形状（只记类型不记取值）：(int,text)、{uid:text}、(500×int)、many[1000](int,int)"""
+    if params is None:
+        return ''
+    if isinstance(params, tuple) and params and params[0] == '__many__':
+        _, n, first = params
+        return f"many[{n if n is not None else '?'}]" + (param_shape(first) if first is not None else '')
+    if isinstance(params, dict):
+        return '{' + ','.join(f'{k}:{_type_name(v)}' for k, v in params.items()) + '}'
+    try:
+        names = [_type_name(v) for v in params]
+    except TypeError:
+        return type(params).__name__
+    if len(names) > 8 and len(set(names)) == 1:
+        return f'({len(names)}×{names[0]})'
+    return '(' + ','.join(names) + ')'
+
+
+def _write(record):
+    try:
+        LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(LOG_PATH, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    except OSError:
+        # 日志只是诊断信息，写盘失败不能影响业务
+        pass
+
+
+def flush_stats():
+    """写出自上次以来各语句的累计（增量）并清零"""
+    global _last_stats
+    with _lock:
+        items = list(_stats.items())
+        _stats.clear()
+        _last_stats = time.time()
+    if not items:
+        return
+    by_source = {}
+    for (source, sql), (calls, total, mx, wait, slow, shape) in items:
+        by_source.setdefault(source, []).append({
+            'sql': sql, 'shape': shape, 'calls': calls, 'total_ms': round(total, 3),
+            'max_ms': round(mx, 3), 'wait_ms': round(wait, 3), 'slow': slow,
+        })
+    for source, statements in by_source.items():
+        _write({'type': 'stats', 'ts': round(time.time(), 3), 'source': source,
+                'pid': os.getpid(), 'statements': statements})
+
+
+class _Stmt:
+    __slots__ = ('sql', 'params', 'active', 'wait', 'error')
+
+    def __init__(self, sql, params):
+        self.sql = sql
+        self.params = params
+        self.active = 0.0
+        self.wait = 0.0
+        self.error = None
+
+
+class TracedCursor(sqlite3.Cursor):
+    """游标：execute*/fetch* 的耗时计入其语句"""
+
+    _stmt = None
+
+    def execute(self, sql, parameters=()):
+        conn = self.connection
+        conn._enter(sql, parameters)
+        try:
+            return super().execute(sql, parameters)
+        except sqlite3.Error as e:
+            conn._fail(e)
+            raise
+        finally:
+            self._stmt = conn._stmt
+            conn._leave(self.description is None)
+
+    def executemany(self, sql, seq_of_parameters):
+        conn = self.connection
+        if isinstance(seq_of_parameters, (list, tuple)):
+            many = ('__many__', len(seq_of_parameters), seq_of_parameters[0] if seq_of_parameters else None)
+        else:
+            many = ('__many__', None, None)
+        conn._enter(sql, many)
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        except sqlite3.Error as e:
+            conn._fail(e)
+            raise
+        finally:
+            conn._leave(True)
+
+    def executescript(self, sql_script):
+        conn = self.connection
+        conn._enter(None, None)
+        try:
+            return super().executescript(sql_script)
+        except sqlite3.Error as e:
+            conn._fail(e)
+            raise
+        finally:
+            conn._leave(True)
+
+    def _fetch(self, fn, *args):
+        conn = self.connection
+        if self._stmt is None or self._stmt is not conn._stmt:
+            # 同一连接上其他语句已开始（交错使用多个游标），不再计时
+            return fn(*args)
+        conn._resume()
+        done = True
+        try:
+            res = fn(*args)
+            done = res is None or res == []
+            return res
+        finally:
+            conn._leave(done)
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        conn = self.connection
+        if self._stmt is None or self._stmt is not conn._stmt:
+            return super().fetchall()
+        conn._resume()
+        try:
+            return super().fetchall()
+        finally:
+            conn._leave(True)
+
+    def __next__(self):
+        conn = self.connection
+        if self._stmt is None or self._stmt is not conn._stmt:
+            return super().__next__()
+        conn._resume()
+        done = True
+        try:
+            row = super().__next__()
+            done = False
+            return row
+        finally:
+            conn._leave(done)
+
+
+class TracedConnection(sqlite3.Connection):
+    """连接：trace 回调切分语句，进度回调测量调用内的等待"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.source = 'default'
+        self.db_name = Path(str(args[0]) if args else str(kwargs.get('database', ''))).name
+        self._stmt = None
+        self._seg = None      # 当前调用段的开始时间（不在调用内时为 None）
+        self._tick = 0.0      # 最近一次VM有进展的时间
+        self._gap = 0.0       # 本段内最长的无进展间隔
+        self._fresh = False   # 本次调用尚未出现语句
+        self._call_sql = None
+        self._call_params = None
+        self.set_trace_callback(self._on_trace)
+        self.set_progress_handler(self._on_progress, PROGRESS_OPS)
+
+    # ---- 回调 ----
+    def _on_trace(self, text):
+        now = time.perf_counter()
+        head = text.lstrip()[:9].upper()
+        if head.startswith(_TXN_HEADS) or self._call_sql is None:
+            sql = text
+        else:
+            sql = self._call_sql
+        cur = self._stmt
+        if cur is not None and not self._fresh and cur.sql == sql and self._seg is not None:
+            # 触发器子程序 / executemany 的下一行：仍属同一语句
+            return
+        self._fresh = False
+        if self._seg is not None:
+            self._close_segment(now)
+            self._seg = self._tick = now
+            self._gap = 0.0
+        self._finish()
+        self._stmt = _Stmt(sql, self._call_params)
+
+    def _on_progress(self):
+        now = time.perf_counter()
+        gap = now - self._tick
+        if gap > self._gap:
+            self._gap = gap
+        self._tick = now
+        return 0
+
+    # ---- 调用边界 ----
+    def _enter(self, sql, params):
+        self._call_sql = sql
+        self._call_params = params
+        self._fresh = True
+        self._seg = self._tick = time.perf_counter()
+        self._gap = 0.0
+
+    def _resume(self):
+        self._seg = self._tick = time.perf_counter()
+        self._gap = 0.0
+
+    def _leave(self, done):
+        if self._seg is not None:
+            self._close_segment(time.perf_counter())
+            self._seg = None
+        self._call_sql = None
+        if done:
+            self._finish()
+
+    def _fail(self, exc):
+        if self._stmt is not None:
+            self._stmt.error = str(exc)
+
+    def _close_segment(self, now):
+        stmt = self._stmt
+        if stmt is None:
+            return
+        stmt.active += now - self._seg
+        gap = max(self._gap, now - self._tick)
+        if gap * 1000 >= BUSY_MS:
+            stmt.wait += gap
+
+    def _finish(self):
+        stmt, self._stmt = self._stmt, None
+        if stmt is None:
+            return
+        ms = stmt.active * 1000
+        wait_ms = stmt.wait * 1000
+        sql = normalize_sql(stmt.sql)
+        slow = ms >= SLOW_MS or wait_ms >= BUSY_MS or stmt.error is not None
+        shape = param_shape(stmt.params) if slow else None
+        with _lock:
+            s = _stats.get((self.source, sql))
+            if s is None:
+                s = _stats[(self.source, sql)] = [0, 0.0, 0.0, 0.0, 0, None]
+            s[0] += 1
+            s[1] += ms
+            if ms > s[2]:
+                s[2] = ms
+            s[3] += wait_ms
+            if slow:
+                s[4] += 1
+                s[5] = shape
+            due = time.time() - _last_stats >= STATS_INTERVAL
+        if slow:
+            record = {'type': 'slow', 'ts': round(time.time(), 3), 'source': self.source,
+                      'db': self.db_name, 'pid': os.getpid(), 'thread': threading.current_thread().name,
+                      'ms': round(ms, 3), 'wait_ms': round(wait_ms, 3), 'sql': sql, 'shape': shape}
+            if stmt.error is not None:
+                record['error'] = stmt.error
+            _write(record)
+        if due:
+            flush_stats()
+
+    # ---- 连接级接口 ----
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        cur = self.cursor()
+        cur.execute(sql, parameters)
+        return cur
+
+    def executemany(self, sql, seq_of_parameters):
+        cur = self.cursor()
+        cur.executemany(sql, seq_of_parameters)
+        return cur
+
+    def executescript(self, sql_script):
+        cur = self.cursor()
+        cur.executescript(sql_script)
+        return cur
+
+    def commit(self):
+        self._enter(None, None)
+        try:
+            super().commit()
+        finally:
+            self._leave(True)
+
+    def rollback(self):
+        self._enter(None, None)
+        try:
+            super().rollback()
+        finally:
+            self._leave(True)
+
+    def __exit__(self, exc_type, exc, tb):
+        # with conn: 走 Python 层的 commit/rollback，提交耗时同样计入
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def close(self):
+        self._finish()
+        super().close()
+
+
+def connect(database, source=None, **kwargs):
+    """sqlite3.connect 的替代：开启 AIV_SQL_TRACE 时记录慢查询，source 标明调用方（评测页面/监控/导出…）"""
+    if not ENABLED:
+        return sqlite3.connect(database, **kwargs)
+    conn = sqlite3.connect(database, factory=TracedConnection, **kwargs)
+    conn.source = source or Path(sys.argv[0]).stem or 'python'
+    return conn
+
+
+if ENABLED:
+    atexit.register(flush_stats)
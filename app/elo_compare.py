@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+比较评测模式 - 实时Elo排行榜
+
+每次提交比较结果时，在同一个事务里对整体（scope='ALL'）和该任务所属类别各做一次Elo更新，
+每次只读写两行 model_elo，开销与已有评测数量无关；管理员随时可以查询排行榜，无需导出。
+
+- model_elo：每个 (scope, model_name) 一行，保存当前评分和胜/平/负计数
+- elo_log：每条评测在每个scope上施加的评分变化；重判（删除后重新提交）时按记录精确撤销，
+  评分总和始终守恒
+
+Elo与提交顺序有关，与 scripts/rank_models_compare.py 的 Bradley–Terry 拟合不完全相同；
+需要与历史数据严格一致时可运行 scripts/elo_leaderboard_compare.py --rebuild 按时间顺序重放。
+"""
+
+import threading
+from datetime import datetime
+
+OVERALL = 'ALL'
+INITIAL_RATING = 1000.0
+ELO_K = 16.0
+
+ELO_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS model_elo (
+        scope TEXT NOT NULL,                -- 'ALL' 或类别名
+        model_name TEXT NOT NULL,
+        rating REAL NOT NULL DEFAULT 1000,
+        wins INTEGER NOT NULL DEFAULT 0,
+        ties INTEGER NOT NULL DEFAULT 0,
+        losses INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP,
+        PRIMARY KEY (scope, model_name)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS elo_log (
+        comparison_id INTEGER NOT NULL,
+        scope TEXT NOT NULL,
+        model_a TEXT NOT NULL,
+        model_b TEXT NOT NULL,
+        score_a REAL NOT NULL,              -- 1=A胜，0=B胜，0.5=平局
+        delta REAL NOT NULL,                -- model_a 的评分变化（model_b 为其相反数）
+        PRIMARY KEY (comparison_id, scope)
+    ) WITHOUT ROWID
+    """,
+]
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+def expected_score(rating_a, rating_b):
+    """A对B的期望得分"""
+    return 1.0 / (1.0 + 10 ** ((rating_b - rating_a) / 400.0))
+
+
+def outcome_score(model_a, model_b, chosen_model):
+    """chosen_model → A的实际得分"""
+    if chosen_model == model_a:
+        return 1.0
+    if chosen_model == model_b:
+        return 0.0
+    return 0.5
+
+
+def _counter_columns(score_a):
+    """A、B各自需要累加的计数列"""
+    if score_a == 1.0:
+        return 'wins', 'losses'
+    if score_a == 0.0:
+        return 'losses', 'wins'
+    return 'ties', 'ties'
+
+
+def ensure_elo_schema(conn, db_key=None):
+    """建表（每个数据库每个进程只检查一次）；排行榜为空而已有评测时（旧库/导入数据）按历史回填"""
+    if db_key is not None and db_key in _schema_ready:
+        return
+    with _schema_lock:
+        if db_key is not None and db_key in _schema_ready:
+            return
+        for sql in ELO_SCHEMA:
+            conn.execute(sql)
+        conn.commit()
+        if (not conn.execute("SELECT 1 FROM model_elo LIMIT 1").fetchone()
+                and conn.execute("SELECT 1 FROM comparisons LIMIT 1").fetchone()):
+            rebuild_elo(conn)
+        if db_key is not None:
+            _schema_ready.add(db_key)
+
+
+def _rating(conn, scope, model_name):
+    row = conn.execute(
+        "SELECT rating FROM model_elo WHERE scope = ? AND model_name = ?", (scope, model_name)
+    ).fetchone()
+    return row[0] if row else INITIAL_RATING
+
+
+def _add(conn, scope, model_name, delta, counter, step, now):
+    conn.execute(f"""
+        INSERT INTO model_elo (scope, model_name, rating, {counter}, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(scope, model_name) DO UPDATE SET
+            rating = rating + ?,
+            {counter} = {counter} + ?,
+            updated_at = excluded.updated_at
+    """, (scope, model_name, INITIAL_RATING + delta, max(step, 0), now, delta, step))
+
+
+def apply_comparison(conn, comparison_id, model_a, model_b, category, chosen_model):
+    """在调用方的事务中为一条新评测更新整体和类别Elo（不提交）"""
+    score_a = outcome_score(model_a, model_b, chosen_model)
+    counter_a, counter_b = _counter_columns(score_a)
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    for scope in (OVERALL, category):
+        if scope is None:
+            continue
+        rating_a = _rating(conn, scope, model_a)
+        rating_b = _rating(conn, scope, model_b)
+        delta = ELO_K * (score_a - expected_score(rating_a, rating_b))
+        _add(conn, scope, model_a, delta, counter_a, 1, now)
+        _add(conn, scope, model_b, -delta, counter_b, 1, now)
+        conn.execute("""
+            INSERT OR REPLACE INTO elo_log (comparison_id, scope, model_a, model_b, score_a, delta)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (comparison_id, scope, model_a, model_b, score_a, delta))
+
+
+def revert_comparison(conn, comparison_id):
+    """在调用方的事务中撤销一条评测施加过的Elo变化（不提交）"""
+    logs = conn.execute(
+        "SELECT scope, model_a, model_b, score_a, delta FROM elo_log WHERE comparison_id = ?",
+        (comparison_id,)
+    ).fetchall()
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    for scope, model_a, model_b, score_a, delta in logs:
+        counter_a, counter_b = _counter_columns(score_a)
+        _add(conn, scope, model_a, -delta, counter_a, -1, now)
+        _add(conn, scope, model_b, delta, counter_b, -1, now)
+    conn.execute("DELETE FROM elo_log WHERE comparison_id = ?", (comparison_id,))
+
+
+def rebuild_elo(conn):
+    """清空并按 rating_time 顺序重放全部评测（在内存中计算后批量写入），返回重放条数"""
+    # 先拿写锁再读，避免重放期间新提交的评测被随后的DELETE抹掉
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    rows = conn.execute("""
+        SELECT c.comparison_id, t.model_a, t.model_b, p.category, c.chosen_model, c.rating_time
+        FROM comparisons c
+        JOIN tasks t ON c.task_id = t.task_id
+        LEFT JOIN prompts p ON t.sample_id = p.sample_id
+        ORDER BY c.rating_time, c.comparison_id
+    """).fetchall()
+
+    ratings = {}
+    counts = {}
+    updated = {}
+    logs = []
+    for comparison_id, model_a, model_b, category, chosen_model, rating_time in rows:
+        score_a = outcome_score(model_a, model_b, chosen_model)
+        counter_a, counter_b = _counter_columns(score_a)
+        for scope in (OVERALL, category):
+            if scope is None:
+                continue
+            key_a, key_b = (scope, model_a), (scope, model_b)
+            rating_a = ratings.get(key_a, INITIAL_RATING)
+            rating_b = ratings.get(key_b, INITIAL_RATING)
+            delta = ELO_K * (score_a - expected_score(rating_a, rating_b))
+            ratings[key_a] = rating_a + delta
+            ratings[key_b] = rating_b - delta
+            for key, counter in ((key_a, counter_a), (key_b, counter_b)):
+                c = counts.setdefault(key, {'wins': 0, 'ties': 0, 'losses': 0})
+                c[counter] += 1
+                updated[key] = rating_time
+            logs.append((comparison_id, scope, model_a, model_b, score_a, delta))
+
+    conn.execute("DELETE FROM model_elo")
+    conn.execute("DELETE FROM elo_log")
+    conn.executemany("""
+        INSERT INTO model_elo (scope, model_name, rating, wins, ties, losses, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [(scope, model, rating, counts[(scope, model)]['wins'], counts[(scope, model)]['ties'],
+           counts[(scope, model)]['losses'], updated[(scope, model)])
+          for (scope, model), rating in ratings.items()])
+    conn.executemany("""
+        INSERT INTO elo_log (comparison_id, scope, model_a, model_b, score_a, delta)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, logs)
+    conn.commit()
+    return len(rows)
+
+
+def leaderboard(conn, scope=OVERALL):
+    """返回排行榜 [(model_name, rating, wins, ties, losses, updated_at), ...]（按评分降序）"""
+    return [tuple(row) for row in conn.execute("""
+        SELECT model_name, rating, wins, ties, losses, updated_at
+        FROM model_elo
+        WHERE scope = ?
+        ORDER BY rating DESC
+    """, (scope,))]
+
+
+def scopes(conn):
+    """所有scope（'ALL' 在前，其余为类别）"""
+    rows = [row[0] for row in conn.execute("SELECT DISTINCT scope FROM model_elo ORDER BY scope")]
+    return ([OVERALL] if OVERALL in rows else []) + [s for s in rows if s != OVERALL]
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评审员JSON接口（asyncio + 标准库，无需额外依赖）
+
+每次评测只需一个小请求，不经过Streamlit的整页rerun；Streamlit页面保留给管理员/兼容使用。
+查询逻辑直接复用 app/streamlit_app.py、app/streamlit_app_compare.py 中的函数（按文件加载，不运行页面），
+身份验证与页面相同：打分模式的 uid 为 judges.token，比较模式为 judges.uid。
+
+接口（uid 放在查询参数中，POST 也可放在JSON请求体里）：
+    GET  /api/next?uid=...                 当前任务（含进度）；全部完成时 {"done": true}
+    GET  /api/progress?uid=...             进度
+    POST /api/rating      {"task_id", "scores": {"semantic","motion","temporal","realism"}}   打分模式，返回下一题
+    POST /api/back                         打分模式：返回上一题（保留原评分），返回该题
+    POST /api/comparison  {"task_id", "choice": "A"|"B"|"tie"}                              比较模式，返回下一题
+    GET  /api/history?uid=...&index=0      比较模式：历史任务（0=最近一次），含之前的选择
+    GET  /                                 比较模式的键盘评测页面（app/static/compare_client.html）
+比较模式只返回“视频A/视频B”，不暴露模型名（与页面一致的盲评）。
+
+用法：
+    python app/judge_api.py --mode compare                 # 默认端口 8513
+    python app/judge_api.py --mode scoring --port 8512
+    python app/judge_api.py --mode compare --db /path/to/aiv_compare_v1.db
+    # 评审员打开 http://<IP>:8513/?uid=<uid>
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import io
+import json
+import os
+import sqlite3
+import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+if sys.platform == 'win32' and (sys.stdout.encoding or '').lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+sys.path.insert(0, str(Path(__file__).parent))
+from perf_timing import rerun, step  # noqa: E402
+
+APP_DIR = Path(__file__).parent
+CLIENT_HTML = APP_DIR / 'static' / 'compare_client.html'
+
+APP_FILES = {
+    'scoring': APP_DIR / 'streamlit_app.py',
+    'compare': APP_DIR / 'streamlit_app_compare.py',
+}
+DEFAULT_PORTS = {'scoring': 8512, 'compare': 8513}
+DB_ENV = {'scoring': 'AIV_DB', 'compare': 'AIV_COMPARE_DB'}
+
+MAX_BODY = 64 * 1024
+READ_TIMEOUT = 30
+SCORE_KEYS = ('semantic', 'motion', 'temporal', 'realism')
+SQLITE_INT_MAX = 2 ** 63 - 1
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def load_app(mode):
+    """按文件加载页面脚本以复用其查询函数（__name__ 不是 __main__，页面本身不会运行）"""
+    os.environ.setdefault('STREAMLIT_LOGGER_LEVEL', 'error')
+    spec = importlib.util.spec_from_file_location(f'judge_api_{mode}_app', APP_FILES[mode])
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# ==================== 打分模式 ====================
+
+class ScoringApi:
+    def __init__(self, app):
+        self.app = app
+
+    def _judge(self, conn, uid):
+        row = self.app.judge_by_token(conn, uid)
+        if not row:
+            raise ApiError(HTTPStatus.UNAUTHORIZED, '无效的 token')
+        return row[0]
+
+    def _progress(self, conn, jid):
+        done, total = self.app.progress(conn, jid)
+        return {'done': done, 'total': total}
+
+    def _next(self, conn, jid):
+        nxt = self.app.next_assign(conn, jid)
+        if not nxt:
+            return {'done': True, 'progress': self._progress(conn, jid)}
+        task_id, prompt_id, video_id, prompt_text, ref_path = nxt
+        video = self.app.get_video_info(conn, video_id)
+        if not video:
+            raise ApiError(HTTPStatus.NOT_FOUND, '当前视频不存在，请联系管理员')
+        return {
+            'done': False,
+            'task_id': task_id,
+            'sample_id': prompt_id,
+            'prompt_text': prompt_text,
+            'ref_path': ref_path,
+            'video_path': video['path'],
+            'model_name': video['model_name'] if self.app.SHOW_MODEL else None,
+            'scores': self.app.existing(conn, jid, video_id),
+            'previous_task_id': self.app.previous_assign(conn, jid, task_id),
+            'progress': self._progress(conn, jid),
+        }
+
+    def _video_of(self, conn, jid, task_id):
+        row = conn.execute('''
+            SELECT t.video_id
+              FROM assignments a
+              JOIN tasks t ON a.task_id = t.id
+             WHERE a.judge_id = ? AND a.task_id = ?
+        ''', (jid, task_id)).fetchone()
+        if not row:
+            raise ApiError(HTTPStatus.NOT_FOUND, '任务不存在或未分配给该评审员')
+        return row[0]
+
+    def handle(self, method, path, uid, body, query):
+        conn = self.app.get_conn()
+        try:
+            jid = self._judge(conn, uid)
+            if (method, path) == ('GET', '/api/next'):
+                return self._next(conn, jid)
+            if (method, path) == ('GET', '/api/progress'):
+                return self._progress(conn, jid)
+            if (method, path) == ('POST', '/api/rating'):
+                task_id = _int_field(body, 'task_id')
+                scores = body.get('scores') or {}
+                try:
+                    scores = {k: int(scores[k]) for k in SCORE_KEYS}
+                except (KeyError, TypeError, ValueError, OverflowError):
+                    raise ApiError(HTTPStatus.BAD_REQUEST, f'scores 需包含 {", ".join(SCORE_KEYS)}')
+                if not all(1 <= v <= 5 for v in scores.values()):
+                    raise ApiError(HTTPStatus.BAD_REQUEST, '评分范围为 1–5')
+                video_id = self._video_of(conn, jid, task_id)
+                self.app.save(conn, jid, video_id, scores)
+                self.app.mark_done(conn, jid, task_id)
+                return self._next(conn, jid)
+            if (method, path) == ('POST', '/api/back'):
+                nxt = self.app.next_assign(conn, jid)
+                prev_task_id = self.app.previous_assign(conn, jid, nxt[0]) if nxt else None
+                if not prev_task_id:
+                    raise ApiError(HTTPStatus.CONFLICT, '没有上一题')
+                self.app.mark_undone(conn, jid, prev_task_id)
+                return self._next(conn, jid)
+            raise ApiError(HTTPStatus.NOT_FOUND, f'未知接口: {method} {path}')
+        finally:
+            conn.close()
+
+
+# ==================== 比较模式 ====================
+
+CHOICES = ('A', 'B', 'tie')
+
+
+class CompareApi:
+    def __init__(self, app):
+        self.app = app
+
+    def _judge(self, uid):
+        row = self.app.verify_judge(uid)
+        if not row:
+            raise ApiError(HTTPStatus.UNAUTHORIZED, '无效的访问令牌')
+        return row['judge_id']
+
+    def _progress(self, jid):
+        completed, total = self.app.get_progress(jid)
+        return {'completed': completed, 'total': total}
+
+    def _task(self, task, jid, review=False):
+        base = self.app.VIDEO_SERVER_BASE
+        data = {
+            'done': False,
+            'review': review,
+            'task_id': task['task_id'],
+            'sample_id': task['sample_id'],
+            'category': task['category'],
+            'prompt_text': task['prompt_text'],
+            'ref_url': f"{base}/{task['ref_video_path']}",
+            'video_a_url': f"{base}/{task['video_a_path']}",
+            'video_b_url': f"{base}/{task['video_b_path']}",
+            'history_count': self.app.get_completed_count(jid),
+            'progress': self._progress(jid),
+        }
+        if review:
+            chosen = task['chosen_model']
+            data['previous_choice'] = ('A' if chosen == task['model_a'] else
+                                       'B' if chosen == task['model_b'] else 'tie')
+        return data
+
+    def _next(self, jid):
+        task = self.app.get_current_task(jid)
+        if not task:
+            return {'done': True, 'history_count': self.app.get_completed_count(jid),
+                    'progress': self._progress(jid)}
+        return self._task(task, jid)
+
+    def _models_of(self, jid, task_id):
+        conn = self.app.get_db_connection()
+        try:
+            row = conn.execute('''
+                SELECT t.model_a, t.model_b,
+                       EXISTS (SELECT 1 FROM comparisons c WHERE c.task_id = t.task_id AND c.judge_id = a.judge_id)
+                  FROM assignments a
+                  JOIN tasks t ON a.task_id = t.task_id
+                 WHERE a.judge_id = ? AND a.task_id = ?
+            ''', (jid, task_id)).fetchone()
+        finally:
+            conn.close()
+        if not row:
+            raise ApiError(HTTPStatus.NOT_FOUND, '任务不存在或未分配给该评审员')
+        return row[0], row[1], bool(row[2])
+
+    def handle(self, method, path, uid, body, query):
+        jid = self._judge(uid)
+        if (method, path) == ('GET', '/api/next'):
+            return self._next(jid)
+        if (method, path) == ('GET', '/api/progress'):
+            return self._progress(jid)
+        if (method, path) == ('GET', '/api/history'):
+            index = _int_value(query.get('index', '0'), 'index', minimum=0)
+            task = self.app.get_history_task(jid, index)
+            if not task:
+                raise ApiError(HTTPStatus.NOT_FOUND, '没有更多历史任务了')
+            return self._task(task, jid, review=True)
+        if (method, path) == ('POST', '/api/comparison'):
+            task_id = _int_field(body, 'task_id')
+            choice = body.get('choice')
+            if choice not in CHOICES:
+                raise ApiError(HTTPStatus.BAD_REQUEST, 'choice 必须是 A、B 或 tie')
+            model_a, model_b, judged = self._models_of(jid, task_id)
+            # 已评过的任务即重判：与页面一致，先删除旧记录（同时撤销Elo）
+            if judged:
+                self.app.delete_comparison(task_id, jid)
+            chosen = {'A': model_a, 'B': model_b, 'tie': 'tie'}[choice]
+            if not self.app.submit_comparison(task_id, jid, chosen, str(body.get('comment') or '')):
+                raise ApiError(HTTPStatus.CONFLICT, '提交失败（可能已提交过）')
+            return self._next(jid)
+        raise ApiError(HTTPStatus.NOT_FOUND, f'未知接口: {method} {path}')
+
+
+API_CLASSES = {'scoring': ScoringApi, 'compare': CompareApi}
+
+
+def _int_value(raw, name, minimum=1):
+    """解析整数参数并限制在 [minimum, SQLite INTEGER 上限] 内，超出范围的值不会传到 sqlite3 绑定"""
+    try:
+        value = int(raw)
+    except (TypeError, ValueError, OverflowError):
+        raise ApiError(HTTPStatus.BAD_REQUEST, f'{name} 必须是整数')
+    if not minimum <= value <= SQLITE_INT_MAX:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f'{name} 超出范围')
+    return value
+
+
+def _int_field(body, name):
+    if name not in body:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f'缺少整数字段 {name}')
+    return _int_value(body[name], name)
+
+
+# ==================== HTTP ====================
+
+def _response(status, body, content_type='application/json; charset=utf-8', keep_alive=True):
+    head = [
+        f'HTTP/1.1 {status.value} {status.phrase}',
+        f'Content-Type: {content_type}',
+        f'Content-Length: {len(body)}',
+        'Cache-Control: no-store',
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    return ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body
+
+
+def _json(status, data, keep_alive=True):
+    return _response(status, json.dumps(data, ensure_ascii=False).encode('utf-8'), keep_alive=keep_alive)
+
+
+class JudgeApiServer:
+    def __init__(self, mode, workers=8):
+        self.mode = mode
+        self.api = API_CLASSES[mode](load_app(mode))
+        # SQLite 调用是阻塞的，放到线程池中执行，事件循环只负责收发
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='judge_api')
+
+    def dispatch(self, method, target, body):
+        """在工作线程中执行：解析参数、调用查询函数，返回 (状态码, JSON)"""
+        url = urlsplit(target)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        with rerun(f'api_{self.mode}'), step(f'api {method} {url.path}'):
+            try:
+                if body:
+                    try:
+                        body = json.loads(body)
+                    except ValueError:
+                        raise ApiError(HTTPStatus.BAD_REQUEST, '请求体不是有效的JSON')
+                    if not isinstance(body, dict):
+                        raise ApiError(HTTPStatus.BAD_REQUEST, '请求体必须是JSON对象')
+                else:
+                    body = {}
+                uid = query.get('uid') or body.get('uid')
+                if not uid:
+                    raise ApiError(HTTPStatus.UNAUTHORIZED, '缺少 uid 参数')
+                return HTTPStatus.OK, self.api.handle(method, url.path, uid, body, query)
+            except ApiError as e:
+                return e.status, {'error': e.message}
+            except sqlite3.OperationalError as e:
+                # database is locked 等，客户端可重试
+                return HTTPStatus.SERVICE_UNAVAILABLE, {'error': f'数据库繁忙：{e}'}
+            except Exception:
+                # 未预料的错误：记录堆栈，仍给客户端一个JSON响应，连接保持可用
+                print(f"❌ {method} {target} 处理失败：", file=sys.stderr)
+                traceback.print_exc()
+                return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': '服务器内部错误'}
+
+    async def handle_client(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), READ_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, asyncio.LimitOverrunError):
+                    break
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ', 2)
+                except ValueError:
+                    writer.write(_json(HTTPStatus.BAD_REQUEST, {'error': '无效的请求行'}, keep_alive=False))
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and version.upper() == 'HTTP/1.1')
+
+                try:
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    writer.write(_json(HTTPStatus.BAD_REQUEST, {'error': '无效的 Content-Length'}, keep_alive=False))
+                    break
+                if length > MAX_BODY:
+                    writer.write(_json(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {'error': '请求体过大'}, keep_alive=False))
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                if method == 'GET' and urlsplit(target).path in ('/', '/index.html'):
+                    if self.mode != 'compare' or not CLIENT_HTML.exists():
+                        response = _json(HTTPStatus.NOT_FOUND, {'error': '该模式没有评测页面'}, keep_alive)
+                    else:
+                        response = _response(HTTPStatus.OK, CLIENT_HTML.read_bytes(),
+                                             'text/html; charset=utf-8', keep_alive)
+                elif method in ('GET', 'POST'):
+                    status, data = await loop.run_in_executor(self.executor, self.dispatch, method, target, body)
+                    response = _json(status, data, keep_alive)
+                else:
+                    response = _json(HTTPStatus.METHOD_NOT_ALLOWED, {'error': f'不支持 {method}'}, keep_alive)
+
+                writer.write(response)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        print(f"✅ 评审员接口已启动（{self.mode}模式）: http://{host}:{port}/api/next?uid=<uid>")
+        if self.mode == 'compare':
+            print(f"   键盘评测页面: http://{host}:{port}/?uid=<uid>")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    ap = argparse.ArgumentParser(description='评审员JSON接口（asyncio）')
+    ap.add_argument('--mode', choices=sorted(API_CLASSES), default='compare', help='评测模式')
+    ap.add_argument('--host', default='0.0.0.0')
+    ap.add_argument('--port', type=int, default=None, help='端口（默认 打分8512 / 比较8513）')
+    ap.add_argument('--workers', type=int, default=8, help='数据库工作线程数')
+    ap.add_argument('--db', default=None, help='数据库路径（默认与对应页面相同）')
+    args = ap.parse_args()
+
+    if args.db:
+        os.environ[DB_ENV[args.mode]] = str(Path(args.db).resolve())
+
+    server = JudgeApiServer(args.mode, args.workers)
+    try:
+        asyncio.run(server.serve(args.host, args.port or DEFAULT_PORTS[args.mode]))
+    except KeyboardInterrupt:
+        print("\n已停止")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评测页面热路径计时（每次rerun按步骤记录耗时）
+
+- AIV_TIMING=1 开启；未开启时 timed() 原样返回函数、step() 返回共享的空上下文，几乎零开销
+- rerun(app)：包住一次脚本执行；同一rerun内同名步骤累加后记一次，另记 rerun_total
+- 汇总为固定桶直方图（进程内，多会话线程共享，加锁），rerun结束时按间隔落盘：
+    logs/timing/timing_<app>.json   — 直方图 + 最近若干次rerun的分步明细
+    logs/timing/timing_<app>.prom   — Prometheus 文本格式（node_exporter textfile 可直接采集）
+- AIV_TIMING_DIR 修改输出目录，AIV_TIMING_FLUSH 修改落盘间隔（秒，默认5）
+
+用法：
+    from perf_timing import timed, step, rerun
+
+    @timed('db.progress')
+    def progress(conn, j): ...
+
+    with rerun('scoring'):
+        with step('vbox'):
+            ...
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+ENABLED = os.getenv('AIV_TIMING', '0') == '1'
+OUT_DIR = Path(os.getenv('AIV_TIMING_DIR') or PROJECT_ROOT / 'logs' / 'timing')
+FLUSH_INTERVAL = float(os.getenv('AIV_TIMING_FLUSH', '5'))
+
+# 直方图桶上界（秒），与 Prometheus 默认桶一致并补充 0.5s 附近的细分（提交后的 sleep）
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.6, 1.0, 2.5, 5.0, 10.0)
+RECENT_RERUNS = 50
+
+_NOOP = nullcontext()
+_lock = threading.Lock()
+_local = threading.local()
+_hists = {}   # (app, step) -> Histogram
+_recent = {}  # app -> deque[dict]
+_last_flush = {}
+
+
+class Histogram:
+    __slots__ = ('counts', 'count', 'sum', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        i = 0
+        while i < len(BUCKETS) and seconds > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """按桶上界估计分位数（落在+Inf桶时返回观测最大值）"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        acc = 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= target:
+                return BUCKETS[i] if i < len(BUCKETS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else 0.0,
+            'max': round(self.max, 6),
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'buckets': dict(zip([str(b) for b in BUCKETS] + ['+Inf'], self.counts)),
+        }
+
+
+def _hist(app, name):
+    # 调用方需持有 _lock
+    h = _hists.get((app, name))
+    if h is None:
+        h = _hists[(app, name)] = Histogram()
+    return h
+
+
+def _observe(app, name, seconds):
+    with _lock:
+        _hist(app, name).observe(seconds)
+
+
+def _add(name, seconds):
+    steps = getattr(_local, 'steps', None)
+    if steps is None:
+        # 不在 rerun() 内（如模块导入阶段），直接计入
+        _observe(getattr(_local, 'app', 'default'), name, seconds)
+    else:
+        steps[name] = steps.get(name, 0.0) + seconds
+
+
+@contextmanager
+def _step(name):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _add(name, time.perf_counter() - t0)
+
+
+def step(name):
+    """计时一个代码块；未开启时返回共享空上下文"""
+    return _step(name) if ENABLED else _NOOP
+
+
+def timed(name):
+    """计时一个函数；未开启时原样返回函数本身"""
+    def deco(fn):
+        if not ENABLED:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _add(name, time.perf_counter() - t0)
+        return wrapper
+    return deco
+
+
+@contextmanager
+def _rerun(app):
+    _local.app = app
+    _local.steps = steps = {}
+    t0 = time.perf_counter()
+    try:
+        # st.rerun()/st.stop() 以异常方式结束脚本，同样要记录
+        yield
+    finally:
+        total = time.perf_counter() - t0
+        _local.steps = None
+        now = time.time()
+        with _lock:
+            for name, seconds in steps.items():
+                _hist(app, name).observe(seconds)
+            _hist(app, 'rerun_total').observe(total)
+            recent = _recent.get(app)
+            if recent is None:
+                recent = _recent[app] = deque(maxlen=RECENT_RERUNS)
+            recent.append({
+                'ts': round(now, 3),
+                'total': round(total, 6),
+                'steps': {k: round(v, 6) for k, v in steps.items()},
+            })
+            due = now - _last_flush.get(app, 0.0) >= FLUSH_INTERVAL
+            if due:
+                _last_flush[app] = now
+        if due:
+            flush(app)
+
+
+def rerun(app):
+    """包住一次完整的脚本执行（一次rerun）"""
+    return _rerun(app) if ENABLED else _NOOP
+
+
+def snapshot(app):
+    with _lock:
+        steps = {name: h.to_dict() for (a, name), h in sorted(_hists.items()) if a == app}
+        recent = list(_recent.get(app, ()))
+    return {'app': app, 'pid': os.getpid(), 'generated_at': round(time.time(), 3),
+            'buckets': list(BUCKETS), 'steps': steps, 'recent': recent}
+
+
+def prometheus_text(app):
+    lines = [
+        '# HELP aiv_step_seconds Per-rerun duration of named hot-path steps.',
+        '# TYPE aiv_step_seconds histogram',
+    ]
+    with _lock:
+        items = [(name, h.counts[:], h.count, h.sum) for (a, name), h in sorted(_hists.items()) if a == app]
+    for name, counts, count, total in items:
+        labels = f'app="{app}",step="{name}"'
+        acc = 0
+        for le, c in zip([str(b) for b in BUCKETS] + ['+Inf'], counts):
+            acc += c
+            lines.append(f'aiv_step_seconds_bucket{{{labels},le="{le}"}} {acc}')
+        lines.append(f'aiv_step_seconds_sum{{{labels}}} {total:.6f}')
+        lines.append(f'aiv_step_seconds_count{{{labels}}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def _atomic_write(path, text):
+    tmp = path.with_name(path.name + f'.{os.getpid()}.{threading.get_ident()}.tmp')
+    tmp.write_text(text, encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def flush(app):
+    """写出 JSON 与 Prometheus 文本文件（原子替换，采集端不会读到半个文件）"""
+    try:
+        OUT_DIR.mkdir(parents=True, exist_ok=True)
+        _atomic_write(OUT_DIR / f'timing_{app}.json',
+                      json.dumps(snapshot(app), ensure_ascii=False, indent=2))
+        _atomic_write(OUT_DIR / f'timing_{app}.prom', prometheus_text(app))
+    except OSError:
+        # 计时只是辅助信息，写盘失败不能影响评测页面
+        pass
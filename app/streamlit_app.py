@@ -1,6 +1,4 @@
-﻿import os, json, sqlite3, time
-import csv
-from functools import lru_cache
+﻿import os, json, time
 from pathlib import Path
 import streamlit as st
 from streamlit.components.v1 import html as embed_html
@@ -74,21 +72,17 @@ else:
         ('jimeng', _small_root / 'genvideo' / 'jimeng'),
         ('opensora', _small_root / 'genvideo' / 'opensora'),
     ]
-MODEL_ALIASES = {
-    'cogfun': 'cogfun',
-    'cogvideo_5b': 'cogvideo_5b',
-    'cogvideo5b': 'cogvideo_5b',
-    'videocrafter': 'videocrafter',
-    'crafter': 'videocrafter',
-    'sora': 'sora',
-    'wan21': 'wan21',
-    'kling': 'kling',
-    'jimeng': 'jimeng',
-    'opensora': 'opensora',
-}
-
-
-@lru_cache(maxsize=1)
+sys.path.insert(0, str(_Path(__file__).parent))
+from auto_scores import MODEL_ALIASES, cached_auto_scores  # noqa: E402
+from perf_timing import rerun, step, timed  # noqa: E402
+import db_trace  # noqa: E402
+from task_board import TaskBoard  # noqa: E402
+import versioned_cache  # noqa: E402
+from versioned_cache import cached, table_tag, tree_tag  # noqa: E402
+
+
+# prompt目录（含各类别子目录）有增删时自动重建
+@cached(lambda: tree_tag(PROMPT_ROOT), name='prompt_index')
 def prompt_index() -> dict:
     mapping: dict[str, str] = {}
     if PROMPT_ROOT.exists():
@@ -100,50 +94,37 @@ def prompt_index() -> dict:
 
 
 
-@lru_cache(maxsize=1)
 def auto_score_lookup() -> dict:
-    lookup: dict[tuple[str, str], dict[str, float | None]] = {}
-    if not AUTO_SCORE_CSV.exists():
-        return lookup
-    with AUTO_SCORE_CSV.open('r', encoding='utf-8-sig', newline='') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            model = row.get('modelname')
-            clip_id = row.get('ID')
-            if not model or not clip_id:
-                continue
-            canonical = MODEL_ALIASES.get(model, model)
-
-            def safe_float(val):
-                try:
-                    return float(val)
-                except (TypeError, ValueError):
-                    return None
-
-            entry = lookup.setdefault(
-                (canonical, clip_id),
-                {'semantic': None, 'temporal': None, 'motion': None, 'world': None}
-            )
-            for src_key, dst_key in (('S_base', 'semantic'), ('S_event', 'temporal'), ('S_motion', 'motion'), ('S_world', 'world')):
-                value = safe_float(row.get(src_key))
-                if value is not None:
-                    entry[dst_key] = value
-    return lookup
-
-
-@lru_cache(maxsize=None)
-def model_sequence_for(prompt_key: str | None) -> list[str]:
-    seq: list[str] = []
+    # CSV重新生成后自动重新加载（按mtime/size判断），不再需要重启服务
+    return cached_auto_scores(AUTO_SCORE_CSV, MODEL_ALIASES)
+
+
+@cached(lambda prompt_key: table_tag(DB_PATH, 'videos'), name='model_sequence_for', maxsize=4096)
+def model_sequence_for(prompt_key: str | None) -> list[str | None]:
+    """variant_index → 模型名（下标 variant_index-1）
+
+    以 videos 表为准：监控按 MAX(variant_index)+1 追加新视频/新模型，videos 表变化后缓存自动失效
+    """
+    seq: list[str | None] = []
     if not prompt_key:
         return seq
-    for name, directory in MODEL_DIRS:
-        if (directory / f"{prompt_key}.mp4").exists():
-            seq.append(name)
+    conn = get_conn()
+    try:
+        rows = conn.execute(
+            'SELECT variant_index, modelname FROM videos WHERE prompt_id=? ORDER BY variant_index',
+            (prompt_key,)
+        ).fetchall()
+    finally:
+        conn.close()
+    for variant, name in rows:
+        seq.extend([None] * (variant - 1 - len(seq)))
+        seq.append(name)
     return seq
 
 
+@timed('db.connect')
 def get_conn():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    conn = db_trace.connect(DB_PATH, source='scoring_app', check_same_thread=False)
     conn.execute('PRAGMA foreign_keys=ON')
     conn.execute('PRAGMA journal_mode=WAL')
     conn.execute('PRAGMA busy_timeout=5000')
@@ -163,12 +144,24 @@ def qp(name, default=None):
     return v
 
 
+@st.cache_resource
+def task_board(db_path):
+    """进程内任务看板：所有评审员会话共享，读走内存、写直达数据库（见 app/task_board.py）"""
+    return TaskBoard(db_path)
+
+
+# 局部重跑：st.fragment（1.37+）/ st.experimental_fragment（1.33~1.36）；更早的版本退化为整页重跑
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None) or (lambda fn: fn)
+
+
+@timed('token.lookup')
 def judge_by_token(conn, t):
     cur = conn.cursor()
     cur.execute('SELECT id,name FROM judges WHERE token=?', (t,))
     return cur.fetchone()
 
 
+@timed('db.progress')
 def progress(conn, j):
     """获取评审员的进度（基于assignments）"""
     cur = conn.cursor()
@@ -191,6 +184,7 @@ def progress(conn, j):
     return done, total
 
 
+@timed('db.next_assign')
 def next_assign(conn, j):
     """获取下一个未完成的任务（一个视频对）
     
@@ -199,11 +193,14 @@ def next_assign(conn, j):
     
     特殊情况：如果用户有rating但finished=0（正在编辑），即使task.completed=1也允许继续
     这样用户可以继续调整评分，不会因为其他人完成3次评分而被跳过
+    
+    返回：(task_id, prompt_id, video_id, prompt_text, ref_path)
+    分配记录以 (judge_id, task_id) 定位，兼容rowid与WITHOUT ROWID两种assignments布局
     """
     cur = conn.cursor()
     cur.execute(
         '''
-        SELECT a.id, a.task_id, t.prompt_id, t.video_id, p.text, p.ref_path
+        SELECT a.task_id, t.prompt_id, t.video_id, p.text, p.ref_path
           FROM assignments a 
           JOIN tasks t ON a.task_id = t.id
           JOIN prompts p ON t.prompt_id = p.id
@@ -222,8 +219,9 @@ def next_assign(conn, j):
     return cur.fetchone()
 
 
-def previous_assign(conn, j, current_assign_id):
-    """获取上一个已完成的任务ID
+@timed('db.previous_assign')
+def previous_assign(conn, j, current_task_id):
+    """获取上一个已完成任务的task_id
     
     关键：按display_order排序查找上一个任务，因为任务已被随机打散
     """
@@ -231,8 +229,8 @@ def previous_assign(conn, j, current_assign_id):
     
     # 首先获取当前任务的display_order
     cur.execute(
-        'SELECT display_order FROM assignments WHERE id = ?',
-        (current_assign_id,)
+        'SELECT display_order FROM assignments WHERE judge_id = ? AND task_id = ?',
+        (j, current_task_id)
     )
     current_row = cur.fetchone()
     if not current_row:
@@ -242,7 +240,7 @@ def previous_assign(conn, j, current_assign_id):
     # 查找display_order小于当前任务的最近一个已完成任务
     cur.execute(
         '''
-        SELECT id FROM assignments
+        SELECT task_id FROM assignments
          WHERE judge_id=? AND display_order < ? AND finished=1
          ORDER BY display_order DESC LIMIT 1
         ''',
@@ -274,6 +272,10 @@ def vids_by_ids(conn, ids, prompt_key):
     return ordered
 
 
+@timed('db.video_info')
+# videos 只由监控插入/删除（AUTOINCREMENT，id不复用），按表指纹失效：评分提交不影响该缓存
+@cached(lambda conn, video_id: table_tag(DB_PATH, 'videos'), key=lambda conn, video_id: video_id,
+        name='video_info', maxsize=4096)
 def get_video_info(conn, video_id: int) -> dict | None:
     """获取单个视频的信息"""
     cur = conn.cursor()
@@ -291,6 +293,7 @@ def get_video_info(conn, video_id: int) -> dict | None:
     }
 
 
+@timed('db.existing')
 def existing(conn, j, v):
     cur = conn.cursor()
     cur.execute(
@@ -304,6 +307,7 @@ def existing(conn, j, v):
     return {'semantic': row[0], 'motion': row[1], 'temporal': row[2], 'realism': row[3]} if row else None
 
 
+@timed('db.save')
 def save(conn, j, v, sc):
     # Persist 4 scores plus modelname/sample_id/prompt_id for richer analysis
     cur = conn.cursor()
@@ -330,8 +334,9 @@ def save(conn, j, v, sc):
     conn.commit()
 
 
-def mark_done(conn, assign_id):
-    """标记任务完成（通过assignment ID）
+@timed('db.mark_done')
+def mark_done(conn, judge_id, task_id):
+    """标记任务完成（通过judge_id + task_id定位assignment）
     
     注意：
     1. 更新assignment.finished=1和finished_at
@@ -341,20 +346,20 @@ def mark_done(conn, assign_id):
     # 获取assignment的信息
     cur = conn.cursor()
     cur.execute('''
-        SELECT a.judge_id, t.video_id
+        SELECT t.video_id
         FROM assignments a
         JOIN tasks t ON a.task_id = t.id
-        WHERE a.id = ?
-    ''', (assign_id,))
+        WHERE a.judge_id = ? AND a.task_id = ?
+    ''', (judge_id, task_id))
     result = cur.fetchone()
     
     if result:
-        judge_id, video_id = result
+        video_id = result[0]
         
         # 更新assignment
         conn.execute(
-            'UPDATE assignments SET finished=1, finished_at=CURRENT_TIMESTAMP WHERE id=?', 
-            (assign_id,)
+            'UPDATE assignments SET finished=1, finished_at=CURRENT_TIMESTAMP WHERE judge_id=? AND task_id=?', 
+            (judge_id, task_id)
         )
         
         # 更新rating的submitted_at
@@ -367,7 +372,8 @@ def mark_done(conn, assign_id):
         conn.commit()
 
 
-def mark_undone(conn, assign_id):
+@timed('db.mark_undone')
+def mark_undone(conn, judge_id, task_id):
     """取消任务完成标记（用于返回上一题）
     
     注意：
@@ -378,22 +384,22 @@ def mark_undone(conn, assign_id):
     # 获取assignment的信息
     cur = conn.cursor()
     cur.execute('''
-        SELECT a.judge_id, t.video_id
+        SELECT t.video_id
         FROM assignments a
         JOIN tasks t ON a.task_id = t.id
-        WHERE a.id = ?
-    ''', (assign_id,))
+        WHERE a.judge_id = ? AND a.task_id = ?
+    ''', (judge_id, task_id))
     result = cur.fetchone()
     
     if result:
-        judge_id, video_id = result
+        video_id = result[0]
         
         # 将assignment标记为未完成
         conn.execute('''
             UPDATE assignments
             SET finished = 0, finished_at = NULL
-            WHERE id = ?
-        ''', (assign_id,))
+            WHERE judge_id = ? AND task_id = ?
+        ''', (judge_id, task_id))
         
         # 清除rating的submitted_at
         conn.execute('''
@@ -413,6 +419,7 @@ def min_guard(start_ts, minimum=0):
     return remain, elapsed >= minimum
 
 
+@timed('vbox')
 def vbox(ref_src, gen_src, height=520):
     html = """
     <style>
@@ -516,6 +523,7 @@ def main_evaluation():
     st.write(INTRO)
     if os.getenv('AIV_DEBUG','0') == '1':
         st.caption(f"[DEBUG] DB_PATH={DB_PATH}")
+        st.caption("[DEBUG] 缓存命中率：" + "；".join(versioned_cache.report()))
     
     # 修改规则按钮，点击后跳转到规则展示页面
     if st.button("📖 点击查看详细评分规则", type="secondary", use_container_width=True):
@@ -528,26 +536,27 @@ def main_evaluation():
         st.stop()
 
     conn = get_conn()
-    j = judge_by_token(conn, token)
+    board = task_board(DB_PATH)
+    j = board.judge_by_token(token)
     if not j:
         st.error("无效的 token。")
         st.stop()
     jid, jname = j
 
     st.info(f"当前评审：**{jname}**")
-    done, total = progress(conn, jid)
+    done, total = board.progress(jid)
     # 确保进度值在[0.0, 1.0]范围内
     progress_value = min(done / total, 1.0) if total > 0 else 0.0
     st.progress(progress_value, text=f"进度：{done}/{total}")
 
     # 获取下一个任务（现在是一个视频对）
-    nxt = next_assign(conn, jid)
+    nxt = board.next_assign(jid)
     if not nxt:
         st.success("🎉 已完成所有题目，感谢参与！")
         st.stop()
 
-    # 解包新的返回值：assign_id, task_id, prompt_id, video_id, prompt_text, ref_video_path
-    assign_id, task_id, pid, video_id, prompt_text, ref_path = nxt
+    # 解包新的返回值：task_id, prompt_id, video_id, prompt_text, ref_video_path
+    task_id, pid, video_id, prompt_text, ref_path = nxt
     
     # 获取视频信息
     cur_vid = get_video_info(conn, video_id)
@@ -555,20 +564,20 @@ def main_evaluation():
         st.error("当前视频不存在，请联系管理员。")
         st.stop()
 
-    # 计时器（基于 assignment ID）
-    timer_key = f"timer_{assign_id}"
+    # 计时器（基于 task ID，同一judge下唯一）
+    timer_key = f"timer_{task_id}"
     if timer_key not in st.session_state:
         st.session_state[timer_key] = time.time()
 
     # 返回上一题按钮
-    prev_assign_id = previous_assign(conn, jid, assign_id)
-    if prev_assign_id:
-        if st.button("⬅ 返回上一题", key=f"back_{assign_id}", use_container_width=True):
-            mark_undone(conn, prev_assign_id)
+    prev_task_id = board.previous_assign(jid, task_id)
+    if prev_task_id:
+        if st.button("⬅ 返回上一题", key=f"back_{task_id}", use_container_width=True):
+            board.write_through(jid, prev_task_id, False, lambda c: mark_undone(c, jid, prev_task_id))
             # 清理上一题的session state，让它重新从数据库读取
             # 注意：保留了rating记录，所以会读取到用户之前的评分
-            st.session_state.pop(f'timer_{prev_assign_id}', None)
-            st.session_state.pop(f'scores_init_{prev_assign_id}', None)
+            st.session_state.pop(f'timer_{prev_task_id}', None)
+            st.session_state.pop(f'scores_init_{prev_task_id}', None)
             st.rerun()
 
     st.markdown("---")
@@ -586,9 +595,15 @@ def main_evaluation():
     st.markdown("---")
     st.markdown("### 📊 请对生成视频进行四维评分")
 
+    score_panel(conn, board, jid, task_id, video_id, timer_key)
+
+
+@fragment
+def score_panel(conn, board, jid, task_id, video_id, timer_key):
+    """评分滑块与提交按钮（局部重跑：拖动滑块不重新加载视频和查询进度/下一题）"""
     # 获取已有评分（如果有），只在第一次加载时从数据库读取
     # 之后使用session_state中的值，避免滑块跳回
-    score_init_key = f"scores_init_{assign_id}"
+    score_init_key = f"scores_init_{task_id}"
     if score_init_key not in st.session_state:
         ex = existing(conn, jid, video_id) or {}
         st.session_state[score_init_key] = {
@@ -605,14 +620,14 @@ def main_evaluation():
             "**基本语义对齐**", 
             1, 5, 
             value=st.session_state[score_init_key]['semantic'], 
-            key=f"sem_{assign_id}",
+            key=f"sem_{task_id}",
             help="核心语义是否表达准确；是否出现重大偏差"
         )
         s_mot = st.slider(
             "**运动**", 
             1, 5, 
             value=st.session_state[score_init_key]['motion'], 
-            key=f"mot_{assign_id}",
+            key=f"mot_{task_id}",
             help="运动是否自然、连贯，无明显卡顿与伪影"
         )
     with c2:
@@ -620,14 +635,14 @@ def main_evaluation():
             "**事件时序一致性**", 
             1, 5, 
             value=st.session_state[score_init_key]['temporal'], 
-            key=f"tem_{assign_id}",
+            key=f"tem_{task_id}",
             help="事件顺序是否正确、节奏是否合理"
         )
         s_rea = st.slider(
             "**世界知识与功能性真实度**", 
             1, 5, 
             value=st.session_state[score_init_key]['realism'], 
-            key=f"rea_{assign_id}",
+            key=f"rea_{task_id}",
             help="是否符合常识/物理规律、交互是否可信"
         )
     
@@ -650,15 +665,21 @@ def main_evaluation():
     # 提交按钮
     if st.button("✅ 提交本题并进入下一题", disabled=not ok, use_container_width=True, type="primary"):
         try:
-            # 保存评分到数据库
-            save(conn, jid, video_id, dict(semantic=s_sem, motion=s_mot, temporal=s_tem, realism=s_rea))
-            # 标记任务完成
-            mark_done(conn, assign_id)
+            scores = dict(semantic=s_sem, motion=s_mot, temporal=s_tem, realism=s_rea)
+
+            def submit(c):
+                # 保存评分到数据库
+                save(c, jid, video_id, scores)
+                # 标记任务完成
+                mark_done(c, jid, task_id)
+
+            board.write_through(jid, task_id, True, submit)
             # 清理当前任务的session state
             st.session_state.pop(timer_key, None)
             st.session_state.pop(score_init_key, None)
             st.success("✅ 已提交并保存，正在加载下一题…")
-            time.sleep(0.5)  # 短暂延迟，让用户看到成功消息
+            with step('submit.sleep'):
+                time.sleep(0.5)  # 短暂延迟，让用户看到成功消息
             st.rerun()
         except Exception as e:
             st.error(f"❌ 提交失败：{e}")
@@ -678,5 +699,7 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    # AIV_TIMING=1 时记录本次rerun各步骤耗时（logs/timing/）
+    with rerun('scoring'):
+        main()
 
@@ -8,14 +8,26 @@ AI视频生成比较评测系统 - Streamlit UI
 
 import streamlit as st
 import streamlit.components.v1 as components
+import os
 import sqlite3
+import sys
 from pathlib import Path
 import time
 import socket
 
+sys.path.insert(0, str(Path(__file__).parent))
+from elo_compare import apply_comparison, ensure_elo_schema, revert_comparison  # noqa: E402
+from perf_timing import rerun, step, timed  # noqa: E402
+import db_trace  # noqa: E402
+from versioned_cache import cached, db_tag  # noqa: E402
+
+# 局部重跑：st.fragment（1.37+）/ st.experimental_fragment（1.33~1.36）；更早的版本退化为整页重跑
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None) or (lambda fn: fn)
+
 # 配置
 PROJECT_ROOT = Path(__file__).parent.parent
-DB_PATH = PROJECT_ROOT / "aiv_compare_v1.db"
+# AIV_COMPARE_DB 可指定其他数据库（基准测试/压测用）
+DB_PATH = Path(os.getenv('AIV_COMPARE_DB') or PROJECT_ROOT / "aiv_compare_v1.db")
 
 # 动态获取服务器IP（支持局域网访问）
 def get_server_ip():
@@ -151,13 +163,16 @@ st.markdown("""
 # 快捷键提示已移至侧边栏
 
 
+@timed('db.connect')
 def get_db_connection():
     """获取数据库连接"""
-    conn = sqlite3.connect(DB_PATH, timeout=10.0)
+    conn = db_trace.connect(DB_PATH, source='compare_app', timeout=10.0)
     conn.row_factory = sqlite3.Row
     return conn
 
 
+@timed('token.lookup')
+@cached(lambda uid: db_tag(DB_PATH), name='verify_judge', maxsize=1024)
 def verify_judge(uid):
     """验证评审员UID"""
     conn = get_db_connection()
@@ -168,6 +183,7 @@ def verify_judge(uid):
     return result
 
 
+@timed('db.current_task')
 def get_current_task(judge_id):
     """获取当前未评任务"""
     conn = get_db_connection()
@@ -205,6 +221,7 @@ def get_current_task(judge_id):
     return result
 
 
+@timed('db.history_task')
 def get_history_task(judge_id, history_index):
     """获取历史任务（用于返回上一题）
     history_index: 历史索引，0=最近一次，1=倒数第二次，以此类推
@@ -246,6 +263,7 @@ def get_history_task(judge_id, history_index):
     return result
 
 
+@timed('db.completed_count')
 def get_completed_count(judge_id):
     """获取已完成任务数量"""
     conn = get_db_connection()
@@ -260,16 +278,25 @@ def get_completed_count(judge_id):
     return count
 
 
+@timed('db.delete_comparison')
 def delete_comparison(task_id, judge_id):
     """删除评测记录（用于重判）"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
+        ensure_elo_schema(conn, str(DB_PATH))
+        row = cursor.execute("""
+            SELECT comparison_id FROM comparisons
+            WHERE task_id = ? AND judge_id = ?
+        """, (task_id, judge_id)).fetchone()
         cursor.execute("""
             DELETE FROM comparisons 
             WHERE task_id = ? AND judge_id = ?
         """, (task_id, judge_id))
+        # 撤销该评测对实时Elo的影响（同一事务）
+        if row:
+            revert_comparison(conn, row['comparison_id'])
         conn.commit()
         success = True
     except:
@@ -280,6 +307,7 @@ def delete_comparison(task_id, judge_id):
     return success
 
 
+@timed('db.progress')
 def get_progress(judge_id):
     """获取评审员进度"""
     conn = get_db_connection()
@@ -301,16 +329,28 @@ def get_progress(judge_id):
     return completed, total_assigned
 
 
+@timed('db.submit')
 def submit_comparison(task_id, judge_id, chosen_model, comment=""):
     """提交比较结果"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
+        ensure_elo_schema(conn, str(DB_PATH))
         cursor.execute("""
             INSERT INTO comparisons (task_id, judge_id, chosen_model, comment)
             VALUES (?, ?, ?, ?)
         """, (task_id, judge_id, chosen_model, comment))
+        comparison_id = cursor.lastrowid
+        # 实时Elo：整体 + 类别各更新一次（同一事务，已持有写锁）
+        task = cursor.execute("""
+            SELECT t.model_a, t.model_b, p.category
+            FROM tasks t
+            LEFT JOIN prompts p ON t.sample_id = p.sample_id
+            WHERE t.task_id = ?
+        """, (task_id,)).fetchone()
+        apply_comparison(conn, comparison_id, task['model_a'], task['model_b'],
+                         task['category'], chosen_model)
         conn.commit()
         success = True
     except sqlite3.IntegrityError:
@@ -434,136 +474,53 @@ def show_task(task, is_review=False, history_index=-1, max_history=0):
     </div>
     """, unsafe_allow_html=True)
     
-    # 上方：参考视频（居中，限制宽度）
-    st.markdown("#### 🎯 参考视频")
-    st.markdown('<div class="video-container ref-video-container">', unsafe_allow_html=True)
-    ref_video_url = f"{VIDEO_SERVER_BASE}/{task['ref_video_path']}"
-    
-    # 使用唯一key强制刷新视频
-    import time as time_module
-    cache_buster = int(time_module.time())
-    
-    st.markdown(f"""
-    <video key="ref_{task['task_id']}" width="100%" controls autoplay loop muted>
-        <source src="{ref_video_url}?t={cache_buster}" type="video/mp4">
-    </video>
-    """, unsafe_allow_html=True)
-    st.markdown('</div>', unsafe_allow_html=True)
-    
-    # 下方：两个生成视频左右并排（隐藏模型名）
-    st.markdown("#### 🤖 AI生成视频")
-    col_a, col_b = st.columns(2)
+    with step('video_html'):
+        # 上方：参考视频（居中，限制宽度）
+        st.markdown("#### 🎯 参考视频")
+        st.markdown('<div class="video-container ref-video-container">', unsafe_allow_html=True)
+        ref_video_url = f"{VIDEO_SERVER_BASE}/{task['ref_video_path']}"
     
-    # 左侧：生成视频A（隐藏模型名）
-    with col_a:
-        st.markdown('<div class="video-container gen-video-container">', unsafe_allow_html=True)
-        st.markdown('<div class="model-label">视频A</div>', unsafe_allow_html=True)
-        video_a_url = f"{VIDEO_SERVER_BASE}/{task['video_a_path']}"
-        st.markdown(f"""
-        <video key="video_a_{task['task_id']}" width="100%" controls autoplay loop muted>
-            <source src="{video_a_url}?t={cache_buster}" type="video/mp4">
-        </video>
-        """, unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
+        # 使用唯一key强制刷新视频
+        import time as time_module
+        cache_buster = int(time_module.time())
     
-    # 右侧：生成视频B（隐藏模型名）
-    with col_b:
-        st.markdown('<div class="video-container gen-video-container">', unsafe_allow_html=True)
-        st.markdown('<div class="model-label">视频B</div>', unsafe_allow_html=True)
-        video_b_url = f"{VIDEO_SERVER_BASE}/{task['video_b_path']}"
         st.markdown(f"""
-        <video key="video_b_{task['task_id']}" width="100%" controls autoplay loop muted>
-            <source src="{video_b_url}?t={cache_buster}" type="video/mp4">
+        <video key="ref_{task['task_id']}" width="100%" controls autoplay loop muted>
+            <source src="{ref_video_url}?t={cache_buster}" type="video/mp4">
         </video>
         """, unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
     
-    # 选择按钮（紧凑版）
-    st.markdown("#### 🎯 请选择更好的视频：")
-    
-    col1, col2, col3 = st.columns([1, 1, 1])
-    
-    with col1:
-        if st.button("选择 视频A", 
-                     key="btn_a", use_container_width=True):
-            # 如果是重判模式，先删除旧记录
-            if is_review:
-                delete_comparison(task['task_id'], st.session_state.judge_id)
-            
-            # 直接提交，不需要备注
-            success = submit_comparison(
-                task['task_id'],
-                st.session_state.judge_id,
-                task['model_a'],
-                ""
-            )
-            
-            if success:
-                st.success("✅ 提交成功！正在加载下一个任务...")
-                # 清空状态，准备下一个任务
-                st.session_state.chosen_model = None
-                st.session_state.temp_choice = None
-                st.session_state.current_task_id = None
-                st.session_state.history_index = -1  # 返回当前任务
-                time.sleep(0.5)
-                st.rerun()
-            else:
-                st.error("❌ 提交失败")
-    
-    with col2:
-        if st.button("选择 视频B", 
-                     key="btn_b", use_container_width=True):
-            # 如果是重判模式，先删除旧记录
-            if is_review:
-                delete_comparison(task['task_id'], st.session_state.judge_id)
-            
-            # 直接提交，不需要备注
-            success = submit_comparison(
-                task['task_id'],
-                st.session_state.judge_id,
-                task['model_b'],
-                ""
-            )
-            
-            if success:
-                st.success("✅ 提交成功！正在加载下一个任务...")
-                # 清空状态，准备下一个任务
-                st.session_state.chosen_model = None
-                st.session_state.temp_choice = None
-                st.session_state.current_task_id = None
-                st.session_state.history_index = -1  # 返回当前任务
-                time.sleep(0.5)
-                st.rerun()
-            else:
-                st.error("❌ 提交失败")
-    
-    with col3:
-        if st.button("两者相当", 
-                     key="btn_tie", use_container_width=True):
-            # 如果是重判模式，先删除旧记录
-            if is_review:
-                delete_comparison(task['task_id'], st.session_state.judge_id)
-            
-            # 直接提交，不需要备注
-            success = submit_comparison(
-                task['task_id'],
-                st.session_state.judge_id,
-                "tie",
-                ""
-            )
-            
-            if success:
-                st.success("✅ 提交成功！正在加载下一个任务...")
-                # 清空状态，准备下一个任务
-                st.session_state.chosen_model = None
-                st.session_state.temp_choice = None
-                st.session_state.current_task_id = None
-                st.session_state.history_index = -1  # 返回当前任务
-                time.sleep(0.5)
-                st.rerun()
-            else:
-                st.error("❌ 提交失败")
-    
+        # 下方：两个生成视频左右并排（隐藏模型名）
+        st.markdown("#### 🤖 AI生成视频")
+        col_a, col_b = st.columns(2)
+    
+        # 左侧：生成视频A（隐藏模型名）
+        with col_a:
+            st.markdown('<div class="video-container gen-video-container">', unsafe_allow_html=True)
+            st.markdown('<div class="model-label">视频A</div>', unsafe_allow_html=True)
+            video_a_url = f"{VIDEO_SERVER_BASE}/{task['video_a_path']}"
+            st.markdown(f"""
+            <video key="video_a_{task['task_id']}" width="100%" controls autoplay loop muted>
+                <source src="{video_a_url}?t={cache_buster}" type="video/mp4">
+            </video>
+            """, unsafe_allow_html=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+    
+        # 右侧：生成视频B（隐藏模型名）
+        with col_b:
+            st.markdown('<div class="video-container gen-video-container">', unsafe_allow_html=True)
+            st.markdown('<div class="model-label">视频B</div>', unsafe_allow_html=True)
+            video_b_url = f"{VIDEO_SERVER_BASE}/{task['video_b_path']}"
+            st.markdown(f"""
+            <video key="video_b_{task['task_id']}" width="100%" controls autoplay loop muted>
+                <source src="{video_b_url}?t={cache_buster}" type="video/mp4">
+            </video>
+            """, unsafe_allow_html=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+    
+    choice_panel(task, is_review)
+
     # 添加快捷键支持（通过隐藏输入框捕获按键）
     keyboard_listener_html = """
     <!DOCTYPE html>
@@ -651,7 +608,102 @@ def show_task(task, is_review=False, history_index=-1, max_history=0):
     </body>
     </html>
     """
-    components.html(keyboard_listener_html, height=1, width=1)
+    with step('keyboard_html'):
+        components.html(keyboard_listener_html, height=1, width=1)
+
+
+@fragment
+def choice_panel(task, is_review):
+    """A/B/相当 选择按钮（局部重跑：点击时不重新查询任务、不重新嵌入视频，提交成功后再整页刷新）"""
+    # 选择按钮（紧凑版）
+    st.markdown("#### 🎯 请选择更好的视频：")
+    
+    col1, col2, col3 = st.columns([1, 1, 1])
+    
+    with col1:
+        if st.button("选择 视频A", 
+                     key="btn_a", use_container_width=True):
+            # 如果是重判模式，先删除旧记录
+            if is_review:
+                delete_comparison(task['task_id'], st.session_state.judge_id)
+            
+            # 直接提交，不需要备注
+            success = submit_comparison(
+                task['task_id'],
+                st.session_state.judge_id,
+                task['model_a'],
+                ""
+            )
+            
+            if success:
+                st.success("✅ 提交成功！正在加载下一个任务...")
+                # 清空状态，准备下一个任务
+                st.session_state.chosen_model = None
+                st.session_state.temp_choice = None
+                st.session_state.current_task_id = None
+                st.session_state.history_index = -1  # 返回当前任务
+                with step('submit.sleep'):
+                    time.sleep(0.5)
+                st.rerun()
+            else:
+                st.error("❌ 提交失败")
+    
+    with col2:
+        if st.button("选择 视频B", 
+                     key="btn_b", use_container_width=True):
+            # 如果是重判模式，先删除旧记录
+            if is_review:
+                delete_comparison(task['task_id'], st.session_state.judge_id)
+            
+            # 直接提交，不需要备注
+            success = submit_comparison(
+                task['task_id'],
+                st.session_state.judge_id,
+                task['model_b'],
+                ""
+            )
+            
+            if success:
+                st.success("✅ 提交成功！正在加载下一个任务...")
+                # 清空状态，准备下一个任务
+                st.session_state.chosen_model = None
+                st.session_state.temp_choice = None
+                st.session_state.current_task_id = None
+                st.session_state.history_index = -1  # 返回当前任务
+                with step('submit.sleep'):
+                    time.sleep(0.5)
+                st.rerun()
+            else:
+                st.error("❌ 提交失败")
+    
+    with col3:
+        if st.button("两者相当", 
+                     key="btn_tie", use_container_width=True):
+            # 如果是重判模式，先删除旧记录
+            if is_review:
+                delete_comparison(task['task_id'], st.session_state.judge_id)
+            
+            # 直接提交，不需要备注
+            success = submit_comparison(
+                task['task_id'],
+                st.session_state.judge_id,
+                "tie",
+                ""
+            )
+            
+            if success:
+                st.success("✅ 提交成功！正在加载下一个任务...")
+                # 清空状态，准备下一个任务
+                st.session_state.chosen_model = None
+                st.session_state.temp_choice = None
+                st.session_state.current_task_id = None
+                st.session_state.history_index = -1  # 返回当前任务
+                with step('submit.sleep'):
+                    time.sleep(0.5)
+                st.rerun()
+            else:
+                st.error("❌ 提交失败")
+    
 
 
 def show_completion_page(judge_name):
@@ -726,5 +778,7 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    # AIV_TIMING=1 时记录本次rerun各步骤耗时（logs/timing/）
+    with rerun('compare'):
+        main()
 
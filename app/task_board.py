@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+打分模式的进程内任务看板（所有评审员会话共享，由页面放在 st.cache_resource 中）
+
+- 每个评审员：按 display_order 排好的任务下标、finished、是否已有评分（numpy 紧凑数组，约6字节/分配）
+- 每个任务：video_id、current_ratings、completed；另有 token→评审员、prompt→(文本, 参考视频) 映射
+- 读（进度 / 下一题 / 上一题 / token校验）直接查内存，与 streamlit_app.py 中对应SQL的语义一致
+- 写（提交 / 返回上一题）在看板自己的连接上执行并提交（write-through），再更新内存；
+  任务状态以触发器结果为准（写后按主键回读该任务的 current_ratings / completed）
+- 其他连接的提交（监控、导入、JSON接口、维护工具）通过 PRAGMA data_version 发现：
+  任务/评审员/prompt 立即重新加载，各评审员的分配在下次访问时按需重新加载；
+  分配中出现看板尚未加载的任务时，在同一个读事务中重新加载任务与该评审员的分配
+
+用法：
+    board = TaskBoard(DB_PATH)
+    done, total = board.progress(jid)
+    nxt = board.next_assign(jid)            # (task_id, prompt_id, video_id, prompt_text, ref_path) 或 None
+    board.write_through(jid, task_id, True, lambda conn: ...)
+"""
+
+import threading
+
+import numpy as np
+
+import db_trace
+from perf_timing import timed
+
+
+class _JudgeQueue:
+    """一个评审员的分配（按 display_order 排序）"""
+    __slots__ = ('generation', 'task_idx', 'finished', 'rated')
+
+    def __init__(self, generation, task_idx, finished, rated):
+        self.generation = generation
+        self.task_idx = task_idx      # int32，指向看板任务数组的下标（数组顺序即 display_order 顺序）
+        self.finished = finished      # bool
+        self.rated = rated            # bool，该评审员是否已对该任务的视频打过分
+
+
+class TaskBoard:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # 看板自己的连接：页面各会话线程共用，由 _lock 串行化
+        self.conn = db_trace.connect(db_path, source='task_board', check_same_thread=False, timeout=10.0)
+        self.conn.execute('PRAGMA foreign_keys=ON')
+        self.conn.execute('PRAGMA busy_timeout=5000')
+        self._generation = 0
+        self._data_version = None
+        self._queues = {}
+        with self._lock:
+            self._load_shared()
+
+    # ---------- 加载 ----------
+
+    @timed('board.load_shared')
+    def _load_shared(self):
+        """重新加载任务、评审员和prompt；已有的评审员队列全部作废（下次访问时重新加载）"""
+        rows = self.conn.execute(
+            'SELECT id, prompt_id, video_id, current_ratings, completed FROM tasks ORDER BY id'
+        ).fetchall()
+        self.task_ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        self.task_prompt = [r[1] for r in rows]
+        self.task_video = np.fromiter((r[2] for r in rows), dtype=np.int64, count=len(rows))
+        self.task_ratings = np.fromiter((r[3] or 0 for r in rows), dtype=np.int32, count=len(rows))
+        self.task_completed = np.fromiter((bool(r[4]) for r in rows), dtype=bool, count=len(rows))
+        self.tokens = {token: (jid, name) for jid, name, token in
+                       self.conn.execute('SELECT id, name, token FROM judges')}
+        self.prompts = {pid: (text, ref) for pid, text, ref in
+                        self.conn.execute('SELECT id, text, ref_path FROM prompts')}
+        self._generation += 1
+        self._queues.clear()
+        self._data_version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def _sync(self):
+        """其他连接有提交时（data_version 变化）重新加载"""
+        version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+        if version != self._data_version:
+            self._load_shared()
+
+    def _judge_rows(self, judge_id):
+        rows = self.conn.execute('''
+            SELECT a.task_id, a.finished, r.id IS NOT NULL
+              FROM assignments a
+              JOIN tasks t ON a.task_id = t.id
+              LEFT JOIN ratings r ON r.judge_id = a.judge_id AND r.video_id = t.video_id
+             WHERE a.judge_id = ?
+             ORDER BY a.display_order
+        ''', (judge_id,)).fetchall()
+        task_ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        task_idx = np.searchsorted(self.task_ids, task_ids)
+        known = bool(np.all(task_idx < len(self.task_ids))) and \
+            bool(np.array_equal(self.task_ids[np.minimum(task_idx, len(self.task_ids) - 1)], task_ids))
+        return rows, task_idx, known
+
+    @timed('board.load_judge')
+    def _load_judge(self, judge_id):
+        rows, task_idx, known = self._judge_rows(judge_id)
+        if not known:
+            # _sync 之后其他连接新增了任务（监控导入新视频）：在同一个读事务中重新加载看板和该评审员的分配
+            self.conn.execute('BEGIN')
+            try:
+                self._load_shared()
+                rows, task_idx, known = self._judge_rows(judge_id)
+            finally:
+                self.conn.commit()
+        queue = _JudgeQueue(
+            self._generation,
+            task_idx.astype(np.int32),
+            np.fromiter((bool(r[1]) for r in rows), dtype=bool, count=len(rows)),
+            np.fromiter((bool(r[2]) for r in rows), dtype=bool, count=len(rows)),
+        )
+        self._queues[judge_id] = queue
+        return queue
+
+    def _queue(self, judge_id):
+        self._sync()
+        queue = self._queues.get(judge_id)
+        if queue is None or queue.generation != self._generation:
+            queue = self._load_judge(judge_id)
+        return queue
+
+    def _position(self, queue, task_id):
+        """任务在评审员队列中的位置，不存在时返回 None"""
+        idx = np.searchsorted(self.task_ids, task_id)
+        if idx >= len(self.task_ids) or self.task_ids[idx] != task_id:
+            return None
+        hits = np.flatnonzero(queue.task_idx == idx)
+        return int(hits[0]) if len(hits) else None
+
+    # ---------- 读 ----------
+
+    @timed('board.judge')
+    def judge_by_token(self, token):
+        with self._lock:
+            self._sync()
+            return self.tokens.get(token)
+
+    @timed('board.progress')
+    def progress(self, judge_id):
+        """(已完成, 已完成 + 待做)；待做 = 未完成且任务尚未评满"""
+        with self._lock:
+            q = self._queue(judge_id)
+            done = int(np.count_nonzero(q.finished))
+            pending = int(np.count_nonzero(~q.finished & ~self.task_completed[q.task_idx]))
+            return done, done + pending
+
+    @timed('board.next_assign')
+    def next_assign(self, judge_id):
+        """下一个未完成的任务；已评满的任务只有在该评审员已打过分（正在修改）时才显示"""
+        with self._lock:
+            q = self._queue(judge_id)
+            open_ = ~q.finished & (~self.task_completed[q.task_idx] | q.rated)
+            for pos in np.flatnonzero(open_):
+                idx = q.task_idx[pos]
+                prompt_id = self.task_prompt[idx]
+                # 与SQL的 JOIN prompts 一致：prompt 不存在的任务跳过
+                if prompt_id not in self.prompts:
+                    continue
+                text, ref_path = self.prompts[prompt_id]
+                return int(self.task_ids[idx]), prompt_id, int(self.task_video[idx]), text, ref_path
+            return None
+
+    @timed('board.previous_assign')
+    def previous_assign(self, judge_id, current_task_id):
+        """display_order 在当前任务之前的最近一个已完成任务"""
+        with self._lock:
+            q = self._queue(judge_id)
+            pos = self._position(q, current_task_id)
+            if pos is None:
+                return None
+            hits = np.flatnonzero(q.finished[:pos])
+            return int(self.task_ids[q.task_idx[hits[-1]]]) if len(hits) else None
+
+    # ---------- 写 ----------
+
+    @timed('board.write')
+    def write_through(self, judge_id, task_id, finished, write):
+        """write(conn) 在看板连接上写入并提交，随后把 (judge_id, task_id) 标记为 finished 并回读任务状态
+
+        write 中的异常原样抛出，看板整体作废重新加载（数据库中可能已部分提交）
+        """
+        with self._lock:
+            q = self._queue(judge_id)
+            try:
+                write(self.conn)
+            except Exception:
+                self.conn.rollback()
+                self._load_shared()
+                raise
+            pos = self._position(q, task_id)
+            if pos is None:
+                return
+            q.finished[pos] = finished
+            idx = q.task_idx[pos]
+            row = self.conn.execute(
+                'SELECT current_ratings, completed, EXISTS (SELECT 1 FROM ratings WHERE judge_id = ? AND video_id = ?) '
+                'FROM tasks WHERE id = ?',
+                (judge_id, int(self.task_video[idx]), task_id)
+            ).fetchone()
+            if row:
+                self.task_ratings[idx] = row[0] or 0
+                self.task_completed[idx] = bool(row[1])
+                q.rated[pos] = bool(row[2])
+
+    def stats(self):
+        """看板规模（管理/调试用）"""
+        with self._lock:
+            arrays = [self.task_ids, self.task_video, self.task_ratings, self.task_completed]
+            for q in self._queues.values():
+                arrays += [q.task_idx, q.finished, q.rated]
+            return {'tasks': len(self.task_ids), 'judges_loaded': len(self._queues),
+                    'array_bytes': sum(a.nbytes for a in arrays), 'generation': self._generation}
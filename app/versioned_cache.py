@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+带版本标签的进程内缓存（替代 lru_cache：数据源变化后自动失效，并统计命中率）
+
+- cached(tag, key=None, name=None, maxsize=None)：装饰器。每次调用先计算 tag(*args)，
+  与条目保存的标签不同即视为过期并重新计算；key 默认为全部参数。
+  缓存对象按 name 登记在本模块中：Streamlit 每次重跑都在新的 __main__ 中重新执行页面脚本，
+  重新装饰时取回同名的已有缓存（函数代码变化时清空），因此缓存跨重跑和会话保留
+- 标签来源：
+    data_version(db_path)：PRAGMA data_version（每个数据库一个专用连接，其他连接提交后变化）
+    db_tag(db_path)：(数据库路径, data_version)，换库后不会误用旧条目
+    table_tag(db_path, table)：单表指纹 (路径, max(rowid), count(*))，只在 data_version 变化时重新查询；
+        适用于只插入/删除、不原地更新且 rowid 不复用（AUTOINCREMENT）的表，如打分模式的 videos——
+        评分提交不会使其失效
+    file_tag(*paths)：文件/目录的 (mtime_ns, size)，不存在为 None
+    tree_tag(root)：目录及其直接子目录的 mtime（子目录中增删文件时变化）
+- stats() / report()：各缓存的命中、首次计算、过期、淘汰次数与命中率；AIV_DEBUG=1 时页面显示
+
+用法：
+    from versioned_cache import cached, data_version
+
+    @cached(lambda conn, vid: table_tag(DB_PATH, 'videos'), key=lambda conn, vid: vid, name='video_info')
+    def get_video_info(conn, vid): ...
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+from pathlib import Path
+
+import db_trace
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+_probes = {}
+_probes_lock = threading.Lock()
+
+_fingerprints = {}  # (路径, 表) -> (data_version, 标签)
+
+
+# ==================== 标签 ====================
+
+def _probe(path):
+    probe = _probes.get(path)
+    if probe is None:
+        with _probes_lock:
+            probe = _probes.get(path)
+            if probe is None:
+                conn = db_trace.connect(path, source='versioned_cache', check_same_thread=False)
+                probe = _probes[path] = (conn, threading.Lock())
+    return probe
+
+
+def data_version(db_path):
+    """数据库的提交版本号：其他连接（页面其他会话、监控、工具）每次提交后变化"""
+    conn, lock = _probe(str(Path(db_path).resolve()))
+    with lock:
+        return conn.execute('PRAGMA data_version').fetchone()[0]
+
+
+def db_tag(db_path):
+    path = str(Path(db_path).resolve())
+    return path, data_version(path)
+
+
+def table_tag(db_path, table):
+    """单表指纹：数据库有提交时才重新统计 (max(rowid), count(*))"""
+    path = str(Path(db_path).resolve())
+    version = data_version(path)
+    known = _fingerprints.get((path, table))
+    if known is not None and known[0] == version:
+        return known[1]
+    conn, lock = _probe(path)
+    with lock:
+        tag = (path,) + tuple(conn.execute(f'SELECT max(rowid), count(*) FROM {table}').fetchone())
+    _fingerprints[(path, table)] = (version, tag)
+    return tag
+
+
+def file_tag(*paths):
+    tags = []
+    for p in paths:
+        try:
+            st = os.stat(p)
+            tags.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            tags.append(None)
+    return tuple(tags)
+
+
+def tree_tag(root):
+    try:
+        with os.scandir(root) as it:
+            subdirs = sorted(e.path for e in it if e.is_dir())
+    except OSError:
+        return None
+    return file_tag(root, *subdirs)
+
+
+# ==================== 缓存 ====================
+
+class VersionedCache:
+    def __init__(self, name, maxsize=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.code = None  # 登记该缓存的函数代码（重新装饰时比较）
+        self._entries = OrderedDict()  # key -> (tag, value)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.stale = self.evicted = 0
+
+    def get(self, key, tag, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == tag:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry[1]
+            if entry is None:
+                self.misses += 1
+            else:
+                self.stale += 1
+        # 计算放在锁外：并发的同一未命中可能各算一次，结果相同
+        value = compute()
+        with self._lock:
+            self._entries[key] = (tag, value)
+            self._entries.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evicted += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.stale
+            return {'hits': self.hits, 'misses': self.misses, 'stale': self.stale,
+                    'evicted': self.evicted, 'size': len(self._entries),
+                    'hit_rate': round(self.hits / lookups, 4) if lookups else None}
+
+
+def cached(tag, key=None, name=None, maxsize=None):
+    """按标签失效的缓存装饰器（tag/key 与被装饰函数接收相同的参数）；同名缓存跨重新装饰复用"""
+    def deco(fn):
+        cache_name = name or f'{fn.__module__}.{fn.__qualname__}'
+        with _registry_lock:
+            cache = _registry.get(cache_name)
+            if cache is None:
+                cache = _registry[cache_name] = VersionedCache(cache_name, maxsize)
+            elif cache.code != fn.__code__:
+                # 页面源码修改后 Streamlit 重新执行：旧代码算出的条目作废
+                cache.clear()
+            cache.code = fn.__code__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            k = key(*args, **kwargs) if key else (args, tuple(sorted(kwargs.items())))
+            return cache.get(k, tag(*args, **kwargs), lambda: fn(*args, **kwargs))
+
+        wrapper.cache = cache
+        wrapper.cache_clear = cache.clear
+        wrapper.cache_stats = cache.stats
+        return wrapper
+    return deco
+
+
+def stats():
+    with _registry_lock:
+        caches = list(_registry.values())
+    return {c.name: c.stats() for c in caches}
+
+
+def report():
+    """一行一个缓存：名称 命中率 (命中/查询，过期次数)"""
+    lines = []
+    for name, s in sorted(stats().items()):
+        lookups = s['hits'] + s['misses'] + s['stale']
+        rate = f"{s['hit_rate']:.1%}" if s['hit_rate'] is not None else '-'
+        lines.append(f"{name}: {rate} ({s['hits']}/{lookups}，过期 {s['stale']}，条目 {s['size']})")
+    return lines
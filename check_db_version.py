@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
 """快速检查数据库版本"""
-import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'app'))
+import db_trace  # noqa: E402
 
 db_path = 'aiv_eval_v4.db'
 
 try:
-    conn = sqlite3.connect(db_path)
+    conn = db_trace.connect(db_path)
     cur = conn.cursor()
     
     # 检查是否有tasks表
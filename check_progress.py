@@ -1,19 +1,47 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """查看评测进度（基于V2系统：每任务3人评）"""
-import sqlite3
 import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'app'))
+import db_trace  # noqa: E402
 
 # Windows编码支持
 if sys.platform == 'win32':
     import io
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
+def show_agreement(conn):
+    """评审一致性（Krippendorff α / ICC，需要numpy；完整报告见 scripts/rater_agreement.py）"""
+    print("\n" + "=" * 70)
+    print("  评审一致性")
+    print("=" * 70)
+    try:
+        sys.path.insert(0, str(Path(__file__).parent / 'scripts'))
+        from rater_agreement import DIMENSION_NAMES, agreement_summary, load_cube
+    except ImportError:
+        print("  需要numpy：pip install numpy")
+        return
+    
+    cube = load_cube(conn)
+    summary = agreement_summary(cube, n_boot=0) if cube.n_tasks else []
+    if not summary or summary[0]['n_units'] == 0:
+        print("  暂无被2人及以上评过的视频")
+        return
+    print(f"{'维度':<12} {'α(ordinal)':>10} {'ICC(1,1)':>10} {'ICC(1,k)':>10}")
+    print("-" * 70)
+    for row in summary:
+        values = [f"{row[key]:.3f}" if row[key] is not None else '-' for key in ('alpha', 'icc1', 'icck')]
+        print(f"{DIMENSION_NAMES[row['dimension']]:<12} {values[0]:>10} {values[1]:>10} {values[2]:>10}")
+    print(f"\n  基于 {summary[0]['n_units']} 个被2人及以上评过的视频（ICC只用评满3人的 {summary[0]['n_complete']} 个）")
+    print("  置信区间和评审员两两一致性: python scripts/rater_agreement.py --db aiv_eval_v4.db")
+
 def main():
     db_path = 'aiv_eval_v4.db'
     
     try:
-        conn = sqlite3.connect(db_path)
+        conn = db_trace.connect(db_path)
         cur = conn.cursor()
         
         print("=" * 70)
@@ -123,28 +151,56 @@ def main():
         print(f"\n总评分记录数: {total_ratings}")
         
         # 按模型统计
-        cur.execute('''
-            SELECT modelname, COUNT(*) as cnt
-            FROM ratings
-            WHERE modelname IS NOT NULL
-            GROUP BY modelname
-            ORDER BY modelname
-        ''')
+        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='score_cube'")
+        has_cube = cur.fetchone() is not None
+        if has_cube:
+            # 空表或未回填的score_cube（例如由schema.sql新建）与ratings对不上时，改为直接统计ratings
+            cur.execute('SELECT COALESCE(SUM(n), 0) FROM score_cube')
+            if cur.fetchone()[0] != total_ratings:
+                has_cube = False
+                print("⚠️  score_cube 与 ratings 不一致，以下直接统计ratings"
+                      "（运行 python scripts/score_cube.py --install 回填）")
+        if has_cube:
+            cur.execute('''
+                SELECT modelname, SUM(n) as cnt
+                FROM score_cube
+                WHERE modelname != ''
+                GROUP BY modelname
+                ORDER BY modelname
+            ''')
+        else:
+            cur.execute('''
+                SELECT modelname, COUNT(*) as cnt
+                FROM ratings
+                WHERE modelname IS NOT NULL
+                GROUP BY modelname
+                ORDER BY modelname
+            ''')
         
         print(f"\n各模型评分数:")
         for model, cnt in cur.fetchall():
             print(f"  {model:<20} {cnt:>5} 个评分")
         
-        # 平均分
+        # 平均分（有score_cube时直接读取物化聚合，不扫描ratings）
         print(f"\n各维度平均分:")
-        cur.execute('''
-            SELECT 
-                AVG(score_semantic) as avg_semantic,
-                AVG(score_motion) as avg_motion,
-                AVG(score_temporal) as avg_temporal,
-                AVG(score_realism) as avg_realism
-            FROM ratings
-        ''')
+        if has_cube:
+            cur.execute('''
+                SELECT 
+                    1.0 * SUM(sum_semantic) / SUM(n) as avg_semantic,
+                    1.0 * SUM(sum_motion) / SUM(n) as avg_motion,
+                    1.0 * SUM(sum_temporal) / SUM(n) as avg_temporal,
+                    1.0 * SUM(sum_realism) / SUM(n) as avg_realism
+                FROM score_cube
+            ''')
+        else:
+            cur.execute('''
+                SELECT 
+                    AVG(score_semantic) as avg_semantic,
+                    AVG(score_motion) as avg_motion,
+                    AVG(score_temporal) as avg_temporal,
+                    AVG(score_realism) as avg_realism
+                FROM ratings
+            ''')
         row = cur.fetchone()
         if row and row[0]:
             print(f"  基本语义对齐: {row[0]:.2f}")
@@ -152,6 +208,21 @@ def main():
             print(f"  事件时序:     {row[2]:.2f}")
             print(f"  世界知识:     {row[3]:.2f}")
         
+        if has_cube:
+            # 各模型各维度均值（score_cube按模型汇总，只读几十行）
+            print(f"\n各模型各维度平均分（语义/运动/时序/世界知识）:")
+            cur.execute('''
+                SELECT modelname, SUM(n),
+                       1.0 * SUM(sum_semantic) / SUM(n), 1.0 * SUM(sum_motion) / SUM(n),
+                       1.0 * SUM(sum_temporal) / SUM(n), 1.0 * SUM(sum_realism) / SUM(n)
+                FROM score_cube
+                GROUP BY modelname
+                ORDER BY modelname
+            ''')
+            for model, n, sem, mot, tem, rea in cur.fetchall():
+                print(f"  {model or '-':<20} {sem:.2f} / {mot:.2f} / {tem:.2f} / {rea:.2f}  ({n} 个评分)")
+            print(f"  分类别、标准差和置信区间: python scripts/score_cube.py --by model-category")
+        
         if has_tasks_table:
             # V2额外统计：任务完成分布
             print(f"\n📈 任务评分次数分布:")
@@ -165,6 +236,9 @@ def main():
                 status = "✓ 已完成" if ratings >= 3 else f"进行中"
                 print(f"  被评{ratings}次: {cnt:>5} 个任务 {status}")
         
+        if has_tasks_table:
+            show_agreement(conn)
+        
         print("\n" + "=" * 70)
         
         conn.close()
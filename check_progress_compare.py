@@ -8,6 +8,10 @@
 import sqlite3
 from pathlib import Path
 from collections import defaultdict
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent / 'app'))
+import db_trace  # noqa: E402
 
 # 配置
 PROJECT_ROOT = Path(__file__).parent
@@ -16,7 +20,7 @@ DB_PATH = PROJECT_ROOT / "aiv_compare_v1.db"
 
 def get_db_connection():
     """获取数据库连接"""
-    conn = sqlite3.connect(DB_PATH, timeout=10.0)
+    conn = db_trace.connect(DB_PATH, timeout=10.0)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -218,6 +222,36 @@ def show_model_comparison():
     conn.close()
 
 
+def show_elo_leaderboard():
+    """显示实时Elo排行榜（model_elo表由评测服务在每次提交时更新）"""
+    print("\n🏆 实时Elo排行榜:")
+    print("-" * 80)
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'model_elo'")
+    if not cursor.fetchone():
+        print("  暂无排行榜，运行 python scripts/elo_leaderboard_compare.py --rebuild 生成")
+        conn.close()
+        return
+    
+    cursor.execute("""
+        SELECT model_name, rating, wins, ties, losses
+        FROM model_elo
+        WHERE scope = 'ALL'
+        ORDER BY rating DESC
+    """)
+    rows = cursor.fetchall()
+    if not rows:
+        print("  暂无数据")
+    for rank, row in enumerate(rows, start=1):
+        print(f"    {rank:>2}. {row['model_name']:<15}: {row['rating']:>7.1f} "
+              f"(胜{row['wins']} 平{row['ties']} 负{row['losses']})")
+    
+    conn.close()
+
+
 def show_category_progress():
     """显示类别进度"""
     print("\n📂 类别评测进度:")
@@ -322,6 +356,7 @@ def main():
     show_task_progress()
     show_judge_detailed_progress()   # 增强：更详细的评审员进度
     show_model_comparison()
+    show_elo_leaderboard()
     show_category_progress()
     show_time_estimate()             # 新增：完成时间估算
     
@@ -64,7 +64,7 @@ CREATE TABLE IF NOT EXISTS assignments (
     UNIQUE(judge_id, task_id)             -- 同一judge不会重复分配同一task
 );
 
--- 索引优化
+-- 索引优化（可用 scripts/migrate_assignments_compact.py 切换为按(judge_id, display_order)聚簇的WITHOUT ROWID布局）
 CREATE INDEX IF NOT EXISTS idx_assignments_judge ON assignments(judge_id);
 CREATE INDEX IF NOT EXISTS idx_assignments_task ON assignments(task_id);
 CREATE INDEX IF NOT EXISTS idx_assignments_finished ON assignments(finished);
@@ -137,6 +137,158 @@ BEGIN
       );
 END;
 
+-- 评分立方体：每个 (模型, 类别) 的评分数、各维度分数和与平方和（由下面三个触发器维护，scripts/score_cube.py 查询）
+-- 类别按 {category}_{NNN}_{single|multi} 从 sample_id 提取（与 prepare_data.sample_category 一致）
+CREATE TABLE IF NOT EXISTS score_cube (
+    modelname TEXT NOT NULL,
+    category TEXT NOT NULL,
+    n INTEGER NOT NULL DEFAULT 0,
+    sum_semantic INTEGER NOT NULL DEFAULT 0,
+    sumsq_semantic INTEGER NOT NULL DEFAULT 0,
+    sum_motion INTEGER NOT NULL DEFAULT 0,
+    sumsq_motion INTEGER NOT NULL DEFAULT 0,
+    sum_temporal INTEGER NOT NULL DEFAULT 0,
+    sumsq_temporal INTEGER NOT NULL DEFAULT 0,
+    sum_realism INTEGER NOT NULL DEFAULT 0,
+    sumsq_realism INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (modelname, category)
+) WITHOUT ROWID;
+
+-- 触发器：新评分累加进立方体
+CREATE TRIGGER IF NOT EXISTS score_cube_on_rating_insert
+AFTER INSERT ON ratings
+FOR EACH ROW
+BEGIN
+    INSERT INTO score_cube (modelname, category, n,
+                            sum_semantic, sumsq_semantic, sum_motion, sumsq_motion,
+                            sum_temporal, sumsq_temporal, sum_realism, sumsq_realism)
+    SELECT COALESCE(NEW.modelname, ''),
+           CASE WHEN s GLOB '*_[0-9][0-9][0-9]_single' THEN substr(s, 1, length(s) - 11)
+                WHEN s GLOB '*_[0-9][0-9][0-9]_multi' THEN substr(s, 1, length(s) - 10)
+                ELSE '' END,
+           1,
+           NEW.score_semantic, NEW.score_semantic * NEW.score_semantic,
+           NEW.score_motion, NEW.score_motion * NEW.score_motion,
+           NEW.score_temporal, NEW.score_temporal * NEW.score_temporal,
+           NEW.score_realism, NEW.score_realism * NEW.score_realism
+    FROM (SELECT COALESCE(NEW.sample_id, NEW.prompt_id, '') AS s)
+    WHERE true
+    ON CONFLICT(modelname, category) DO UPDATE SET
+        n = n + excluded.n,
+        sum_semantic = sum_semantic + excluded.sum_semantic, sumsq_semantic = sumsq_semantic + excluded.sumsq_semantic,
+        sum_motion = sum_motion + excluded.sum_motion, sumsq_motion = sumsq_motion + excluded.sumsq_motion,
+        sum_temporal = sum_temporal + excluded.sum_temporal, sumsq_temporal = sumsq_temporal + excluded.sumsq_temporal,
+        sum_realism = sum_realism + excluded.sum_realism, sumsq_realism = sumsq_realism + excluded.sumsq_realism;
+END;
+
+-- 触发器：重新打分（UPSERT）时先减去旧分数再加上新分数
+CREATE TRIGGER IF NOT EXISTS score_cube_on_rating_update
+AFTER UPDATE OF score_semantic, score_motion, score_temporal, score_realism, modelname, sample_id, prompt_id
+ON ratings
+FOR EACH ROW
+BEGIN
+    INSERT INTO score_cube (modelname, category, n,
+                            sum_semantic, sumsq_semantic, sum_motion, sumsq_motion,
+                            sum_temporal, sumsq_temporal, sum_realism, sumsq_realism)
+    SELECT COALESCE(OLD.modelname, ''),
+           CASE WHEN s GLOB '*_[0-9][0-9][0-9]_single' THEN substr(s, 1, length(s) - 11)
+                WHEN s GLOB '*_[0-9][0-9][0-9]_multi' THEN substr(s, 1, length(s) - 10)
+                ELSE '' END,
+           -1,
+           -OLD.score_semantic, -OLD.score_semantic * OLD.score_semantic,
+           -OLD.score_motion, -OLD.score_motion * OLD.score_motion,
+           -OLD.score_temporal, -OLD.score_temporal * OLD.score_temporal,
+           -OLD.score_realism, -OLD.score_realism * OLD.score_realism
+    FROM (SELECT COALESCE(OLD.sample_id, OLD.prompt_id, '') AS s)
+    WHERE true
+    ON CONFLICT(modelname, category) DO UPDATE SET
+        n = n + excluded.n,
+        sum_semantic = sum_semantic + excluded.sum_semantic, sumsq_semantic = sumsq_semantic + excluded.sumsq_semantic,
+        sum_motion = sum_motion + excluded.sum_motion, sumsq_motion = sumsq_motion + excluded.sumsq_motion,
+        sum_temporal = sum_temporal + excluded.sum_temporal, sumsq_temporal = sumsq_temporal + excluded.sumsq_temporal,
+        sum_realism = sum_realism + excluded.sum_realism, sumsq_realism = sumsq_realism + excluded.sumsq_realism;
+
+    INSERT INTO score_cube (modelname, category, n,
+                            sum_semantic, sumsq_semantic, sum_motion, sumsq_motion,
+                            sum_temporal, sumsq_temporal, sum_realism, sumsq_realism)
+    SELECT COALESCE(NEW.modelname, ''),
+           CASE WHEN s GLOB '*_[0-9][0-9][0-9]_single' THEN substr(s, 1, length(s) - 11)
+                WHEN s GLOB '*_[0-9][0-9][0-9]_multi' THEN substr(s, 1, length(s) - 10)
+                ELSE '' END,
+           1,
+           NEW.score_semantic, NEW.score_semantic * NEW.score_semantic,
+           NEW.score_motion, NEW.score_motion * NEW.score_motion,
+           NEW.score_temporal, NEW.score_temporal * NEW.score_temporal,
+           NEW.score_realism, NEW.score_realism * NEW.score_realism
+    FROM (SELECT COALESCE(NEW.sample_id, NEW.prompt_id, '') AS s)
+    WHERE true
+    ON CONFLICT(modelname, category) DO UPDATE SET
+        n = n + excluded.n,
+        sum_semantic = sum_semantic + excluded.sum_semantic, sumsq_semantic = sumsq_semantic + excluded.sumsq_semantic,
+        sum_motion = sum_motion + excluded.sum_motion, sumsq_motion = sumsq_motion + excluded.sumsq_motion,
+        sum_temporal = sum_temporal + excluded.sum_temporal, sumsq_temporal = sumsq_temporal + excluded.sumsq_temporal,
+        sum_realism = sum_realism + excluded.sum_realism, sumsq_realism = sumsq_realism + excluded.sumsq_realism;
+
+    DELETE FROM score_cube WHERE n = 0;
+END;
+
+-- 触发器：删除评分（含视频级联删除）时减去
+CREATE TRIGGER IF NOT EXISTS score_cube_on_rating_delete
+AFTER DELETE ON ratings
+FOR EACH ROW
+BEGIN
+    INSERT INTO score_cube (modelname, category, n,
+                            sum_semantic, sumsq_semantic, sum_motion, sumsq_motion,
+                            sum_temporal, sumsq_temporal, sum_realism, sumsq_realism)
+    SELECT COALESCE(OLD.modelname, ''),
+           CASE WHEN s GLOB '*_[0-9][0-9][0-9]_single' THEN substr(s, 1, length(s) - 11)
+                WHEN s GLOB '*_[0-9][0-9][0-9]_multi' THEN substr(s, 1, length(s) - 10)
+                ELSE '' END,
+           -1,
+           -OLD.score_semantic, -OLD.score_semantic * OLD.score_semantic,
+           -OLD.score_motion, -OLD.score_motion * OLD.score_motion,
+           -OLD.score_temporal, -OLD.score_temporal * OLD.score_temporal,
+           -OLD.score_realism, -OLD.score_realism * OLD.score_realism
+    FROM (SELECT COALESCE(OLD.sample_id, OLD.prompt_id, '') AS s)
+    WHERE true
+    ON CONFLICT(modelname, category) DO UPDATE SET
+        n = n + excluded.n,
+        sum_semantic = sum_semantic + excluded.sum_semantic, sumsq_semantic = sumsq_semantic + excluded.sumsq_semantic,
+        sum_motion = sum_motion + excluded.sum_motion, sumsq_motion = sumsq_motion + excluded.sumsq_motion,
+        sum_temporal = sum_temporal + excluded.sum_temporal, sumsq_temporal = sumsq_temporal + excluded.sumsq_temporal,
+        sum_realism = sum_realism + excluded.sum_realism, sumsq_realism = sumsq_realism + excluded.sumsq_realism;
+
+    DELETE FROM score_cube WHERE n = 0;
+END;
+
+-- 评分变更日志：每次新增 / 重新打分 / 删除追加一行（scripts/export_incremental.py 按 seq 水位增量导出）
+CREATE TABLE IF NOT EXISTS rating_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    rating_id INTEGER NOT NULL,
+    op TEXT NOT NULL CHECK(op IN ('upsert', 'delete'))
+);
+
+CREATE TRIGGER IF NOT EXISTS rating_changes_on_insert
+AFTER INSERT ON ratings
+FOR EACH ROW
+BEGIN
+    INSERT INTO rating_changes (rating_id, op) VALUES (NEW.id, 'upsert');
+END;
+
+CREATE TRIGGER IF NOT EXISTS rating_changes_on_update
+AFTER UPDATE ON ratings
+FOR EACH ROW
+BEGIN
+    INSERT INTO rating_changes (rating_id, op) VALUES (NEW.id, 'upsert');
+END;
+
+CREATE TRIGGER IF NOT EXISTS rating_changes_on_delete
+AFTER DELETE ON ratings
+FOR EACH ROW
+BEGIN
+    INSERT INTO rating_changes (rating_id, op) VALUES (OLD.id, 'delete');
+END;
+
 -- 视图：任务完成度统计
 CREATE VIEW IF NOT EXISTS task_completion_stats AS
 SELECT 
@@ -153,11 +305,11 @@ CREATE VIEW IF NOT EXISTS judge_workload_stats AS
 SELECT 
     j.id as judge_id,
     j.name as judge_name,
-    COUNT(DISTINCT a.id) as total_assigned,
+    COUNT(DISTINCT a.task_id) as total_assigned,
     SUM(CASE WHEN a.finished = 1 THEN 1 ELSE 0 END) as completed,
     SUM(CASE WHEN a.finished = 0 THEN 1 ELSE 0 END) as pending,
     COUNT(DISTINCT r.id) as total_ratings,
-    ROUND(100.0 * SUM(CASE WHEN a.finished = 1 THEN 1 ELSE 0 END) / COUNT(DISTINCT a.id), 2) as completion_rate
+    ROUND(100.0 * SUM(CASE WHEN a.finished = 1 THEN 1 ELSE 0 END) / COUNT(DISTINCT a.task_id), 2) as completion_rate
 FROM judges j
 LEFT JOIN assignments a ON j.id = a.judge_id
 LEFT JOIN ratings r ON j.id = r.judge_id
@@ -72,6 +72,36 @@ CREATE TABLE IF NOT EXISTS comparisons (
     UNIQUE(task_id, judge_id)           -- 每个评审员对每个任务只能评一次
 );
 
+-- 7. 实时Elo排行榜（app/elo_compare.py 在每次提交时更新）
+CREATE TABLE IF NOT EXISTS model_elo (
+    scope TEXT NOT NULL,                -- 'ALL' 或类别名
+    model_name TEXT NOT NULL,
+    rating REAL NOT NULL DEFAULT 1000,
+    wins INTEGER NOT NULL DEFAULT 0,
+    ties INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP,
+    PRIMARY KEY (scope, model_name)
+) WITHOUT ROWID;
+
+-- 8. 每条评测施加的Elo变化（重判时用于精确撤销）
+CREATE TABLE IF NOT EXISTS elo_log (
+    comparison_id INTEGER NOT NULL,
+    scope TEXT NOT NULL,
+    model_a TEXT NOT NULL,
+    model_b TEXT NOT NULL,
+    score_a REAL NOT NULL,              -- 1=A胜，0=B胜，0.5=平局
+    delta REAL NOT NULL,                -- model_a 的评分变化（model_b 为其相反数）
+    PRIMARY KEY (comparison_id, scope)
+) WITHOUT ROWID;
+
+-- 9. 评测变更日志：每次提交 / 重判 / 删除追加一行（scripts/export_incremental.py 按 seq 水位增量导出）
+CREATE TABLE IF NOT EXISTS comparison_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    comparison_id INTEGER NOT NULL,
+    op TEXT NOT NULL CHECK(op IN ('upsert', 'delete'))
+);
+
 -- 创建索引（提升查询性能）
 CREATE INDEX IF NOT EXISTS idx_tasks_sample_id ON tasks(sample_id);
 CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks(completed);
@@ -113,3 +143,25 @@ BEGIN
     );
 END;
 
+-- 触发器3-5：评测变更写入变更日志
+CREATE TRIGGER IF NOT EXISTS comparison_changes_on_insert
+AFTER INSERT ON comparisons
+FOR EACH ROW
+BEGIN
+    INSERT INTO comparison_changes (comparison_id, op) VALUES (NEW.comparison_id, 'upsert');
+END;
+
+CREATE TRIGGER IF NOT EXISTS comparison_changes_on_update
+AFTER UPDATE ON comparisons
+FOR EACH ROW
+BEGIN
+    INSERT INTO comparison_changes (comparison_id, op) VALUES (NEW.comparison_id, 'upsert');
+END;
+
+CREATE TRIGGER IF NOT EXISTS comparison_changes_on_delete
+AFTER DELETE ON comparisons
+FOR EACH ROW
+BEGIN
+    INSERT INTO comparison_changes (comparison_id, op) VALUES (OLD.comparison_id, 'delete');
+END;
+
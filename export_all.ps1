@@ -1,4 +1,10 @@
 # Export Rating Data Script
+# Default: incremental export (only new/changed ratings since the last run)
+# -Full: additionally write complete timestamped wide/long snapshots
+
+param(
+    [switch]$Full
+)
 
 $ErrorActionPreference = "Stop"
 $pythonExe = "D:\miniconda3\envs\learn\python.exe"
@@ -32,24 +38,41 @@ if ($LASTEXITCODE -ne 0) {
     Write-Host "  [WARN] Progress check failed, continuing anyway..." -ForegroundColor Yellow
 }
 
-# Step 2: Export wide format
-Write-Host "`n[2/4] Exporting wide format (5 models)..." -ForegroundColor Yellow
-$wideFile = "$outputDir\ratings_wide_$timestamp.csv"
-& $pythonExe scripts\export_ratings.py --db $dbFile --out $wideFile --format wide
+# Step 2: Incremental export (rolling dataset + summaries from score_cube)
+Write-Host "`n[2/4] Incremental export..." -ForegroundColor Yellow
+$incrementalDir = "$outputDir\incremental"
+& $pythonExe scripts\export_incremental.py --db $dbFile --out-dir $incrementalDir
 if ($LASTEXITCODE -eq 0) {
-    Write-Host "  [OK] Wide format exported to: $wideFile" -ForegroundColor Green
+    Write-Host "  [OK] Rolling dataset updated in: $incrementalDir" -ForegroundColor Green
 } else {
-    Write-Host "  [ERROR] Wide format export failed" -ForegroundColor Red
+    Write-Host "  [ERROR] Incremental export failed" -ForegroundColor Red
 }
 
-# Step 3: Export long format
-Write-Host "`n[3/4] Exporting long format..." -ForegroundColor Yellow
+# Step 3: Full wide/long snapshots (only with -Full)
+$wideFile = "$outputDir\ratings_wide_$timestamp.csv"
 $longFile = "$outputDir\ratings_long_$timestamp.csv"
-& $pythonExe scripts\export_ratings.py --db $dbFile --out $longFile --format long
-if ($LASTEXITCODE -eq 0) {
-    Write-Host "  [OK] Long format exported to: $longFile" -ForegroundColor Green
+if ($Full) {
+    Write-Host "`n[3/4] Exporting full wide and long format (5 models)..." -ForegroundColor Yellow
+    & $pythonExe scripts\export_ratings.py --db $dbFile --out $wideFile --format wide
+    if ($LASTEXITCODE -eq 0) {
+        Write-Host "  [OK] Wide format exported to: $wideFile" -ForegroundColor Green
+    } else {
+        Write-Host "  [ERROR] Wide format export failed" -ForegroundColor Red
+    }
+    & $pythonExe scripts\export_ratings.py --db $dbFile --out $longFile --format long
+    if ($LASTEXITCODE -eq 0) {
+        Write-Host "  [OK] Long format exported to: $longFile" -ForegroundColor Green
+    } else {
+        Write-Host "  [ERROR] Long format export failed" -ForegroundColor Red
+    }
+    & $pythonExe scripts\export_columnar.py --db $dbFile --out-dir "$outputDir\columnar"
+    if ($LASTEXITCODE -eq 0) {
+        Write-Host "  [OK] Columnar analytics export: $outputDir\columnar" -ForegroundColor Green
+    } else {
+        Write-Host "  [ERROR] Columnar export failed" -ForegroundColor Red
+    }
 } else {
-    Write-Host "  [ERROR] Long format export failed" -ForegroundColor Red
+    Write-Host "`n[3/4] Skipping full wide/long export (use -Full)" -ForegroundColor Gray
 }
 
 # Step 4: Create summary
@@ -64,8 +87,11 @@ Write-Host "  Export Complete!" -ForegroundColor Green
 Write-Host "========================================" -ForegroundColor Cyan
 
 Write-Host "`nExported files:" -ForegroundColor Yellow
-Write-Host "  Wide format:  $wideFile" -ForegroundColor White
-Write-Host "  Long format:  $longFile" -ForegroundColor White
+Write-Host "  Incremental:  $incrementalDir\ratings_rolling.csv" -ForegroundColor White
+if ($Full) {
+    Write-Host "  Wide format:  $wideFile" -ForegroundColor White
+    Write-Host "  Long format:  $longFile" -ForegroundColor White
+}
 Write-Host "  Summary:      $summaryFile" -ForegroundColor White
 
 Write-Host "`nOutput directory: $outputDir" -ForegroundColor Cyan
@@ -1,4 +1,10 @@
 # Compare Mode - Export All Data
+# Default: incremental export (only new/changed comparisons since the last run)
+# -Full: additionally write complete timestamped exports
+
+param(
+    [switch]$Full
+)
 
 Write-Host "============================================================" -ForegroundColor Cyan
 Write-Host " Compare Mode - Export Data" -ForegroundColor Green
@@ -14,8 +20,14 @@ if (-not (Test-Path "aiv_compare_v1.db")) {
 Write-Host "Starting export..." -ForegroundColor Yellow
 Write-Host ""
 
-# Run export script
-python scripts\export_ratings_compare.py
+# Incremental export (rolling dataset + summaries from model_elo)
+python scripts\export_incremental.py --db aiv_compare_v1.db --out-dir export_results_compare\incremental
+
+# Full timestamped export (only with -Full)
+if ($Full) {
+    python scripts\export_ratings_compare.py
+    python scripts\export_columnar.py --db aiv_compare_v1.db --out-dir export_results_compare\columnar
+}
 
 Write-Host ""
 Write-Host "============================================================" -ForegroundColor Cyan
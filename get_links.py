@@ -1,6 +1,10 @@
-import sqlite3
 import socket
 import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'app'))
+import db_trace  # noqa: E402
 
 def get_local_ip():
     try:
@@ -24,7 +28,7 @@ def main():
     local_ip = get_local_ip()
     ui_port = 8502
 
-    conn = sqlite3.connect(db_path)
+    conn = db_trace.connect(db_path)
     cur = conn.cursor()
 
     cur.execute("SELECT name, token FROM judges ORDER BY id")
@@ -8,6 +8,10 @@
 import sqlite3
 import socket
 from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent / 'app'))
+import db_trace  # noqa: E402
 
 # 配置
 PROJECT_ROOT = Path(__file__).parent
@@ -29,7 +33,7 @@ def get_local_ip():
 
 def get_judge_links():
     """获取所有评审员链接"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = db_trace.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     
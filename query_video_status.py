@@ -7,14 +7,17 @@
   python query_video_status.py food_058_single cogvideo5b
 """
 import sys
-import sqlite3
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'app'))
+import db_trace  # noqa: E402
 
 if sys.platform == 'win32':
     import io
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
 def query_video(sample_id, modelname):
-    conn = sqlite3.connect('aiv_eval_v4.db')
+    conn = db_trace.connect('aiv_eval_v4.db')
     cur = conn.cursor()
     
     # 查找视频
@@ -95,7 +98,7 @@ def query_video(sample_id, modelname):
     
     # 查询assignments
     cur.execute('''
-        SELECT a.id, a.judge_id, j.name, a.finished, a.finished_at,
+        SELECT a.display_order, a.judge_id, j.name, a.finished, a.finished_at,
                (SELECT COUNT(*) FROM ratings r WHERE r.judge_id=a.judge_id AND r.video_id=?) as has_rating
         FROM assignments a
         JOIN judges j ON a.judge_id = j.id
@@ -108,12 +111,12 @@ def query_video(sample_id, modelname):
     print(f"\nassignments：{len(assignments)} 个")
     print("-"*80)
     if assignments:
-        print(f"{'Assign ID':<12} {'Judge ID':<10} {'Judge':<15} {'Finished':<10} {'Has Rating':<12}")
+        print(f"{'Order':<12} {'Judge ID':<10} {'Judge':<15} {'Finished':<10} {'Has Rating':<12}")
         print("-"*80)
-        for assign_id, judge_id, judge_name, finished, finished_at, has_rating in assignments:
+        for display_order, judge_id, judge_name, finished, finished_at, has_rating in assignments:
             finished_str = "✅ 是" if finished else "❌ 否"
             has_rating_str = "✅ 是" if has_rating else "❌ 否"
-            print(f"{assign_id:<12} {judge_id:<10} {judge_name:<15} {finished_str:<10} {has_rating_str:<12}")
+            print(f"{display_order:<12} {judge_id:<10} {judge_name:<15} {finished_str:<10} {has_rating_str:<12}")
     
     print("="*80)
     conn.close()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+比较评测模式 - 实时Elo排行榜查看
+
+直接读取 model_elo 表（评测服务每次提交时已在同一事务中更新），不需要导出或重新计算。
+
+用法：
+    python scripts/elo_leaderboard_compare.py                     # 整体排行榜
+    python scripts/elo_leaderboard_compare.py --all-scopes        # 整体 + 各类别
+    python scripts/elo_leaderboard_compare.py --scope animals_and_ecology
+    python scripts/elo_leaderboard_compare.py --watch 10          # 每10秒刷新
+    python scripts/elo_leaderboard_compare.py --rebuild           # 按时间顺序重放全部评测重建
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'app'))
+import db_trace  # noqa: E402
+from elo_compare import OVERALL, ensure_elo_schema, leaderboard, rebuild_elo, scopes  # noqa: E402
+
+if sys.platform == 'win32' and (sys.stdout.encoding or '').lower() != 'utf-8':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+DB_PATH = PROJECT_ROOT / "aiv_compare_v1.db"
+
+
+def print_leaderboard(conn, scope):
+    rows = leaderboard(conn, scope)
+    title = '整体' if scope == OVERALL else scope
+    print(f"\n  🏆 {title}（{len(rows)} 个模型）")
+    print(f"  {'排名':<4} {'模型':<15} {'Elo':>8} {'胜':>6} {'平':>6} {'负':>6} {'最后更新':>20}")
+    print(f"  {'-' * 72}")
+    for rank, (model_name, rating, wins, ties, losses, updated_at) in enumerate(rows, start=1):
+        print(f"  {rank:<6} {model_name:<15} {rating:>8.1f} {wins:>6} {ties:>6} {losses:>6} "
+              f"{updated_at or '-':>20}")
+
+
+def show(conn, args):
+    print("=" * 80)
+    print(f"比较评测模式 - 实时Elo排行榜  [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]")
+    print("=" * 80)
+    if args.all_scopes:
+        targets = scopes(conn)
+    else:
+        targets = [args.scope]
+    if not targets or not leaderboard(conn, targets[0]):
+        print("  ℹ️  还没有评测记录")
+        return
+    for scope in targets:
+        print_leaderboard(conn, scope)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='比较评测 - 实时Elo排行榜')
+    ap.add_argument('--db', default=str(DB_PATH), help='数据库路径')
+    ap.add_argument('--scope', default=OVERALL, help="排行榜范围：ALL（整体）或类别名")
+    ap.add_argument('--all-scopes', action='store_true', help='显示整体和所有类别')
+    ap.add_argument('--watch', type=float, default=0, help='每隔N秒刷新一次（0=只显示一次）')
+    ap.add_argument('--rebuild', action='store_true', help='清空并按评测时间顺序重放全部评测')
+    args = ap.parse_args()
+
+    if not Path(args.db).exists():
+        print(f"❌ 数据库不存在: {args.db}")
+        return 1
+
+    conn = db_trace.connect(args.db, timeout=10.0)
+    try:
+        ensure_elo_schema(conn)
+        if args.rebuild:
+            start = time.perf_counter()
+            count = rebuild_elo(conn)
+            print(f"✅ 已重放 {count} 条评测，用时 {time.perf_counter() - start:.2f}s")
+
+        if args.watch <= 0:
+            show(conn, args)
+            return 0
+        try:
+            while True:
+                print("\033[2J\033[H", end='')
+                show(conn, args)
+                time.sleep(args.watch)
+        except KeyboardInterrupt:
+            print("\n[STOP] 已停止刷新")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列式分析导出（Parquet / NPZ），与CSV导出并存
+
+CSV 每行都重复 prompt 文本、模型名、评审员名，分析时还要重新解析字符串。本导出：
+- 分数为 int8 列，ID 为定长整数列，时间为 datetime64[s]
+- 模型 / 评审员 / sample_id 做字典编码：列中只存整数编码，取值表单独保存一份
+- prompt 文本只在 prompts 表中保存一次（按 sample_id 关联）；sample_id 编码即 prompts 表行号
+
+输出目录中每个表一个文件：
+- 打分模式：ratings.<ext>、prompts.<ext>
+- 比较模式：comparisons.<ext>、prompts.<ext>
+安装了 pyarrow 时写 Parquet（字典列为原生 dictionary 类型，pandas/duckdb 可直接读取），
+否则写 NumPy .npz（字典列存为 <列名> 编码 + <列名>__dict 取值表；长文本列存为 UTF-8 字节 + 偏移量，
+不含pickle对象，读取时还原为字符串数组）。
+
+读取：
+    from export_columnar import load_columnar
+    data = load_columnar('export_results/columnar')
+    data['ratings']['score_semantic'], data['ratings']['model'], data['ratings']['model__dict']
+
+用法：
+    python scripts/export_columnar.py --db aiv_eval_v4.db
+    python scripts/export_columnar.py --db aiv_compare_v1.db --out-dir export_results_compare/columnar
+    python scripts/export_columnar.py --db aiv_eval_v4.db --format npz
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(PROJECT_ROOT / 'tools'))
+from backup_service import detect_mode  # noqa: E402
+from export_stream import open_snapshot  # noqa: E402
+from prepare_data import sample_category  # noqa: E402
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+if sys.platform == 'win32' and (sys.stdout.encoding or '').lower() != 'utf-8':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+DIMENSIONS = ['semantic', 'motion', 'temporal', 'realism']
+DEFAULT_OUT = {
+    'scoring': PROJECT_ROOT / 'export_results' / 'columnar',
+    'compare': PROJECT_ROOT / 'export_results_compare' / 'columnar',
+}
+DICT_SUFFIX = '__dict'
+TEXT_SUFFIXES = ('__utf8', '__offsets')
+
+
+def _int_array(values, dtype):
+    return np.array(values, dtype=dtype)
+
+
+def _time_array(values):
+    """'YYYY-MM-DD HH:MM:SS' 字符串（可为NULL）→ datetime64[s]"""
+    return np.array([v if v else None for v in values], dtype='datetime64[s]')
+
+
+def _text_array(values):
+    """短字符串列 → 定长unicode数组（npz不需要pickle即可读取）"""
+    return np.array(['' if v is None else str(v) for v in values], dtype=str)
+
+
+def pack_text(values):
+    """长文本列 → (UTF-8字节 uint8[], 偏移量 int64[n+1])；定长unicode会按最长文本补齐，体积大得多"""
+    encoded = [('' if v is None else str(v)).encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def unpack_text(data, offsets):
+    blob = data.tobytes()
+    return np.array([blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)],
+                    dtype=object)
+
+
+def encode(values, vocabulary=None):
+    """字典编码：返回 (codes, 取值表)。codes 用能容纳取值数的最小整数类型
+
+    vocabulary 给定时须已排序且包含全部取值（如 prompts 表的 sample_id 列，编码即 prompts 行号）
+    """
+    values = _text_array(values)
+    if vocabulary is None:
+        vocabulary, codes = np.unique(values, return_inverse=True)
+    else:
+        codes = np.searchsorted(vocabulary, values)
+    dtype = np.int8 if len(vocabulary) < 2 ** 7 else np.int16 if len(vocabulary) < 2 ** 15 else np.int32
+    return codes.astype(dtype), vocabulary
+
+
+class Table:
+    """列式表：普通列 + 字典编码列（codes, 取值表）"""
+
+    def __init__(self):
+        self.columns = {}
+        self.dictionaries = {}
+        self.texts = set()
+
+    def add(self, name, values):
+        self.columns[name] = values
+
+    def add_text(self, name, values):
+        self.columns[name] = ['' if v is None else str(v) for v in values]
+        self.texts.add(name)
+
+    def add_dict(self, name, values, vocabulary=None):
+        codes, vocabulary = encode(values, vocabulary)
+        self.columns[name] = codes
+        self.dictionaries[name] = vocabulary
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+
+def scoring_tables(conn):
+    """ratings + prompts（打分模式）"""
+    rows = conn.execute("""
+        SELECT r.id, r.judge_id, j.name, r.video_id, v.variant_index,
+               COALESCE(r.sample_id, r.prompt_id), COALESCE(r.modelname, v.modelname),
+               r.score_semantic, r.score_motion, r.score_temporal, r.score_realism, r.created_at
+        FROM ratings r
+        JOIN judges j ON j.id = r.judge_id
+        JOIN videos v ON v.id = r.video_id
+        ORDER BY r.id
+    """).fetchall()
+    cols = list(zip(*rows)) if rows else [()] * 12
+
+    ratings = Table()
+    ratings.add('rating_id', _int_array(cols[0], np.int64))
+    ratings.add('judge_id', _int_array(cols[1], np.int32))
+    ratings.add_dict('judge_name', cols[2])
+    ratings.add('video_id', _int_array(cols[3], np.int32))
+    ratings.add('variant', _int_array([v if v is not None else -1 for v in cols[4]], np.int16))
+    samples = _prompts(conn, "SELECT id, text FROM prompts", cols[5])
+    ratings.add_dict('sample_id', cols[5], samples.columns['sample_id'])
+    ratings.add_dict('model', cols[6])
+    for i, d in enumerate(DIMENSIONS):
+        ratings.add(f'score_{d}', _int_array(cols[7 + i], np.int8))
+    ratings.add('created_at', _time_array(cols[11]))
+    return {'ratings': ratings, 'prompts': samples}
+
+
+def compare_tables(conn):
+    """comparisons + prompts（比较模式）。outcome：1=model_a胜，-1=model_b胜，0=平局"""
+    rows = conn.execute("""
+        SELECT c.comparison_id, c.task_id, c.judge_id, j.judge_name,
+               t.sample_id, t.model_a, t.model_b,
+               CASE WHEN c.chosen_model = t.model_a THEN 1 WHEN c.chosen_model = t.model_b THEN -1 ELSE 0 END,
+               c.rating_time, c.comment
+        FROM comparisons c
+        JOIN tasks t ON t.task_id = c.task_id
+        JOIN judges j ON j.judge_id = c.judge_id
+        ORDER BY c.comparison_id
+    """).fetchall()
+    cols = list(zip(*rows)) if rows else [()] * 10
+
+    comparisons = Table()
+    comparisons.add('comparison_id', _int_array(cols[0], np.int64))
+    comparisons.add('task_id', _int_array(cols[1], np.int32))
+    comparisons.add('judge_id', _int_array(cols[2], np.int32))
+    comparisons.add_dict('judge_name', cols[3])
+    samples = _prompts(conn, "SELECT sample_id, prompt_text FROM prompts", cols[4])
+    comparisons.add_dict('sample_id', cols[4], samples.columns['sample_id'])
+    # model_a / model_b 共用一张取值表
+    models = np.unique(_text_array(cols[5] + cols[6]))
+    comparisons.add_dict('model_a', cols[5], models)
+    comparisons.add_dict('model_b', cols[6], models)
+    comparisons.add('outcome', _int_array(cols[7], np.int8))
+    comparisons.add('rating_time', _time_array(cols[8]))
+    # 评论很少：只保存有评论的行
+    commented = [i for i, c in enumerate(cols[9]) if c]
+    comments = Table()
+    comments.add('comparison_id', comparisons.columns['comparison_id'][commented])
+    comments.add_text('comment', [cols[9][i] for i in commented])
+    return {'comparisons': comparisons, 'prompts': samples, 'comments': comments}
+
+
+def _prompts(conn, sql, used_ids=()):
+    """prompts 表（按 sample_id 排序，每个 sample 一行）；评分中出现但不在 prompts 里的 sample 文本为空"""
+    texts = dict(conn.execute(sql).fetchall())
+    ids = np.unique(_text_array(list(texts) + list(used_ids)))
+    prompts = Table()
+    prompts.add('sample_id', ids)
+    prompts.add('category', _text_array([sample_category(s) or '' for s in ids.tolist()]))
+    prompts.add_text('prompt_text', [texts.get(s) for s in ids.tolist()])
+    return prompts
+
+
+def write_npz(path, table):
+    arrays = {}
+    for name, values in table.columns.items():
+        if name in table.texts:
+            arrays[name + TEXT_SUFFIXES[0]], arrays[name + TEXT_SUFFIXES[1]] = pack_text(values)
+        else:
+            arrays[name] = values
+    for name, vocabulary in table.dictionaries.items():
+        arrays[name + DICT_SUFFIX] = vocabulary
+    np.savez(path, **arrays)
+
+
+def write_parquet(path, table):
+    fields = {}
+    for name, values in table.columns.items():
+        if name in table.dictionaries:
+            fields[name] = pa.DictionaryArray.from_arrays(values, table.dictionaries[name])
+        else:
+            fields[name] = pa.array(values)
+    pq.write_table(pa.table(fields), path, compression='zstd')
+
+
+def export_columnar(conn, mode, out_dir, fmt):
+    """写出所有表，返回 [(文件, 行数)]"""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tables = scoring_tables(conn) if mode == 'scoring' else compare_tables(conn)
+    written = []
+    for name, table in tables.items():
+        path = out_dir / f"{name}.{fmt}"
+        (write_parquet if fmt == 'parquet' else write_npz)(path, table)
+        written.append((path, len(table)))
+    return written
+
+
+def load_columnar(directory):
+    """读取导出目录（Parquet或NPZ），返回 {表名: {列名: ndarray}}；字典列为编码，取值表在 <列名>__dict"""
+    result = {}
+    for path in sorted(Path(directory).iterdir()):
+        if path.suffix == '.npz':
+            with np.load(path) as data:
+                columns = {key: data[key] for key in data.files if not key.endswith(TEXT_SUFFIXES)}
+                for key in data.files:
+                    if key.endswith(TEXT_SUFFIXES[0]):
+                        name = key[:-len(TEXT_SUFFIXES[0])]
+                        columns[name] = unpack_text(data[key], data[name + TEXT_SUFFIXES[1]])
+                result[path.stem] = columns
+        elif path.suffix == '.parquet':
+            if pq is None:
+                raise ImportError(f"读取 {path.name} 需要 pyarrow")
+            columns = {}
+            for name, column in zip(pq.read_schema(path).names, pq.read_table(path).columns):
+                column = column.combine_chunks()
+                if pa.types.is_dictionary(column.type):
+                    columns[name] = column.indices.to_numpy(zero_copy_only=False)
+                    columns[name + DICT_SUFFIX] = column.dictionary.to_numpy(zero_copy_only=False)
+                else:
+                    columns[name] = column.to_numpy(zero_copy_only=False)
+            result[path.stem] = columns
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser(description='列式分析导出（Parquet / NPZ）')
+    ap.add_argument('--db', required=True, help='数据库路径')
+    ap.add_argument('--out-dir', help='输出目录（默认 export_results/columnar 或 export_results_compare/columnar）')
+    ap.add_argument('--format', choices=['auto', 'parquet', 'npz'], default='auto',
+                    help='auto=安装了pyarrow时用Parquet，否则NPZ')
+    ap.add_argument('--mode', choices=['scoring', 'compare'], help='默认根据数据库结构自动判断')
+    args = ap.parse_args()
+
+    if not Path(args.db).exists():
+        print(f"❌ 数据库不存在: {args.db}")
+        return 1
+    fmt = args.format
+    if fmt == 'auto':
+        fmt = 'parquet' if pq is not None else 'npz'
+    elif fmt == 'parquet' and pq is None:
+        print("❌ 未安装 pyarrow，无法写Parquet（pip install pyarrow，或使用 --format npz）")
+        return 1
+    mode = args.mode or detect_mode(args.db)
+    out_dir = Path(args.out_dir) if args.out_dir else DEFAULT_OUT[mode]
+
+    start = time.perf_counter()
+    with open_snapshot(args.db) as (conn, description):
+        written = export_columnar(conn, mode, out_dir, fmt)
+    elapsed = time.perf_counter() - start
+
+    print(f"[OK] 列式导出（{fmt}，{description}），用时 {elapsed:.2f}s")
+    for path, rows in written:
+        print(f"     {path.name}: {rows} 行，{path.stat().st_size / 1048576:.2f} MB")
+
+    start = time.perf_counter()
+    load_columnar(out_dir)
+    print(f"     重新读取全部表用时 {(time.perf_counter() - start) * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
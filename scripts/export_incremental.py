@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量导出（打分模式 ratings / 比较模式 comparisons）
+
+评测进行中定期导出时，不再每次重导全部历史：
+- ratings / comparisons 上的触发器把每次新增、重新打分（重判）、删除写入变更日志
+  （rating_changes / comparison_changes，seq 单调递增）
+- 导出目录中的 incremental_state.json 记录上次导出到的 seq（水位）；
+  每次只读取 seq > 水位 的变更，追加到滚动数据集 <ratings|comparisons>_rolling.csv，
+  耗时只与新增数据量有关
+- 滚动数据集每行带 change_seq 和 op（upsert / delete）：同一ID以 change_seq 最大的一行为准，
+  op=delete 表示该记录已被删除（其余列为空）
+- 汇总文件每次覆盖刷新，读取物化聚合表而不扫描明细：
+  打分模式读 score_cube（模型、模型×类别），比较模式读 model_elo（各scope排行榜）
+
+第一次运行、数据库被恢复（水位超过当前最大seq）、滚动数据集丢失或指定 --full 时，
+从一致性快照全量重写滚动数据集（相当于压缩：每个ID只保留当前状态）。
+旧数据库第一次运行时自动创建变更日志表和触发器。
+
+用法：
+    python scripts/export_incremental.py --db aiv_eval_v4.db
+    python scripts/export_incremental.py --db aiv_compare_v1.db --out-dir export_results_compare/incremental
+    python scripts/export_incremental.py --db aiv_eval_v4.db --full        # 全量重写（压缩滚动数据集）
+"""
+
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(PROJECT_ROOT / 'tools'))
+sys.path.insert(0, str(PROJECT_ROOT / 'app'))
+from backup_service import detect_mode  # noqa: E402
+import db_trace  # noqa: E402
+from export_stream import DEFAULT_BATCH_SIZE, ExportProgress, iter_rows, open_csv, open_snapshot  # noqa: E402
+
+if sys.platform == 'win32' and (sys.stdout.encoding or '').lower() != 'utf-8':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+STATE_FILE = 'incremental_state.json'
+
+# 每种模式：明细表、变更日志、滚动数据集的列，以及明细查询的列和连接
+MODES = {
+    'scoring': {
+        'key': 'id',
+        'table': 'ratings',
+        'log': 'rating_changes',
+        'log_key': 'rating_id',
+        'dataset': 'ratings_rolling.csv',
+        'default_out': PROJECT_ROOT / 'export_results' / 'incremental',
+        'columns': ['rating_id', 'created_at', 'judge_id', 'judge_name', 'sample_id', 'prompt_text',
+                    'video_id', 'variant', 'modelname', 'video_path',
+                    'score_semantic', 'score_motion', 'score_temporal', 'score_realism'],
+        'select': """
+            r.created_at, j.id, j.name, p.id, p.text,
+            v.id, v.variant_index, v.modelname, v.path,
+            r.score_semantic, r.score_motion, r.score_temporal, r.score_realism
+        """,
+        'joins': """
+            JOIN judges j ON j.id = r.judge_id
+            JOIN videos v ON v.id = r.video_id
+            JOIN prompts p ON p.id = v.prompt_id
+        """,
+        'alias': 'r',
+        'ddl': [
+            """
+            CREATE TABLE IF NOT EXISTS rating_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                rating_id INTEGER NOT NULL,
+                op TEXT NOT NULL CHECK(op IN ('upsert', 'delete'))
+            )
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS rating_changes_on_insert
+            AFTER INSERT ON ratings
+            FOR EACH ROW
+            BEGIN
+                INSERT INTO rating_changes (rating_id, op) VALUES (NEW.id, 'upsert');
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS rating_changes_on_update
+            AFTER UPDATE ON ratings
+            FOR EACH ROW
+            BEGIN
+                INSERT INTO rating_changes (rating_id, op) VALUES (NEW.id, 'upsert');
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS rating_changes_on_delete
+            AFTER DELETE ON ratings
+            FOR EACH ROW
+            BEGIN
+                INSERT INTO rating_changes (rating_id, op) VALUES (OLD.id, 'delete');
+            END
+            """,
+        ],
+    },
+    'compare': {
+        'key': 'comparison_id',
+        'table': 'comparisons',
+        'log': 'comparison_changes',
+        'log_key': 'comparison_id',
+        'dataset': 'comparisons_rolling.csv',
+        'default_out': PROJECT_ROOT / 'export_results_compare' / 'incremental',
+        'columns': ['comparison_id', 'task_id', 'sample_id', 'category', 'prompt_text',
+                    'model_a', 'model_b', 'judge_id', 'judge_name',
+                    'chosen_model', 'comment', 'rating_time'],
+        'select': """
+            c.task_id, t.sample_id, p.category, p.prompt_text,
+            t.model_a, t.model_b, c.judge_id, j.judge_name,
+            c.chosen_model, c.comment, c.rating_time
+        """,
+        'joins': """
+            JOIN tasks t ON c.task_id = t.task_id
+            JOIN prompts p ON t.sample_id = p.sample_id
+            JOIN judges j ON c.judge_id = j.judge_id
+        """,
+        'alias': 'c',
+        'ddl': [
+            """
+            CREATE TABLE IF NOT EXISTS comparison_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                comparison_id INTEGER NOT NULL,
+                op TEXT NOT NULL CHECK(op IN ('upsert', 'delete'))
+            )
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS comparison_changes_on_insert
+            AFTER INSERT ON comparisons
+            FOR EACH ROW
+            BEGIN
+                INSERT INTO comparison_changes (comparison_id, op) VALUES (NEW.comparison_id, 'upsert');
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS comparison_changes_on_update
+            AFTER UPDATE ON comparisons
+            FOR EACH ROW
+            BEGIN
+                INSERT INTO comparison_changes (comparison_id, op) VALUES (NEW.comparison_id, 'upsert');
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS comparison_changes_on_delete
+            AFTER DELETE ON comparisons
+            FOR EACH ROW
+            BEGIN
+                INSERT INTO comparison_changes (comparison_id, op) VALUES (OLD.comparison_id, 'delete');
+            END
+            """,
+        ],
+    },
+}
+
+
+def install_changelog(db_path, spec):
+    """旧数据库：创建变更日志表和触发器（已存在时不写入）。返回是否新建"""
+    with contextlib.closing(db_trace.connect(db_path, timeout=10.0, isolation_level=None)) as conn:
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?",
+                              (f"{spec['log']}_on_delete",)).fetchone()
+        if exists:
+            return False
+        conn.execute("BEGIN IMMEDIATE")
+        for sql in spec['ddl']:
+            conn.execute(sql)
+        conn.execute("COMMIT")
+        return True
+
+
+def load_state(out_dir):
+    path = out_dir / STATE_FILE
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(out_dir, state):
+    path = out_dir / STATE_FILE
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def high_watermark(conn, spec):
+    return conn.execute(f"SELECT COALESCE(MAX(seq), 0) FROM {spec['log']}").fetchone()[0]
+
+
+def full_rows(conn, spec):
+    """当前全部记录（全量重写用），与增量行格式相同：op, id, 其余列"""
+    a = spec['alias']
+    return conn.execute(f"""
+        SELECT 'upsert', {a}.{spec['key']}, {spec['select']}
+        FROM {spec['table']} {a}
+        {spec['joins']}
+        ORDER BY {a}.{spec['key']}
+    """)
+
+
+def changed_rows(conn, spec, watermark):
+    """水位之后的变更：每个ID只取最后一次变更（按 seq 排序）；已删除的记录其余列为空"""
+    a = spec['alias']
+    joins = spec['joins'].replace('JOIN ', 'LEFT JOIN ')
+    return conn.execute(f"""
+        SELECT ch.seq, ch.op, ch.{spec['log_key']}, {spec['select']}
+        FROM {spec['log']} ch
+        LEFT JOIN {spec['table']} {a} ON {a}.{spec['key']} = ch.{spec['log_key']} AND ch.op = 'upsert'
+        {joins}
+        WHERE ch.seq IN (
+            SELECT MAX(seq) FROM {spec['log']} WHERE seq > ? GROUP BY {spec['log_key']}
+        )
+        ORDER BY ch.seq
+    """, (watermark,))
+
+
+def write_full(conn, spec, dataset_path, high, batch_size):
+    """全量重写滚动数据集（先写临时文件再替换）"""
+    tmp = dataset_path.with_name(dataset_path.name + '.tmp')
+    progress = ExportProgress('全量')
+    with open_csv(tmp) as f:
+        w = csv.writer(f)
+        w.writerow(['change_seq', 'op'] + spec['columns'])
+        for row in iter_rows(full_rows(conn, spec), batch_size):
+            w.writerow((high,) + tuple(row))
+            progress.update()
+    os.replace(tmp, dataset_path)
+    progress.finish(dataset_path)
+    return progress.count
+
+
+def append_changes(conn, spec, dataset_path, watermark, batch_size):
+    """把水位之后的变更追加到滚动数据集"""
+    progress = ExportProgress('增量')
+    with open(dataset_path, 'a', encoding='utf-8', newline='') as f:
+        w = csv.writer(f)
+        for row in iter_rows(changed_rows(conn, spec, watermark), batch_size):
+            w.writerow(row)
+            progress.update()
+    progress.finish(dataset_path)
+    return progress.count
+
+
+def write_csv(path, header, rows):
+    tmp = path.with_name(path.name + '.tmp')
+    with open_csv(tmp) as f:
+        w = csv.writer(f)
+        w.writerow(header)
+        w.writerows(rows)
+    os.replace(tmp, path)
+
+
+def task_progress(conn):
+    total, completed = conn.execute("SELECT COUNT(*), COALESCE(SUM(completed), 0) FROM tasks").fetchone()
+    return total, completed
+
+
+def refresh_scoring_summary(conn, out_dir):
+    """打分模式汇总：读取 score_cube（几十行），不扫描 ratings"""
+    from score_cube import DIMENSIONS, cube_in_sync, cube_slice, has_cube
+    if not has_cube(conn):
+        print("  ℹ️  数据库没有score_cube，跳过模型汇总（运行 scripts/score_cube.py --install）")
+        return []
+    if not cube_in_sync(conn):
+        print("  ⚠️  score_cube 与 ratings 不一致，跳过模型汇总（运行 scripts/score_cube.py --install）")
+        return []
+    fields = ['n'] + [f"{d}_{s}" for d in DIMENSIONS for s in ('mean', 'std', 'ci')]
+
+    def rounded(record, keys):
+        return [record[k] if not isinstance(record[k], float) else round(record[k], 4) for k in keys]
+
+    written = []
+    for name, keys in (('summary_model.csv', ['modelname']),
+                       ('summary_model_category.csv', ['modelname', 'category'])):
+        rows = cube_slice(conn, tuple(keys))
+        write_csv(out_dir / name, keys + fields, [rounded(r, keys + fields) for r in rows])
+        written.append(name)
+    return written
+
+
+def refresh_compare_summary(conn, out_dir):
+    """比较模式汇总：读取 model_elo（各scope排行榜）"""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'model_elo'").fetchone()
+    if not exists:
+        print("  ℹ️  数据库没有model_elo，跳过排行榜汇总（运行 scripts/elo_leaderboard_compare.py 自动创建）")
+        return []
+    rows = conn.execute("""
+        SELECT scope, model_name, ROUND(rating, 2), wins, ties, losses, updated_at
+        FROM model_elo
+        ORDER BY scope = 'ALL' DESC, scope, rating DESC
+    """).fetchall()
+    write_csv(out_dir / 'summary_elo.csv',
+              ['scope', 'model_name', 'elo', 'wins', 'ties', 'losses', 'updated_at'], rows)
+    return ['summary_elo.csv']
+
+
+def write_progress_summary(conn, out_dir, mode, state):
+    total, completed = task_progress(conn)
+    with open(out_dir / 'summary.txt', 'w', encoding='utf-8') as f:
+        f.write("=" * 80 + "\n")
+        f.write(f"{'打分模式' if mode == 'scoring' else '比较评测模式'} - 增量导出摘要\n")
+        f.write(f"导出时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write("=" * 80 + "\n\n")
+        f.write(f"  总任务数: {total}\n")
+        f.write(f"  已完成: {completed}\n")
+        f.write(f"  完成率: {completed / total * 100 if total else 0:.2f}%\n")
+        f.write(f"  变更水位(seq): {state['watermark']}\n")
+        f.write(f"  滚动数据集行数: {state['rows']}\n")
+
+
+def export_incremental(db_path, out_dir, mode=None, full=False, batch_size=DEFAULT_BATCH_SIZE):
+    """执行一次增量（或全量）导出，返回新的状态"""
+    db_path = Path(db_path)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    mode = mode or detect_mode(db_path)
+    spec = MODES[mode]
+    dataset_path = out_dir / spec['dataset']
+
+    if install_changelog(db_path, spec):
+        print(f"  ✅ 已创建变更日志 {spec['log']} 及触发器（之后的提交会被记录）")
+
+    state = load_state(out_dir)
+    reason = None
+    if full:
+        reason = '指定 --full'
+    elif state is None:
+        reason = '首次导出'
+    elif state.get('mode') != mode or state.get('db') != str(db_path.resolve()):
+        reason = '数据库与上次不同'
+    elif not dataset_path.exists():
+        reason = '滚动数据集不存在'
+    else:
+        with contextlib.closing(db_trace.connect(db_path, timeout=10.0)) as probe:
+            current = high_watermark(probe, spec)
+        if state['watermark'] > current:
+            reason = f"水位 {state['watermark']} 超过数据库当前最大seq {current}（数据库被恢复？）"
+
+    # 全量时用一致性快照（非WAL库先复制副本，不阻塞提交）；增量只读少量新变更，直接用一个短读事务
+    snapshot = open_snapshot(db_path) if reason else _short_read(db_path)
+    with snapshot as (conn, _):
+        high = high_watermark(conn, spec)
+        if reason is not None:
+            print(f"  全量重写滚动数据集：{reason}")
+            rows = write_full(conn, spec, dataset_path, high, batch_size)
+            state = {'mode': mode, 'db': str(db_path.resolve()), 'watermark': high, 'rows': rows}
+        else:
+            appended = append_changes(conn, spec, dataset_path, state['watermark'], batch_size)
+            print(f"  增量追加 {appended} 行（seq {state['watermark']} → {high}）")
+            state = {**state, 'watermark': high, 'rows': state['rows'] + appended}
+        state['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        save_state(out_dir, state)
+
+        summaries = (refresh_scoring_summary if mode == 'scoring' else refresh_compare_summary)(conn, out_dir)
+        write_progress_summary(conn, out_dir, mode, state)
+    print(f"  ✅ 滚动数据集: {dataset_path}")
+    for name in summaries + ['summary.txt']:
+        print(f"  ✅ 汇总: {out_dir / name}")
+    return state
+
+
+@contextlib.contextmanager
+def _short_read(db_path):
+    """增量读取用的普通读事务（只读取水位之后的少量变更，持有时间很短）"""
+    conn = db_trace.connect(db_path, timeout=10.0, isolation_level=None)
+    try:
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute("BEGIN")
+        yield conn, "读事务"
+    finally:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        conn.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description='增量导出（按变更日志水位追加到滚动数据集）')
+    ap.add_argument('--db', required=True, help='数据库路径')
+    ap.add_argument('--out-dir', help='导出目录（默认 export_results/incremental 或 export_results_compare/incremental）')
+    ap.add_argument('--mode', choices=sorted(MODES), help='默认根据数据库结构自动判断')
+    ap.add_argument('--full', action='store_true', help='全量重写滚动数据集（压缩历史变更）')
+    ap.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='每批从数据库读取的行数')
+    args = ap.parse_args()
+
+    if not Path(args.db).exists():
+        print(f"❌ 数据库不存在: {args.db}")
+        return 1
+    mode = args.mode or detect_mode(args.db)
+    out_dir = Path(args.out_dir) if args.out_dir else MODES[mode]['default_out']
+
+    print("=" * 80)
+    print(f"增量导出 - {'打分模式' if mode == 'scoring' else '比较评测模式'}")
+    print("=" * 80)
+    start = time.perf_counter()
+    state = export_incremental(args.db, out_dir, mode, args.full, args.batch_size)
+    print(f"\n  水位 seq={state['watermark']}，滚动数据集共 {state['rows']} 行，用时 {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,13 @@
-import argparse, sqlite3, csv
-from collections import defaultdict
+import argparse, csv
+from itertools import groupby
+from pathlib import Path
 import os
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+import db_trace  # noqa: E402
+from export_stream import DEFAULT_BATCH_SIZE, ExportProgress, iter_rows, open_csv, output_path  # noqa: E402
 
 # 根据数据规模定义模型列表
 # 可以通过环境变量 AIV_DATA_SCALE 控制
@@ -19,11 +26,25 @@ def main():
     ap.add_argument("--out", required=True, help='输出CSV路径')
     ap.add_argument("--format", choices=['wide', 'long'], default='wide', 
                    help='导出格式：wide=宽表（每个模型一列），long=长表（原始格式）')
+    ap.add_argument("--gzip", action='store_true', help='gzip压缩输出（自动添加.gz后缀）')
+    ap.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help='每批从数据库读取的行数')
+    ap.add_argument("--agreement", action='store_true',
+                   help='同时导出评审一致性（<输出名>_agreement.csv / _agreement_pairs.csv，需要numpy）')
+    ap.add_argument("--normalize", choices=['als', 'zscore'],
+                   help='在原始分旁边输出评审员偏差校正后的分数（*_norm列，需要numpy）')
     args = ap.parse_args()
     
-    conn = sqlite3.connect(args.db)
+    out_path = output_path(args.out, args.gzip)
+    conn = db_trace.connect(args.db)
     cur = conn.cursor()
     
+    # 评审员偏差校正：导出前一次性读入全部评分拟合，得到 rating_id → 校正分
+    normalized = None
+    if args.normalize:
+        from judge_normalization import normalized_scores
+        normalized = normalized_scores(conn, args.normalize)
+        missing = ('', '', '', '')
+    
     if args.format == 'long':
         # 原始长表格式：每个评分一行
         cur.execute(
@@ -40,31 +61,34 @@ def main():
             ORDER BY j.id, p.id, v.modelname
             """
         )
-        rows = cur.fetchall()
         header = ["rating_id","created_at","judge_id","judge_name","sample_id","prompt_text",
                  "video_id","variant","modelname","video_path","score_semantic","score_motion","score_temporal","score_realism"]
-        with open(args.out,"w",newline="",encoding="utf-8-sig") as f:
-            w=csv.writer(f); w.writerow(header); w.writerows(rows)
-        print(f"[OK] 导出 {len(rows)} 条评分（长表格式） -> {args.out}")
+        if normalized is not None:
+            header += ["score_semantic_norm","score_motion_norm","score_temporal_norm","score_realism_norm"]
+        progress = ExportProgress('长表')
+        with open_csv(out_path, args.gzip) as f:
+            w=csv.writer(f); w.writerow(header)
+            for row in iter_rows(cur, args.batch_size):
+                if normalized is not None:
+                    row = row + normalized.get(row[0], missing)
+                w.writerow(row)
+                progress.update()
+        progress.finish(out_path)
+        print(f"[OK] 导出 {progress.count} 条评分（长表格式） -> {out_path}")
     
     else:
         # 宽表格式：每个prompt+judge一行，每个模型的4个维度各占一列
         # 结构：judge_id, judge_name, sample_id, prompt_text, 
         #       [modelname]_semantic, [modelname]_motion, [modelname]_temporal, [modelname]_realism (x7个模型)
         
-        # 收集数据：(judge_id, prompt_id) -> {model: {scores}}
-        data = defaultdict(lambda: {
-            'judge_name': None,
-            'prompt_text': None,
-            'models': {model: {'semantic': '', 'motion': '', 'temporal': '', 'realism': ''} for model in MODELS}
-        })
-        
+        # 按 (judge_id, prompt_id) 排序后逐组写出，任意时刻只在内存中保留一组
         cur.execute(
             """
             SELECT j.id as judge_id, j.name as judge_name,
                    p.id as prompt_id, p.text as prompt_text,
                    v.modelname,
-                   r.score_semantic, r.score_motion, r.score_temporal, r.score_realism
+                   r.score_semantic, r.score_motion, r.score_temporal, r.score_realism,
+                   r.id
             FROM ratings r
             JOIN judges j ON j.id = r.judge_id
             JOIN videos v ON v.id = r.video_id
@@ -73,19 +97,6 @@ def main():
             """
         )
         
-        for row in cur.fetchall():
-            judge_id, judge_name, prompt_id, prompt_text, model, sem, mot, tem, rea = row
-            key = (judge_id, prompt_id)
-            data[key]['judge_name'] = judge_name
-            data[key]['prompt_text'] = prompt_text
-            if model in data[key]['models']:
-                data[key]['models'][model] = {
-                    'semantic': sem,
-                    'motion': mot,
-                    'temporal': tem,
-                    'realism': rea
-                }
-        
         # 构建宽表
         header = ['judge_id', 'judge_name', 'sample_id', 'prompt_text']
         for model in MODELS:
@@ -95,27 +106,48 @@ def main():
                 f'{model}_temporal',
                 f'{model}_realism'
             ])
+            if normalized is not None:
+                # 校正分紧跟在该模型的原始分之后
+                header.extend([f'{model}_{dim}_norm' for dim in ('semantic', 'motion', 'temporal', 'realism')])
+        width = 8 if normalized is not None else 4
+        model_offset = {model: 4 + width * i for i, model in enumerate(MODELS)}
         
-        rows = []
-        for (judge_id, prompt_id), entry in sorted(data.items()):
-            row = [judge_id, entry['judge_name'], prompt_id, entry['prompt_text']]
-            for model in MODELS:
-                scores = entry['models'][model]
-                row.extend([
-                    scores['semantic'],
-                    scores['motion'],
-                    scores['temporal'],
-                    scores['realism']
-                ])
-            rows.append(row)
-        
-        with open(args.out, "w", newline="", encoding="utf-8-sig") as f:
+        progress = ExportProgress('宽表')
+        with open_csv(out_path, args.gzip) as f:
             w = csv.writer(f)
             w.writerow(header)
-            w.writerows(rows)
+            for (judge_id, prompt_id), group in groupby(iter_rows(cur, args.batch_size), key=lambda r: (r[0], r[2])):
+                row = None
+                for _, judge_name, _, prompt_text, model, sem, mot, tem, rea, rating_id in group:
+                    if row is None:
+                        row = [judge_id, judge_name, prompt_id, prompt_text] + [''] * (width * len(MODELS))
+                    if model in model_offset:
+                        i = model_offset[model]
+                        row[i:i + 4] = [sem, mot, tem, rea]
+                        if normalized is not None:
+                            row[i + 4:i + 8] = normalized.get(rating_id, missing)
+                w.writerow(row)
+                progress.update()
+        progress.finish(out_path)
         
-        print(f"[OK] 导出 {len(rows)} 个评测任务（宽表格式，{len(MODELS)}个模型） -> {args.out}")
+        print(f"[OK] 导出 {progress.count} 个评测任务（宽表格式，{len(MODELS)}个模型） -> {out_path}")
         print(f"     每个模型4个维度，未评测的模型留空")
+    
+    if normalized is not None:
+        print(f"[OK] 已附加评审员偏差校正分（{args.normalize}，*_norm列）")
+    
+    if args.agreement:
+        from rater_agreement import agreement_summary, load_cube, pairwise_agreement, write_pairs_csv, write_summary_csv
+        cube = load_cube(conn)
+        if cube.n_tasks:
+            stem = Path(args.out).name.split('.')[0]
+            summary_path = Path(args.out).with_name(f"{stem}_agreement.csv")
+            pairs_path = Path(args.out).with_name(f"{stem}_agreement_pairs.csv")
+            write_summary_csv(summary_path, agreement_summary(cube))
+            write_pairs_csv(pairs_path, pairwise_agreement(cube))
+            print(f"[OK] 评审一致性 -> {summary_path}, {pairs_path}")
+    
+    conn.close()
 
 if __name__ == "__main__":
     main()
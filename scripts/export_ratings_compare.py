@@ -3,13 +3,28 @@
 """
 比较评测模式 - 评分导出脚本
 导出比较结果到CSV文件
+
+所有导出文件读取同一个数据库快照（长格式、任务汇总、模型统计、进度摘要彼此一致），
+评审员在导出期间继续提交也不受影响：
+- WAL库：一个只读事务，第一次读取时固定快照，之后的提交对导出不可见，写入不被阻塞
+- 非WAL库：先用backup API分批复制一份临时副本（每步之间释放读锁），再从副本导出
 """
 
+import argparse
+import contextlib
 import sqlite3
 import csv
+import sys
 from pathlib import Path
 from datetime import datetime
 
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+from export_stream import (DEFAULT_BATCH_SIZE, ExportProgress, iter_rows, open_csv, open_snapshot,  # noqa: E402
+                           output_path)
+import db_trace  # noqa: E402
+from prepare_data import sample_category  # noqa: E402
+
 # 配置
 PROJECT_ROOT = Path(__file__).parent.parent
 DB_PATH = PROJECT_ROOT / "aiv_compare_v1.db"
@@ -18,14 +33,31 @@ EXPORT_DIR = PROJECT_ROOT / "export_results_compare"
 
 def get_db_connection():
     """获取数据库连接"""
-    conn = sqlite3.connect(DB_PATH, timeout=10.0)
+    conn = db_trace.connect(DB_PATH, timeout=10.0)
     conn.row_factory = sqlite3.Row
     return conn
 
 
-def export_long_format():
-    """导出长格式数据（每行一个评测记录）"""
+@contextlib.contextmanager
+def _using(conn):
+    """使用调用方传入的快照连接；未传入时单独打开一个"""
+    if conn is not None:
+        yield conn
+        return
     conn = get_db_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def export_long_format(use_gzip=False, batch_size=DEFAULT_BATCH_SIZE, conn=None, timestamp=None):
+    """导出长格式数据（每行一个评测记录，边读边写）"""
+    with _using(conn) as conn:
+        return _export_long_format(conn, use_gzip, batch_size, timestamp)
+
+
+def _export_long_format(conn, use_gzip, batch_size, timestamp):
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -49,13 +81,11 @@ def export_long_format():
         ORDER BY c.rating_time
     """)
     
-    rows = cursor.fetchall()
-    conn.close()
+    timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_file = output_path(EXPORT_DIR / f"comparisons_long_{timestamp}.csv", use_gzip)
+    progress = ExportProgress('长格式')
     
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = EXPORT_DIR / f"comparisons_long_{timestamp}.csv"
-    
-    with open(output_file, 'w', newline='', encoding='utf-8-sig') as f:
+    with open_csv(output_file, use_gzip) as f:
         writer = csv.writer(f)
         writer.writerow([
             'comparison_id', 'task_id', 'sample_id', 'category', 'prompt_text',
@@ -63,7 +93,7 @@ def export_long_format():
             'chosen_model', 'comment', 'rating_time'
         ])
         
-        for row in rows:
+        for row in iter_rows(cursor, batch_size):
             writer.writerow([
                 row['comparison_id'],
                 row['task_id'],
@@ -78,14 +108,20 @@ def export_long_format():
                 row['comment'] or '',
                 row['rating_time']
             ])
+            progress.update()
     
+    progress.finish(output_file)
     print(f"  ✅ 长格式: {output_file.name}")
-    return len(rows)
+    return progress.count
 
 
-def export_task_summary():
-    """导出任务汇总（每个任务的所有评测结果）"""
-    conn = get_db_connection()
+def export_task_summary(use_gzip=False, batch_size=DEFAULT_BATCH_SIZE, conn=None, timestamp=None):
+    """导出任务汇总（每个任务的所有评测结果，边读边写）"""
+    with _using(conn) as conn:
+        return _export_task_summary(conn, use_gzip, batch_size, timestamp)
+
+
+def _export_task_summary(conn, use_gzip, batch_size, timestamp):
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -110,13 +146,11 @@ def export_task_summary():
         ORDER BY t.sample_id, t.model_a, t.model_b
     """)
     
-    rows = cursor.fetchall()
-    conn.close()
-    
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = EXPORT_DIR / f"task_summary_{timestamp}.csv"
+    timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_file = output_path(EXPORT_DIR / f"task_summary_{timestamp}.csv", use_gzip)
+    progress = ExportProgress('任务汇总')
     
-    with open(output_file, 'w', newline='', encoding='utf-8-sig') as f:
+    with open_csv(output_file, use_gzip) as f:
         writer = csv.writer(f)
         writer.writerow([
             'task_id', 'sample_id', 'category', 'model_a', 'model_b',
@@ -124,7 +158,7 @@ def export_task_summary():
             'model_a_wins', 'model_b_wins', 'ties'
         ])
         
-        for row in rows:
+        for row in iter_rows(cursor, batch_size):
             writer.writerow([
                 row['task_id'],
                 row['sample_id'],
@@ -139,84 +173,164 @@ def export_task_summary():
                 row['model_b_wins'] or 0,
                 row['ties'] or 0
             ])
+            progress.update()
     
+    progress.finish(output_file)
     print(f"  ✅ 任务汇总: {output_file.name}")
-    return len(rows)
+    return progress.count
 
 
-def export_model_stats():
-    """导出模型统计"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # 获取所有模型
-    cursor.execute("""
-        SELECT DISTINCT model_name
-        FROM videos
-        ORDER BY model_name
+def collect_model_stats(conn):
+    """一次分组扫描 tasks ⟕ comparisons，汇总到 (类别, model_a, model_b) 粒度
+
+    没有 prompts 记录的任务同样计入（与整体统计只读 tasks/comparisons 的口径一致），
+    其类别按 sample_id 的命名规则推断，无法推断时为空字符串
+
+    Returns:
+        list[dict]：每个 (category, model_a, model_b) 一行，含
+        a_wins / b_wins / ties / total_tasks / completed_tasks
+    """
+    cursor = conn.execute("""
+        SELECT 
+            p.category,
+            CASE WHEN p.category IS NULL THEN t.sample_id END AS orphan_sample,
+            t.model_a,
+            t.model_b,
+            SUM(CASE WHEN c.chosen_model = t.model_a THEN 1 ELSE 0 END) as a_wins,
+            SUM(CASE WHEN c.chosen_model = t.model_b THEN 1 ELSE 0 END) as b_wins,
+            SUM(CASE WHEN c.chosen_model = 'tie' THEN 1 ELSE 0 END) as ties,
+            COUNT(DISTINCT t.task_id) as total_tasks,
+            COUNT(DISTINCT CASE WHEN t.completed = 1 THEN t.task_id END) as completed_tasks
+        FROM tasks t
+        LEFT JOIN prompts p ON t.sample_id = p.sample_id
+        LEFT JOIN comparisons c ON c.task_id = t.task_id
+        GROUP BY p.category, orphan_sample, t.model_a, t.model_b
     """)
-    models = [row['model_name'] for row in cursor.fetchall()]
-    
-    # 计算每个模型的统计
-    stats = []
-    for model in models:
-        cursor.execute("""
-            SELECT COUNT(*) as win_count
-            FROM comparisons
-            WHERE chosen_model = ?
-        """, (model,))
-        win_count = cursor.fetchone()['win_count']
-        
-        cursor.execute("""
-            SELECT COUNT(*) as total_tasks
-            FROM tasks
-            WHERE model_a = ? OR model_b = ?
-        """, (model, model))
-        total_tasks = cursor.fetchone()['total_tasks']
+    groups = {}
+    for row in cursor.fetchall():
+        row = dict(row)
+        orphan = row.pop('orphan_sample')
+        category = row['category'] if orphan is None else (sample_category(orphan) or '')
+        key = (category, row['model_a'], row['model_b'])
+        if key not in groups:
+            groups[key] = {**row, 'category': category}
+            continue
+        # 同一推断类别下的多个 sample_id：任务互不重叠，各计数直接相加
+        merged = groups[key]
+        for field in ('a_wins', 'b_wins', 'ties', 'total_tasks', 'completed_tasks'):
+            merged[field] = (merged[field] or 0) + (row[field] or 0)
+    return list(groups.values())
+
+
+def _empty_record():
+    return {'win_count': 0, 'tie_count': 0, 'loss_count': 0,
+            'total_tasks': 0, 'completed_tasks': 0}
+
+
+def _finalize(record):
+    """补充评测次数与胜率（按实际评测次数计算，不假设每个任务3次）"""
+    n = record['win_count'] + record['tie_count'] + record['loss_count']
+    record['comparisons'] = n
+    record['win_rate'] = round(record['win_count'] / n * 100, 2) if n else 0
+    record['score_rate'] = round((record['win_count'] + 0.5 * record['tie_count']) / n * 100, 2) if n else 0
+    return record
+
+
+def aggregate_model_stats(groups, models=()):
+    """把分组结果展开为 整体 / 两两对战 / 分类别 三种视图
+
+    Returns:
+        (overall, pairwise, by_category)
+        overall: {model: record}
+        pairwise: {(model, opponent): record}
+        by_category: {(category, model): record}
+    """
+    overall = {m: _empty_record() for m in models}
+    pairwise = {}
+    by_category = {}
+    for g in groups:
+        sides = (
+            (g['model_a'], g['model_b'], g['a_wins'] or 0, g['b_wins'] or 0),
+            (g['model_b'], g['model_a'], g['b_wins'] or 0, g['a_wins'] or 0),
+        )
+        for model, opponent, wins, losses in sides:
+            for record in (overall.setdefault(model, _empty_record()),
+                           pairwise.setdefault((model, opponent), _empty_record()),
+                           by_category.setdefault((g['category'], model), _empty_record())):
+                record['win_count'] += wins
+                record['loss_count'] += losses
+                record['tie_count'] += g['ties'] or 0
+                record['total_tasks'] += g['total_tasks']
+                record['completed_tasks'] += g['completed_tasks']
+    for record in (*overall.values(), *pairwise.values(), *by_category.values()):
+        _finalize(record)
+    return overall, pairwise, by_category
+
+
+def export_model_stats(conn=None, timestamp=None):
+    """导出模型统计（整体、两两对战胜/平/负矩阵、分类别）"""
+    with _using(conn) as conn:
+        cursor = conn.cursor()
         
+        # 获取所有模型（包括尚未参与任务的模型）
         cursor.execute("""
-            SELECT COUNT(*) as completed_tasks
-            FROM tasks
-            WHERE (model_a = ? OR model_b = ?) AND completed = 1
-        """, (model, model))
-        completed_tasks = cursor.fetchone()['completed_tasks']
+            SELECT DISTINCT model_name
+            FROM videos
+            ORDER BY model_name
+        """)
+        models = [row['model_name'] for row in cursor.fetchall()]
         
-        stats.append({
-            'model_name': model,
-            'win_count': win_count,
-            'total_tasks': total_tasks,
-            'completed_tasks': completed_tasks,
-            'win_rate': (win_count / (completed_tasks * 3) * 100) if completed_tasks > 0 else 0
-        })
+        overall, pairwise, by_category = aggregate_model_stats(collect_model_stats(conn), models)
     
-    conn.close()
+    record_fields = ['win_count', 'tie_count', 'loss_count', 'comparisons',
+                     'total_tasks', 'completed_tasks', 'win_rate', 'score_rate']
+    timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
     
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     output_file = EXPORT_DIR / f"model_stats_{timestamp}.csv"
-    
     with open(output_file, 'w', newline='', encoding='utf-8-sig') as f:
-        writer = csv.DictWriter(f, fieldnames=[
-            'model_name', 'win_count', 'total_tasks', 'completed_tasks', 'win_rate'
-        ])
+        writer = csv.DictWriter(f, fieldnames=['model_name'] + record_fields)
+        writer.writeheader()
+        for model in sorted(overall):
+            writer.writerow({'model_name': model, **overall[model]})
+    
+    pairwise_file = EXPORT_DIR / f"model_pairwise_{timestamp}.csv"
+    with open(pairwise_file, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=['model_name', 'opponent'] + record_fields)
+        writer.writeheader()
+        for (model, opponent) in sorted(pairwise):
+            writer.writerow({'model_name': model, 'opponent': opponent, **pairwise[(model, opponent)]})
+    
+    category_file = EXPORT_DIR / f"model_category_stats_{timestamp}.csv"
+    with open(category_file, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=['category', 'model_name'] + record_fields)
         writer.writeheader()
-        writer.writerows(stats)
+        for (category, model) in sorted(by_category):
+            writer.writerow({'category': category, 'model_name': model, **by_category[(category, model)]})
     
     print(f"  ✅ 模型统计: {output_file.name}")
-    return len(stats)
+    print(f"  ✅ 两两对战: {pairwise_file.name}")
+    print(f"  ✅ 分类别统计: {category_file.name}")
+    return len(overall)
 
 
-def export_progress_summary():
+def export_progress_summary(conn=None, timestamp=None, snapshot_time=None):
     """导出进度摘要"""
-    conn = get_db_connection()
+    with _using(conn) as conn:
+        _export_progress_summary(conn, timestamp, snapshot_time)
+
+
+def _export_progress_summary(conn, timestamp, snapshot_time):
     cursor = conn.cursor()
     
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
     output_file = EXPORT_DIR / f"summary_{timestamp}.txt"
     
     with open(output_file, 'w', encoding='utf-8') as f:
         f.write("="*80 + "\n")
         f.write("比较评测模式 - 进度摘要\n")
         f.write(f"导出时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        if snapshot_time is not None:
+            f.write(f"数据快照: {snapshot_time.strftime('%Y-%m-%d %H:%M:%S')}（与同批导出的CSV一致）\n")
         f.write("="*80 + "\n\n")
         
         # 任务统计
@@ -262,12 +376,22 @@ def export_progress_summary():
         for row in cursor.fetchall():
             f.write(f"  {row['chosen_model']}: {row['count']}\n")
     
-    conn.close()
-    
     print(f"  ✅ 进度摘要: {output_file.name}")
 
 
 def main():
+    global DB_PATH, EXPORT_DIR
+    ap = argparse.ArgumentParser(description='比较评测模式 - 数据导出')
+    ap.add_argument('--db', default=str(DB_PATH), help='数据库路径')
+    ap.add_argument('--out-dir', default=str(EXPORT_DIR), help='导出目录')
+    ap.add_argument('--gzip', action='store_true', help='gzip压缩CSV输出')
+    ap.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='每批从数据库读取的行数')
+    ap.add_argument('--snapshot', choices=['auto', 'wal', 'copy'], default='auto',
+                    help='一致性快照方式：auto=WAL库用读事务，否则先复制副本')
+    args = ap.parse_args()
+    DB_PATH = Path(args.db)
+    EXPORT_DIR = Path(args.out_dir)
+    
     if not DB_PATH.exists():
         print(f"❌ 数据库不存在: {DB_PATH}")
         return
@@ -281,11 +405,15 @@ def main():
     print(f"\n导出目录: {EXPORT_DIR}")
     print("\n开始导出...")
     
-    # 导出各种格式
-    long_count = export_long_format()
-    task_count = export_task_summary()
-    model_count = export_model_stats()
-    export_progress_summary()
+    # 导出各种格式（同一个快照，文件名使用同一个时间戳）
+    with open_snapshot(DB_PATH, args.snapshot) as (conn, description):
+        snapshot_time = datetime.now()
+        timestamp = snapshot_time.strftime("%Y%m%d_%H%M%S")
+        print(f"数据快照: {description}")
+        long_count = export_long_format(args.gzip, args.batch_size, conn, timestamp)
+        task_count = export_task_summary(args.gzip, args.batch_size, conn, timestamp)
+        model_count = export_model_stats(conn, timestamp)
+        export_progress_summary(conn, timestamp, snapshot_time)
     
     print("\n" + "="*80)
     print("✅ 导出完成！")
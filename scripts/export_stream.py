@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式导出工具（export_ratings.py / export_ratings_compare.py 共用）
+
+- iter_rows：按批 fetchmany 迭代游标，内存只保留一批结果
+- open_csv：打开CSV输出（可选gzip），编码与原导出一致（utf-8-sig，Excel可直接打开）
+- ExportProgress：按时间节流输出进度（行数、速度），结束时输出总耗时和吞吐
+- open_snapshot：一次导出的所有文件共用的只读快照连接（WAL读事务，或backup API复制的临时副本）
+"""
+
+import contextlib
+import gzip
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'tools'))
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+from backup_service import online_backup  # noqa: E402
+import db_trace  # noqa: E402
+
+DEFAULT_BATCH_SIZE = 2000
+
+
+def iter_rows(cursor, batch_size=DEFAULT_BATCH_SIZE):
+    """逐批读取游标结果"""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def output_path(path, use_gzip=False):
+    """gzip输出时自动补全 .gz 后缀"""
+    path = Path(path)
+    if use_gzip and path.suffix != '.gz':
+        path = path.with_name(path.name + '.gz')
+    return path
+
+
+def open_csv(path, use_gzip=False):
+    """打开CSV输出文件（文本模式，newline=''）"""
+    if use_gzip:
+        return gzip.open(path, 'wt', encoding='utf-8-sig', newline='', compresslevel=6)
+    return open(path, 'w', encoding='utf-8-sig', newline='')
+
+
+class ExportProgress:
+    """导出进度：每 interval 秒最多输出一次"""
+
+    def __init__(self, label, total=None, interval=1.0, stream=None):
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.stream = stream or sys.stdout
+        self.count = 0
+        self.start = time.perf_counter()
+        self._last = self.start
+
+    def update(self, n=1):
+        self.count += n
+        now = time.perf_counter()
+        if now - self._last >= self.interval:
+            self._last = now
+            rate = self.count / (now - self.start)
+            done = f"{self.count}/{self.total}" if self.total else f"{self.count}"
+            print(f"     … {self.label}: {done} 行，{rate:,.0f} 行/秒", file=self.stream, flush=True)
+
+    def finish(self, path=None):
+        elapsed = time.perf_counter() - self.start
+        rate = self.count / elapsed if elapsed > 0 else 0.0
+        size = ''
+        if path is not None and Path(path).exists():
+            size = f"，{Path(path).stat().st_size / 1048576:.1f} MB"
+        print(f"     {self.label}: {self.count} 行，用时 {elapsed:.2f}s，{rate:,.0f} 行/秒{size}",
+              file=self.stream, flush=True)
+        return elapsed
+
+
+@contextlib.contextmanager
+def open_snapshot(db_path, method='auto'):
+    """打开只读快照连接，供一次导出的所有文件共用
+
+    Args:
+        method: 'auto'（WAL库用读事务，否则用副本）/ 'wal' / 'copy'
+
+    Yields:
+        (conn, 说明文字)
+    """
+    db_path = Path(db_path)
+    with contextlib.closing(db_trace.connect(db_path, timeout=10.0)) as probe:
+        journal_mode = probe.execute("PRAGMA journal_mode").fetchone()[0].lower()
+    if method == 'auto':
+        method = 'wal' if journal_mode == 'wal' else 'copy'
+    elif method == 'wal' and journal_mode != 'wal':
+        print(f"  ⚠️  数据库不是WAL模式（{journal_mode}），长时间读事务会阻塞提交，改用副本快照")
+        method = 'copy'
+
+    if method == 'wal':
+        conn = db_trace.connect(db_path, timeout=10.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA query_only = ON")
+            conn.execute("BEGIN")
+            # 第一次读取时固定快照，此后其他连接的提交对本事务不可见
+            conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            yield conn, "WAL读事务快照"
+        finally:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            conn.close()
+        return
+
+    with tempfile.TemporaryDirectory(prefix='export_snapshot_') as tmp:
+        copy_path = Path(tmp) / 'snapshot.db'
+        stats = online_backup(db_path, copy_path)
+        conn = db_trace.connect(f"file:{copy_path}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn, f"backup副本快照（{stats['pages']} 页，{stats['elapsed_s']:.2f}s）"
+        finally:
+            conn.close()
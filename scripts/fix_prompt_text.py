@@ -4,11 +4,13 @@
 修复prompts表中text字段的问题
 - 有些记录的text字段等于id，需要从txt文件中读取真实的prompt文本
 """
-import sqlite3
 import sys
 import io
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+import db_trace  # noqa: E402
+
 # Windows编码支持
 if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
@@ -58,7 +60,7 @@ def fix_prompt_texts(db_path: str, prompt_root: Path):
     print("=" * 80)
     print()
     
-    conn = sqlite3.connect(db_path)
+    conn = db_trace.connect(db_path)
     cur = conn.cursor()
     
     # 1. 找出所有text=id的记录
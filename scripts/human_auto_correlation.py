@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+打分模式 - 人工评分与自动评测分数的相关性
+
+把 ratings（按 (模型, sample_id) 取人工平均分）与 eval_result/combined_scores.csv 的自动分数对齐为数组，
+按维度计算 Spearman ρ 和 Kendall τ-b：
+- 整体：所有 (模型, sample) 对
+- 分模型：同一模型内不同样本之间（自动分数能否区分同一模型的好坏样本）
+- 分类别：同一类别内
+- 系统级：各模型平均分之间（模型排名是否一致，无置信区间）
+
+实现：
+- 秩相关都写成“带权”的形式：权重 = 每个 (模型, sample) 在重采样中被抽中的次数，原始数据即全1权重；
+  平均秩（含并列）由排序后的分组累计权重直接得到，一次计算一整批bootstrap重采样
+- Kendall τ-b 按人工分数的取值层级（平均分只有几十种取值）逐层累计一致/不一致对数，O(层数 × n)，不需要 n² 两两比较
+
+维度对应：semantic↔S_base，motion↔S_motion，temporal↔S_event，realism↔S_world。
+
+用法：
+    python scripts/human_auto_correlation.py --db aiv_eval_v4.db
+    python scripts/human_auto_correlation.py --db aiv_eval_v4.db --auto-csv video/eval_result/combined_scores.csv --min-ratings 3
+    python scripts/human_auto_correlation.py --db aiv_eval_v4.db --bootstrap 2000 --out export_results/human_auto_corr.csv
+"""
+
+import argparse
+import csv
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(PROJECT_ROOT / 'app'))
+from auto_scores import MODEL_ALIASES, canonical_model, load_auto_scores  # noqa: E402
+import db_trace  # noqa: E402
+from prepare_data import sample_category  # noqa: E402
+
+if sys.platform == 'win32' and (sys.stdout.encoding or '').lower() != 'utf-8':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+DEFAULT_AUTO_CSV = PROJECT_ROOT / 'video' / 'eval_result' / 'combined_scores.csv'
+
+# 人工维度 → 自动分数维度
+DIMENSION_MAP = [('semantic', 'semantic'), ('motion', 'motion'), ('temporal', 'temporal'), ('realism', 'world')]
+DIMENSION_NAMES = {
+    'semantic': '基本语义对齐',
+    'motion': '运动',
+    'temporal': '事件时序',
+    'realism': '世界知识',
+}
+
+class AlignedScores:
+    """按 (模型, sample_id) 对齐的人工平均分与自动分数"""
+
+    def __init__(self, models, samples, categories, n_ratings, human, auto):
+        self.models = models            # [n] 模型名
+        self.samples = samples          # [n] sample_id
+        self.categories = categories    # [n] 类别
+        self.n_ratings = n_ratings      # [n] 人工评分数
+        self.human = human              # [n, 4] 人工平均分
+        self.auto = auto                # [n, 4] 自动分数（缺失为nan）
+
+    def __len__(self):
+        return len(self.models)
+
+
+def load_aligned(conn, auto_lookup, min_ratings=1, aliases=MODEL_ALIASES):
+    """一次分组查询得到人工平均分，与自动分数对齐（只保留两边都有的对）"""
+    rows = conn.execute("""
+        SELECT modelname, COALESCE(sample_id, prompt_id) AS sample, COUNT(*),
+               AVG(score_semantic), AVG(score_motion), AVG(score_temporal), AVG(score_realism)
+        FROM ratings
+        WHERE modelname IS NOT NULL
+        GROUP BY modelname, sample
+        HAVING COUNT(*) >= ?
+    """, (min_ratings,)).fetchall()
+
+    models, samples, counts, human, auto = [], [], [], [], []
+    for model, sample, count, *scores in rows:
+        model = canonical_model(model, aliases)
+        entry = auto_lookup.get((model, sample))
+        if not entry:
+            continue
+        models.append(model)
+        samples.append(sample)
+        counts.append(count)
+        human.append(scores)
+        auto.append([np.nan if entry.get(a) is None else entry[a] for _, a in DIMENSION_MAP])
+    return AlignedScores(
+        np.array(models, dtype=object),
+        np.array(samples, dtype=object),
+        np.array([sample_category(s or '') or '' for s in samples], dtype=object),
+        np.array(counts, dtype=np.int64),
+        np.array(human, dtype=float).reshape(-1, len(DIMENSION_MAP)),
+        np.array(auto, dtype=float).reshape(-1, len(DIMENSION_MAP)),
+    )
+
+
+def _tie_groups(x):
+    """排序后的并列分组：(order, 每组起点, 每个元素所在组)"""
+    order = np.argsort(x, kind='stable')
+    xs = x[order]
+    new_group = np.concatenate([[True], xs[1:] != xs[:-1]])
+    starts = np.flatnonzero(new_group)
+    group = np.cumsum(new_group) - 1
+    return order, starts, group
+
+
+def weighted_ranks(x, W):
+    """带权平均秩：W[B, n] 为每个元素的重复次数，返回 ranks[B, n]（并列取平均秩）"""
+    order, starts, group = _tie_groups(x)
+    G = np.add.reduceat(W[:, order], starts, axis=1)          # 每个并列组的总权重
+    before = np.cumsum(G, axis=1) - G
+    avg = before + (G + 1) / 2
+    ranks = np.empty_like(W, dtype=float)
+    ranks[:, order] = avg[:, group]
+    return ranks
+
+
+def weighted_spearman(x, y, W):
+    """Spearman ρ（带权秩上的带权Pearson），返回 [B]"""
+    rx, ry = weighted_ranks(x, W), weighted_ranks(y, W)
+    total = W.sum(axis=1, keepdims=True)
+    mx = (W * rx).sum(axis=1, keepdims=True) / total
+    my = (W * ry).sum(axis=1, keepdims=True) / total
+    dx, dy = rx - mx, ry - my
+    cov = (W * dx * dy).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return cov / np.sqrt((W * dx * dx).sum(axis=1) * (W * dy * dy).sum(axis=1))
+
+
+def weighted_kendall(x, y, W):
+    """Kendall τ-b，返回 [B]
+
+    按 x 排序分组，沿 y 的取值层级累计：某层级在某 x 组中的权重 × 之前所有 x 组中更低/更高层级的权重
+    = 一致/不一致对数。取值层级较少的一方作为 y（τ 对 x、y 对称）。
+    """
+    if len(np.unique(x)) < len(np.unique(y)):
+        x, y = y, x
+    order, starts, _ = _tie_groups(x)
+    Ws = W[:, order]
+    levels, y_level = np.unique(y[order], return_inverse=True)
+
+    group_total = np.add.reduceat(Ws, starts, axis=1)             # [B, Ux]
+    prev_total = np.cumsum(group_total, axis=1) - group_total     # 之前各组的总权重
+    below = np.zeros_like(group_total)                            # 之前各组中 y 更低的权重
+    concordant = np.zeros(W.shape[0])
+    discordant = np.zeros(W.shape[0])
+    y_ties = np.zeros(W.shape[0])
+    for k in range(len(levels)):
+        Gk = np.add.reduceat(np.where(y_level == k, Ws, 0.0), starts, axis=1)
+        prev_k = np.cumsum(Gk, axis=1) - Gk
+        concordant += (Gk * below).sum(axis=1)
+        discordant += (Gk * (prev_total - below - prev_k)).sum(axis=1)
+        below += prev_k
+        level_total = Gk.sum(axis=1)
+        y_ties += level_total * (level_total - 1) / 2
+
+    N = W.sum(axis=1)
+    n0 = N * (N - 1) / 2
+    x_ties = (group_total * (group_total - 1) / 2).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (concordant - discordant) / np.sqrt((n0 - x_ties) * (n0 - y_ties))
+
+
+def _bootstrap_weights(n, n_boot, rng):
+    W = np.empty((n_boot, n))
+    for b in range(n_boot):
+        W[b] = np.bincount(rng.integers(0, n, n), minlength=n)
+    return W
+
+
+def correlate(x, y, n_boot=1000, rng=None, ci=0.95, chunk=250):
+    """单组数据的 ρ、τ 及bootstrap置信区间"""
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[valid], y[valid]
+    n = len(x)
+    result = {'n': n, 'spearman': None, 'spearman_low': None, 'spearman_high': None,
+              'kendall': None, 'kendall_low': None, 'kendall_high': None}
+    if n < 3:
+        return result
+    ones = np.ones((1, n))
+    result['spearman'] = _round(weighted_spearman(x, y, ones)[0])
+    result['kendall'] = _round(weighted_kendall(x, y, ones)[0])
+    if n_boot > 0:
+        rng = rng or np.random.default_rng(42)
+        rho, tau = [], []
+        for start in range(0, n_boot, chunk):
+            W = _bootstrap_weights(n, min(chunk, n_boot - start), rng)
+            rho.append(weighted_spearman(x, y, W))
+            tau.append(weighted_kendall(x, y, W))
+        tail = (1 - ci) / 2
+        for name, samples in (('spearman', np.concatenate(rho)), ('kendall', np.concatenate(tau))):
+            samples = samples[~np.isnan(samples)]
+            if len(samples):
+                result[f'{name}_low'] = _round(np.quantile(samples, tail))
+                result[f'{name}_high'] = _round(np.quantile(samples, 1 - tail))
+    return result
+
+
+def _round(value):
+    return None if value is None or np.isnan(value) else round(float(value), 4)
+
+
+def correlation_report(data, n_boot=1000, seed=42, min_group=10):
+    """整体 / 分模型 / 分类别 / 系统级 的相关性
+
+    Returns:
+        [{'scope', 'group', 'dimension', 'n', 'spearman', 'spearman_low', 'spearman_high',
+          'kendall', 'kendall_low', 'kendall_high'}, ...]
+    """
+    rng = np.random.default_rng(seed)
+    groups = [('overall', 'ALL', np.ones(len(data), dtype=bool))]
+    for model in sorted(set(data.models)):
+        groups.append(('model', model, data.models == model))
+    for category in sorted(set(data.categories)):
+        groups.append(('category', category or '-', data.categories == category))
+
+    rows = []
+    for d, (human_dim, _) in enumerate(DIMENSION_MAP):
+        for scope, name, mask in groups:
+            if mask.sum() < min_group:
+                continue
+            stats = correlate(data.auto[mask, d], data.human[mask, d], n_boot, rng)
+            rows.append({'scope': scope, 'group': name, 'dimension': human_dim, **stats})
+
+        # 系统级：各模型的平均分
+        models = sorted(set(data.models))
+        if len(models) >= 3:
+            auto_means = np.array([np.nanmean(data.auto[data.models == m, d]) for m in models])
+            human_means = np.array([data.human[data.models == m, d].mean() for m in models])
+            stats = correlate(auto_means, human_means, n_boot=0)
+            rows.append({'scope': 'system', 'group': f'{len(models)} models', 'dimension': human_dim, **stats})
+    return rows
+
+
+def _fmt(value, low, high):
+    if value is None:
+        return '-'
+    return f"{value:+.3f} [{low:+.3f}, {high:+.3f}]" if low is not None else f"{value:+.3f}"
+
+
+def print_report(rows):
+    for human_dim, _ in DIMENSION_MAP:
+        print(f"\n  📐 {DIMENSION_NAMES[human_dim]}")
+        print(f"  {'范围':<10} {'分组':<24} {'n':>6} {'Spearman ρ':>26} {'Kendall τ-b':>26}")
+        print(f"  {'-' * 96}")
+        for row in rows:
+            if row['dimension'] != human_dim:
+                continue
+            print(f"  {row['scope']:<10} {row['group']:<24} {row['n']:>6} "
+                  f"{_fmt(row['spearman'], row['spearman_low'], row['spearman_high']):>26} "
+                  f"{_fmt(row['kendall'], row['kendall_low'], row['kendall_high']):>26}")
+
+
+def write_csv(path, rows):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='打分模式 - 人工评分与自动评测分数的秩相关')
+    ap.add_argument('--db', default='aiv_eval_v4.db', help='数据库路径')
+    ap.add_argument('--auto-csv', default=str(DEFAULT_AUTO_CSV), help='自动评测分数CSV（combined_scores.csv）')
+    ap.add_argument('--min-ratings', type=int, default=1, help='每个 (模型, sample) 至少需要的人工评分数')
+    ap.add_argument('--bootstrap', type=int, default=1000, help='bootstrap重复次数（0=不计算置信区间）')
+    ap.add_argument('--seed', type=int, default=42)
+    ap.add_argument('--min-group', type=int, default=10, help='分组样本数少于此值时跳过')
+    ap.add_argument('--out', help='输出CSV路径')
+    args = ap.parse_args()
+
+    if not Path(args.db).exists():
+        print(f"❌ 数据库不存在: {args.db}")
+        return 1
+    if not Path(args.auto_csv).exists():
+        print(f"❌ 自动评测分数不存在: {args.auto_csv}")
+        return 1
+
+    start = time.perf_counter()
+    auto_lookup = load_auto_scores(args.auto_csv)
+    conn = db_trace.connect(f"file:{args.db}?mode=ro", uri=True)
+    try:
+        data = load_aligned(conn, auto_lookup, args.min_ratings)
+    finally:
+        conn.close()
+    load_s = time.perf_counter() - start
+
+    if len(data) == 0:
+        print("ℹ️  没有同时具有人工评分和自动分数的视频（检查模型名/sample_id是否对应）")
+        return 0
+
+    start = time.perf_counter()
+    rows = correlation_report(data, args.bootstrap, args.seed, args.min_group)
+    compute_s = time.perf_counter() - start
+
+    print("=" * 100)
+    print("打分模式 - 人工评分 vs 自动评测 秩相关")
+    print("=" * 100)
+    print(f"  对齐的 (模型, sample): {len(data)} 个（自动分数 {len(auto_lookup)} 条，人工评分≥{args.min_ratings}次）")
+    print(f"  读取 {load_s:.2f}s，计算 {compute_s:.2f}s（bootstrap {args.bootstrap} 次）")
+    print_report(rows)
+
+    if args.out:
+        write_csv(args.out, rows)
+        print(f"\n  ✅ 已导出: {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+打分模式 - 评审员偏差校正（宽松/严格评审员对模型均分的影响）
+
+每个评审员估计一个偏移（offset）和尺度（scale），把原始分换算成“平均评审员”会给出的分数：
+    normalized = μ + (raw − μ − offset_j) / scale_j
+
+两种拟合方法：
+- zscore：按评审员的均值/标准差做 z-score，再映射回全体评分的均值/标准差
+  （评审员看到的视频是随机分配的，各评审员的视频质量分布相同时成立）
+- als（默认）：加性混合模型 raw = μ + scale_j · a_v + offset_j + ε，a_v 为视频效应；
+  交替最小二乘：固定 a 时每个评审员是一个带收缩的2×2线性回归（bincount累加后闭式求解），
+  固定评审员参数时 a_v 也是闭式解。偏移向0、尺度向1收缩（评分少的评审员几乎不被校正），
+  相当于已知方差比的随机效应估计。考虑了各评审员看到的视频不同。
+
+全部运算都是按评审员/视频的 bincount，10万条评分、100个评审员每轮迭代只需几毫秒。
+
+用法：
+    python scripts/judge_normalization.py --db aiv_eval_v4.db                       # 评审员参数 + 模型均分（原始/校正）
+    python scripts/judge_normalization.py --db aiv_eval_v4.db --method zscore
+    python scripts/judge_normalization.py --db aiv_eval_v4.db --out export_results/judge_params.csv
+    python scripts/export_ratings.py --db aiv_eval_v4.db --out export_results/ratings_long.csv --format long --normalize als
+"""
+
+import argparse
+import csv
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+import db_trace  # noqa: E402
+
+if sys.platform == 'win32' and (sys.stdout.encoding or '').lower() != 'utf-8':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+DIMENSIONS = ['semantic', 'motion', 'temporal', 'realism']
+DIMENSION_NAMES = {
+    'semantic': '基本语义对齐',
+    'motion': '运动',
+    'temporal': '事件时序',
+    'realism': '世界知识',
+}
+METHODS = ('als', 'zscore')
+
+# 收缩强度（以“条评分”为单位）：评审员有 n 条评分时，偏移估计约被乘以 n / (n + OFFSET_PRIOR)
+OFFSET_PRIOR = 10.0
+SCALE_PRIOR = 20.0
+
+
+class RatingTable:
+    """ratings 的列式数组：每条评分一行"""
+
+    def __init__(self, rating_ids, judge_idx, video_idx, scores, judge_ids, video_ids, models):
+        self.rating_ids = rating_ids    # [n]
+        self.judge_idx = judge_idx      # [n] 0..J-1
+        self.video_idx = video_idx      # [n] 0..V-1
+        self.scores = scores            # [n, 4]
+        self.judge_ids = judge_ids      # [J]
+        self.video_ids = video_ids      # [V]
+        self.models = models            # [n] 模型名
+
+    def __len__(self):
+        return len(self.rating_ids)
+
+    @property
+    def n_judges(self):
+        return len(self.judge_ids)
+
+    @property
+    def n_videos(self):
+        return len(self.video_ids)
+
+
+def load_table(conn):
+    """一次查询读取全部评分"""
+    rows = conn.execute("""
+        SELECT id, judge_id, video_id, score_semantic, score_motion, score_temporal, score_realism,
+               COALESCE(modelname, '')
+        FROM ratings
+    """).fetchall()
+    if not rows:
+        empty = np.zeros(0, dtype=np.int64)
+        return RatingTable(empty, empty, empty, np.zeros((0, len(DIMENSIONS))), empty, empty,
+                           np.zeros(0, dtype=object))
+    ids, judges, videos, *dims, models = zip(*rows)
+    judge_ids, judge_idx = np.unique(np.array(judges, dtype=np.int64), return_inverse=True)
+    video_ids, video_idx = np.unique(np.array(videos, dtype=np.int64), return_inverse=True)
+    return RatingTable(
+        np.array(ids, dtype=np.int64), judge_idx, video_idx,
+        np.array(dims, dtype=float).T,
+        judge_ids, video_ids, np.array(models, dtype=object),
+    )
+
+
+class JudgeParams:
+    """拟合结果：offset/scale 为 [评审员, 维度]，mu 为 [维度]"""
+
+    def __init__(self, method, mu, offset, scale, counts, iterations=0):
+        self.method = method
+        self.mu = mu
+        self.offset = offset
+        self.scale = scale
+        self.counts = counts
+        self.iterations = iterations
+
+    def apply(self, judge_idx, scores):
+        """原始分 → 校正分（向量化）"""
+        return self.mu + (scores - self.mu - self.offset[judge_idx]) / self.scale[judge_idx]
+
+
+def fit_zscore(table, min_ratings=5):
+    """按评审员 z-score；评分少于 min_ratings 或方差为0的评审员只校正偏移"""
+    J = table.n_judges
+    counts = np.bincount(table.judge_idx, minlength=J).astype(float)
+    mu = table.scores.mean(axis=0)
+    sd = table.scores.std(axis=0)
+    offset = np.zeros((J, len(DIMENSIONS)))
+    scale = np.ones((J, len(DIMENSIONS)))
+    for d in range(len(DIMENSIONS)):
+        y = table.scores[:, d]
+        s1 = np.bincount(table.judge_idx, y, minlength=J)
+        s2 = np.bincount(table.judge_idx, y * y, minlength=J)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_j = s1 / counts
+            sd_j = np.sqrt(np.maximum(s2 / counts - mean_j ** 2, 0))
+        has = counts > 0
+        offset[has, d] = mean_j[has] - mu[d]
+        ok = has & (counts >= min_ratings) & (sd_j > 0) & (sd[d] > 0)
+        scale[ok, d] = sd_j[ok] / sd[d]
+    return JudgeParams('zscore', mu, offset, scale, counts)
+
+
+def _fit_als_dim(judge, video, y, J, V, offset_prior, scale_prior, max_iter, tol):
+    """单个维度的交替最小二乘，返回 (mu, offset[J], scale[J], 迭代次数)"""
+    mu = y.mean()
+    r = y - mu
+    n_j = np.bincount(judge, minlength=J).astype(float)
+    n_v = np.bincount(video, minlength=V).astype(float)
+    b = np.zeros(J)
+    s = np.ones(J)
+    a = np.bincount(video, r, minlength=V) / np.maximum(n_v, 1)
+
+    for it in range(1, max_iter + 1):
+        # 固定视频效应 a：每个评审员最小化 Σ(r − b − s·a)² + λb·b² + λs·(s − 1)²
+        av = a[video]
+        sa = np.bincount(judge, av, minlength=J)
+        saa = np.bincount(judge, av * av, minlength=J)
+        sr = np.bincount(judge, r, minlength=J)
+        sar = np.bincount(judge, av * r, minlength=J)
+        m11 = n_j + offset_prior
+        m22 = saa + scale_prior
+        det = m11 * m22 - sa * sa
+        new_b = (m22 * sr - sa * (sar + scale_prior)) / det
+        new_s = (m11 * (sar + scale_prior) - sa * sr) / det
+
+        # 固定评审员参数：a_v = Σ s_j (r − b_j) / Σ s_j²
+        sj = new_s[judge]
+        a = np.bincount(video, sj * (r - new_b[judge]), minlength=V) / np.maximum(
+            np.bincount(video, sj * sj, minlength=V), 1e-12)
+        # 可辨识性：视频效应均值为0（由 μ 吸收）
+        shift = a[n_v > 0].mean()
+        a -= shift
+        new_b += new_s * shift
+
+        delta = max(np.abs(new_b - b).max(), np.abs(new_s - s).max())
+        b, s = new_b, new_s
+        if delta < tol:
+            break
+    return mu, b, s, it
+
+
+def fit_als(table, offset_prior=OFFSET_PRIOR, scale_prior=SCALE_PRIOR, max_iter=500, tol=1e-5):
+    """加性混合模型（评审员偏移 + 尺度 + 视频效应），逐维度拟合"""
+    J, V = table.n_judges, table.n_videos
+    counts = np.bincount(table.judge_idx, minlength=J).astype(float)
+    mu = np.zeros(len(DIMENSIONS))
+    offset = np.zeros((J, len(DIMENSIONS)))
+    scale = np.ones((J, len(DIMENSIONS)))
+    iterations = 0
+    for d in range(len(DIMENSIONS)):
+        mu[d], offset[:, d], scale[:, d], it = _fit_als_dim(
+            table.judge_idx, table.video_idx, table.scores[:, d], J, V,
+            offset_prior, scale_prior, max_iter, tol)
+        iterations = max(iterations, it)
+    # 尺度下限：避免个别评审员几乎不区分好坏时被无限放大
+    np.maximum(scale, 0.2, out=scale)
+    return JudgeParams('als', mu, offset, scale, counts, iterations)
+
+
+def fit(table, method='als'):
+    if method == 'zscore':
+        return fit_zscore(table)
+    return fit_als(table)
+
+
+def normalized_scores(conn, method='als'):
+    """rating_id → 4个维度的校正分（供导出使用）"""
+    table = load_table(conn)
+    if not len(table):
+        return {}
+    params = fit(table, method)
+    normalized = np.round(params.apply(table.judge_idx, table.scores), 4)
+    return dict(zip(table.rating_ids.tolist(), map(tuple, normalized.tolist())))
+
+
+def model_means(table, values):
+    """各模型各维度均值 {model: [4]}"""
+    models, model_idx = np.unique(table.models, return_inverse=True)
+    counts = np.bincount(model_idx, minlength=len(models))
+    means = np.stack([np.bincount(model_idx, values[:, d], minlength=len(models)) / counts
+                      for d in range(len(DIMENSIONS))], axis=1)
+    return {m: means[i] for i, m in enumerate(models)}
+
+
+def judge_name_map(conn):
+    return dict(conn.execute("SELECT id, name FROM judges").fetchall())
+
+
+def print_report(table, params, names):
+    print(f"\n  👤 评审员参数（{params.method}；偏移>0 表示打分偏松，尺度>1 表示分数拉得更开）")
+    header = ''.join(f"{DIMENSION_NAMES[d]:>20}" for d in DIMENSIONS)
+    print(f"  {'评审员':<16} {'评分数':>6}{header}")
+    print(f"  {'-' * (24 + 20 * len(DIMENSIONS))}")
+    order = np.argsort(-np.abs(params.offset).mean(axis=1))
+    for j in order:
+        cells = ''.join(f"{params.offset[j, d]:>+11.2f} ×{params.scale[j, d]:<7.2f}" for d in range(len(DIMENSIONS)))
+        name = names.get(int(table.judge_ids[j]), str(table.judge_ids[j]))
+        print(f"  {name:<16} {int(params.counts[j]):>6}{cells}")
+
+    raw = model_means(table, table.scores)
+    norm = model_means(table, params.apply(table.judge_idx, table.scores))
+    print("\n  📊 模型均分（原始 → 校正）")
+    print(f"  {'模型':<16}" + ''.join(f"{DIMENSION_NAMES[d]:>20}" for d in DIMENSIONS))
+    print(f"  {'-' * (16 + 20 * len(DIMENSIONS))}")
+    for model in sorted(raw):
+        cells = ''.join(f"{raw[model][d]:>11.3f} → {norm[model][d]:<6.3f}" for d in range(len(DIMENSIONS)))
+        print(f"  {model or '-':<16}{cells}")
+
+
+def write_params_csv(path, table, params, names):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        w = csv.writer(f)
+        w.writerow(['judge_id', 'judge_name', 'n_ratings']
+                   + [f"{p}_{d}" for d in DIMENSIONS for p in ('offset', 'scale')])
+        for j, judge_id in enumerate(table.judge_ids.tolist()):
+            values = []
+            for d in range(len(DIMENSIONS)):
+                values += [round(float(params.offset[j, d]), 4), round(float(params.scale[j, d]), 4)]
+            w.writerow([judge_id, names.get(judge_id, ''), int(params.counts[j])] + values)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='打分模式 - 评审员偏差校正')
+    ap.add_argument('--db', default='aiv_eval_v4.db', help='数据库路径')
+    ap.add_argument('--method', choices=METHODS, default='als', help='als=加性混合模型（默认），zscore=按评审员标准化')
+    ap.add_argument('--out', help='评审员参数输出CSV路径')
+    args = ap.parse_args()
+
+    if not Path(args.db).exists():
+        print(f"❌ 数据库不存在: {args.db}")
+        return 1
+
+    conn = db_trace.connect(f"file:{args.db}?mode=ro", uri=True)
+    try:
+        start = time.perf_counter()
+        table = load_table(conn)
+        load_s = time.perf_counter() - start
+        if not len(table):
+            print("ℹ️  还没有评分")
+            return 0
+        names = judge_name_map(conn)
+    finally:
+        conn.close()
+
+    start = time.perf_counter()
+    params = fit(table, args.method)
+    fit_s = time.perf_counter() - start
+
+    print("=" * 100)
+    print("打分模式 - 评审员偏差校正")
+    print("=" * 100)
+    print(f"  {len(table)} 条评分，{table.n_judges} 个评审员，{table.n_videos} 个视频")
+    iters = f"，{params.iterations} 轮迭代" if params.iterations else ''
+    print(f"  读取 {load_s:.2f}s，拟合 {fit_s:.3f}s{iters}")
+    print_report(table, params, names)
+
+    if args.out:
+        write_params_csv(args.out, table, params, names)
+        print(f"\n  ✅ 已导出: {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
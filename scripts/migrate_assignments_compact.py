@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+assignments表紧凑布局迁移（打分模式 / 比较模式通用）
+
+默认的assignments是rowid表 + 4~5个二级索引，每次提交、每次触发器清理都要同时维护。
+紧凑布局改为按 (judge_id, 顺序) 聚簇的 WITHOUT ROWID 表：
+- 打分模式：PRIMARY KEY (judge_id, display_order)，去掉 id / assigned_at 列
+- 比较模式：PRIMARY KEY (judge_id, position)，去掉 assignment_id / created_at 列
+- 只保留一个二级索引 (task_id, judge_id)：既是UNIQUE约束，也供完成触发器按task清理
+
+应用、监控、打散脚本均以 (judge_id, task_id) 定位分配记录，两种布局都可直接使用。
+
+用法：
+    python scripts/migrate_assignments_compact.py --db aiv_eval_v4.db
+    python scripts/migrate_assignments_compact.py --db aiv_compare_v1.db
+    python scripts/migrate_assignments_compact.py --db aiv_eval_v4.db --revert   # 还原为rowid布局
+"""
+import argparse
+import re
+import shutil
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+import db_trace  # noqa: E402
+
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+
+# 打分模式（db/schema.sql）
+SCORING_COMPACT = {
+    'table': """
+        CREATE TABLE assignments_new (
+            judge_id INTEGER NOT NULL,
+            display_order INTEGER NOT NULL,
+            task_id INTEGER NOT NULL,
+            finished INTEGER NOT NULL DEFAULT 0,
+            finished_at TIMESTAMP,
+            PRIMARY KEY (judge_id, display_order),
+            FOREIGN KEY (judge_id) REFERENCES judges(id),
+            FOREIGN KEY (task_id) REFERENCES tasks(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    """,
+    'copy': """
+        INSERT INTO assignments_new (judge_id, display_order, task_id, finished, finished_at)
+        SELECT judge_id, {order}, task_id, COALESCE(finished, 0), finished_at FROM assignments
+    """,
+    'indexes': [
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_assignments_task_judge ON assignments(task_id, judge_id)",
+    ],
+}
+
+SCORING_ROWID = {
+    'table': """
+        CREATE TABLE assignments_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            judge_id INTEGER NOT NULL,
+            task_id INTEGER NOT NULL,
+            display_order INTEGER NOT NULL,
+            assigned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished INTEGER DEFAULT 0,
+            finished_at TIMESTAMP,
+            FOREIGN KEY (judge_id) REFERENCES judges(id),
+            FOREIGN KEY (task_id) REFERENCES tasks(id) ON DELETE CASCADE,
+            UNIQUE(judge_id, task_id)
+        )
+    """,
+    'copy': """
+        INSERT INTO assignments_new (judge_id, task_id, display_order, finished, finished_at)
+        SELECT judge_id, task_id, display_order, finished, finished_at FROM assignments
+        ORDER BY judge_id, display_order
+    """,
+    'indexes': [
+        "CREATE INDEX IF NOT EXISTS idx_assignments_judge ON assignments(judge_id)",
+        "CREATE INDEX IF NOT EXISTS idx_assignments_task ON assignments(task_id)",
+        "CREATE INDEX IF NOT EXISTS idx_assignments_finished ON assignments(finished)",
+        "CREATE INDEX IF NOT EXISTS idx_assignments_judge_order ON assignments(judge_id, display_order)",
+    ],
+}
+
+# 比较模式（db/schema_compare.sql）
+COMPARE_COMPACT = {
+    'table': """
+        CREATE TABLE assignments_new (
+            judge_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            task_id INTEGER NOT NULL,
+            PRIMARY KEY (judge_id, position),
+            FOREIGN KEY (judge_id) REFERENCES judges(judge_id),
+            FOREIGN KEY (task_id) REFERENCES tasks(task_id)
+        ) WITHOUT ROWID
+    """,
+    'copy': """
+        INSERT INTO assignments_new (judge_id, position, task_id)
+        SELECT judge_id, {order}, task_id FROM assignments
+    """,
+    'indexes': [
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_assignments_task_judge ON assignments(task_id, judge_id)",
+    ],
+}
+
+COMPARE_ROWID = {
+    'table': """
+        CREATE TABLE assignments_new (
+            assignment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            judge_id INTEGER NOT NULL,
+            task_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (judge_id) REFERENCES judges(judge_id),
+            FOREIGN KEY (task_id) REFERENCES tasks(task_id),
+            UNIQUE(judge_id, task_id)
+        )
+    """,
+    'copy': """
+        INSERT INTO assignments_new (judge_id, task_id, position)
+        SELECT judge_id, task_id, position FROM assignments
+        ORDER BY judge_id, position
+    """,
+    'indexes': [
+        "CREATE INDEX IF NOT EXISTS idx_assignments_judge ON assignments(judge_id)",
+        "CREATE INDEX IF NOT EXISTS idx_assignments_task ON assignments(task_id)",
+    ],
+}
+
+LAYOUTS = {
+    ('scoring', 'compact'): SCORING_COMPACT,
+    ('scoring', 'rowid'): SCORING_ROWID,
+    ('compare', 'compact'): COMPARE_COMPACT,
+    ('compare', 'rowid'): COMPARE_ROWID,
+}
+
+ORDER_COLUMN = {'scoring': 'display_order', 'compare': 'position'}
+
+
+def detect_mode(conn):
+    """根据judges表结构判断是打分模式还是比较模式"""
+    cols = [row[1] for row in conn.execute("PRAGMA table_info(judges)")]
+    if 'uid' in cols:
+        return 'compare'
+    cur = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='tasks'")
+    if cur.fetchone() is None:
+        raise RuntimeError("V1数据库（无tasks表）不支持紧凑布局，请先运行 migrate_v1_to_v2.py")
+    return 'scoring'
+
+
+def is_compact(conn):
+    """assignments是否已是WITHOUT ROWID布局"""
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='assignments'").fetchone()
+    return bool(row) and 'WITHOUT ROWID' in row[0].upper()
+
+
+def _order_expr(conn, mode):
+    """顺序列表达式：若同一judge下存在重复顺序号，则按原顺序重新编号以满足主键"""
+    col = ORDER_COLUMN[mode]
+    dup = conn.execute(f"""
+        SELECT 1 FROM assignments GROUP BY judge_id, {col} HAVING COUNT(*) > 1 LIMIT 1
+    """).fetchone()
+    if not dup:
+        return col, False
+    rowid_col = 'id' if mode == 'scoring' else 'assignment_id'
+    start = 0 if mode == 'scoring' else 1
+    return (f"ROW_NUMBER() OVER (PARTITION BY judge_id ORDER BY {col}, {rowid_col}) - 1 + {start}", True)
+
+
+def _dependent_objects(conn):
+    """引用assignments的触发器和视图（换表前需删除，换表后重建）"""
+    rows = conn.execute("""
+        SELECT type, name, sql FROM sqlite_master
+        WHERE type IN ('trigger', 'view') AND tbl_name != 'assignments' AND sql LIKE '%assignments%'
+    """).fetchall()
+    objects = []
+    for obj_type, name, sql in rows:
+        if obj_type == 'view':
+            # 视图中的 a.id / a.assignment_id 在紧凑布局中不存在，统一改为按task_id计数
+            sql = re.sub(r'\ba\.(id|assignment_id)\b', 'a.task_id', sql)
+        objects.append((obj_type, name, sql))
+    return objects
+
+
+def migrate(conn, layout='compact', mode=None):
+    """在一个事务内将assignments切换为指定布局
+
+    Returns:
+        {'mode': str, 'rows': int, 'renumbered': bool}
+    """
+    mode = mode or detect_mode(conn)
+    spec = LAYOUTS[(mode, layout)]
+
+    conn.commit()  # PRAGMA foreign_keys在事务内无效，先结束调用方可能打开的隐式事务
+    conn.execute("PRAGMA foreign_keys=OFF")
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        if layout == 'compact':
+            order, renumbered = _order_expr(conn, mode)
+        else:
+            order, renumbered = ORDER_COLUMN[mode], False
+
+        dependents = _dependent_objects(conn)
+        for obj_type, name, _ in dependents:
+            conn.execute(f"DROP {obj_type.upper()} IF EXISTS {name}")
+
+        conn.execute("DROP TABLE IF EXISTS assignments_new")
+        conn.execute(spec['table'])
+        conn.execute(spec['copy'].format(order=order))
+        rows = conn.execute("SELECT COUNT(*) FROM assignments_new").fetchone()[0]
+
+        conn.execute("DROP TABLE assignments")
+        conn.execute("ALTER TABLE assignments_new RENAME TO assignments")
+        for sql in spec['indexes']:
+            conn.execute(sql)
+        for _, _, sql in dependents:
+            conn.execute(sql)
+
+        violations = conn.execute("PRAGMA foreign_key_check(assignments)").fetchall()
+        if violations:
+            raise RuntimeError(f"外键检查失败：{len(violations)} 条assignments引用了不存在的记录")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("PRAGMA foreign_keys=ON")
+
+    return {'mode': mode, 'rows': rows, 'renumbered': renumbered}
+
+
+def main():
+    ap = argparse.ArgumentParser(description='assignments表紧凑布局（WITHOUT ROWID）迁移')
+    ap.add_argument('--db', required=True, help='数据库路径（打分模式或比较模式）')
+    ap.add_argument('--revert', action='store_true', help='还原为默认的rowid布局')
+    ap.add_argument('--no-backup', action='store_true', help='迁移前不备份数据库')
+    ap.add_argument('--vacuum', action='store_true', help='迁移后执行VACUUM回收空间')
+    args = ap.parse_args()
+
+    db_path = Path(args.db)
+    if not db_path.exists():
+        print(f"❌ 数据库不存在: {db_path}")
+        return 1
+
+    layout = 'rowid' if args.revert else 'compact'
+    conn = db_trace.connect(db_path, timeout=30.0)
+    conn.isolation_level = None
+    mode = detect_mode(conn)
+
+    if is_compact(conn) == (layout == 'compact'):
+        print(f"✓ assignments已是{layout}布局，无需迁移")
+        conn.close()
+        return 0
+
+    print("=" * 80)
+    print(f"  assignments布局迁移：{mode}模式 → {layout}")
+    print("=" * 80)
+
+    if not args.no_backup:
+        # 迁移期间应停止评测服务；先做检查点再复制，确保备份包含WAL中的数据
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_path = db_path.with_name(f"{db_path.stem}_before_{layout}_{timestamp}{db_path.suffix}")
+        shutil.copy2(db_path, backup_path)
+        print(f"📦 已备份到: {backup_path}")
+
+    size_before = db_path.stat().st_size
+    result = migrate(conn, layout, mode)
+    print(f"✅ 已迁移 {result['rows']} 条assignments")
+    if result['renumbered']:
+        print("⚠️  发现重复的顺序号，已按原顺序重新编号")
+
+    if args.vacuum:
+        print("🧹 执行VACUUM...")
+        conn.execute("VACUUM")
+    conn.close()
+
+    size_after = db_path.stat().st_size
+    print(f"📊 数据库大小: {size_before / 1048576:.1f} MB → {size_after / 1048576:.1f} MB")
+    if not args.vacuum:
+        print("   （空闲页需VACUUM后才会释放，可加 --vacuum）")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -20,6 +20,9 @@ from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
 
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+import db_trace  # noqa: E402
+
 # 设置输出编码为UTF-8
 if sys.platform == 'win32':
     import io
@@ -62,7 +65,7 @@ def read_prompt_text(sample_id: str, prompt_root: Path) -> str:
 
 def get_existing_data(db_path: str) -> dict:
     """获取数据库中已存在的数据"""
-    conn = sqlite3.connect(db_path)
+    conn = db_trace.connect(db_path)
     cur = conn.cursor()
     
     # 获取已存在的prompts
@@ -195,7 +198,7 @@ def shuffle_pending_tasks_for_judge(conn, judge_id, seed=None):
     
     # 1. 获取已完成任务
     cur.execute("""
-        SELECT id, display_order, task_id
+        SELECT task_id, display_order
         FROM assignments
         WHERE judge_id = ? AND finished = 1
         ORDER BY display_order
@@ -204,7 +207,7 @@ def shuffle_pending_tasks_for_judge(conn, judge_id, seed=None):
     
     # 2. 获取未完成任务
     cur.execute("""
-        SELECT id, display_order, task_id
+        SELECT task_id, display_order
         FROM assignments
         WHERE judge_id = ? AND finished = 0
         ORDER BY display_order
@@ -224,20 +227,26 @@ def shuffle_pending_tasks_for_judge(conn, judge_id, seed=None):
     if seed is None:
         seed = random.randint(1, 100000)
     rnd = random.Random(f"{seed}-judge-{judge_id}")
-    pending_ids = [a[0] for a in pending_assignments]
-    rnd.shuffle(pending_ids)
+    pending_task_ids = [a[0] for a in pending_assignments]
+    rnd.shuffle(pending_task_ids)
     
     # 5. 重新分配display_order
+    # 先写入负数临时值再统一翻转，避免紧凑布局下 (judge_id, display_order) 主键冲突
     updates = []
-    for new_order, assign_id in enumerate(pending_ids, start=max_finished_order + 1):
-        updates.append((new_order, assign_id))
+    for new_order, task_id in enumerate(pending_task_ids, start=max_finished_order + 1):
+        updates.append((-(new_order + 1), judge_id, task_id))
     
     # 6. 批量更新数据库
     cur.executemany("""
         UPDATE assignments
         SET display_order = ?
-        WHERE id = ?
+        WHERE judge_id = ? AND task_id = ?
     """, updates)
+    cur.execute("""
+        UPDATE assignments
+        SET display_order = -display_order - 1
+        WHERE judge_id = ? AND display_order < 0
+    """, (judge_id,))
     
     return len(pending_assignments)
 
@@ -248,7 +257,7 @@ def update_database(db_path: str, new_content: dict, scanned_data: dict,
     if not new_content['new_prompts'] and not new_content['new_videos']:
         return 0, 0, 0
     
-    conn = sqlite3.connect(db_path)
+    conn = db_trace.connect(db_path)
     cur = conn.cursor()
     
     ref_videos = scanned_data['ref_videos']
@@ -341,7 +350,7 @@ def update_database(db_path: str, new_content: dict, scanned_data: dict,
                 for judge_id in judges:
                     # 检查是否已存在
                     cur.execute("""
-                        SELECT id FROM assignments 
+                        SELECT 1 FROM assignments 
                         WHERE judge_id = ? AND task_id = ?
                     """, (judge_id, task_id))
                     if cur.fetchone():
@@ -453,7 +462,7 @@ def cleanup_deleted_videos(db_path: str, deleted_videos: list) -> dict:
     if not deleted_videos:
         return {'videos': 0, 'assignments': 0, 'ratings_kept': 0}
     
-    conn = sqlite3.connect(db_path)
+    conn = db_trace.connect(db_path)
     cur = conn.cursor()
     
     video_ids = [v[0] for v in deleted_videos]
@@ -7,6 +7,7 @@
 
 import os
 import sqlite3
+import sys
 import time
 import random
 from pathlib import Path
@@ -14,6 +15,9 @@ from collections import defaultdict
 import itertools
 import argparse
 
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+import db_trace  # noqa: E402
+
 # 项目根目录
 PROJECT_ROOT = Path(__file__).parent.parent
 
@@ -29,7 +33,7 @@ MONITOR_INTERVAL = 300  # 5分钟
 
 def get_db_connection():
     """获取数据库连接"""
-    conn = sqlite3.connect(DB_PATH, timeout=10.0)
+    conn = db_trace.connect(DB_PATH, timeout=10.0)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -270,12 +274,17 @@ def create_new_tasks(gen_videos):
                 if pending_count > 0:
                     random_pos = random.randint(1, pending_count + 1)
                     
-                    # 更新后续任务的position
+                    # 更新后续任务的position（经由负数中转，避免紧凑布局下 (judge_id, position) 主键冲突）
                     cursor.execute("""
                         UPDATE assignments
-                        SET position = position + 1
+                        SET position = -(position + 1)
                         WHERE judge_id = ? AND position >= ?
                     """, (judge_id, random_pos))
+                    cursor.execute("""
+                        UPDATE assignments
+                        SET position = -position
+                        WHERE judge_id = ? AND position < 0
+                    """, (judge_id,))
                     
                     new_position = random_pos
                 else:
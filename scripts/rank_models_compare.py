@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+比较评测模式 - Bradley–Terry 模型排名（Davidson平局扩展）
+
+把 comparisons 汇总为胜负矩阵 W[i, j]（i 胜 j 的次数）与平局矩阵 T[i, j]，拟合 Davidson 模型：
+    P(i 胜 j) = π_i / (π_i + π_j + ν·√(π_i·π_j))
+    P(平局)   = ν·√(π_i·π_j) / (π_i + π_j + ν·√(π_i·π_j))
+π 用向量化的 MM 迭代求解（每次迭代只是 K×K 矩阵运算），ν 用对应的不动点更新。
+
+置信区间：按参考视频（sample_id）整体重采样的 bootstrap，重复次数分块交给进程池并行；
+每次重采样只需两次 bincount 重建所有组的胜负矩阵，一个分块内的 重采样×分组 作为一批一起迭代求解。
+
+输出评分采用 Elo 刻度：rating = 1000 + 400·log10(π)（π 按几何平均归一化）。
+
+用法：
+    python scripts/rank_models_compare.py
+    python scripts/rank_models_compare.py --db aiv_compare_v1.db --bootstrap 1000 --workers 8
+    python scripts/rank_models_compare.py --no-category
+"""
+
+import argparse
+import csv
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+import db_trace  # noqa: E402
+
+if sys.platform == 'win32' and (sys.stdout.encoding or '').lower() != 'utf-8':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+# 配置
+PROJECT_ROOT = Path(__file__).parent.parent
+DB_PATH = PROJECT_ROOT / "aiv_compare_v1.db"
+EXPORT_DIR = PROJECT_ROOT / "export_results_compare"
+
+OVERALL = 'ALL'
+
+# 结果编码
+A_WINS, B_WINS, TIE = 0, 1, 2
+
+
+class ComparisonData:
+    """comparisons 的紧凑数组表示（每条评测一行）"""
+
+    def __init__(self, models, categories, model_a, model_b, outcome, sample, category):
+        self.models = list(models)
+        self.categories = list(categories)
+        self.model_a = model_a
+        self.model_b = model_b
+        self.outcome = outcome
+        self.sample = sample
+        self.category = category
+        self.n_samples = int(sample.max()) + 1 if len(sample) else 0
+
+        # 预计算 bincount 下标：组 g（0=整体，1..C=各类别）中 i 对 j 的格子 = g·K² + i·K + j
+        k = len(self.models)
+        winner = np.where(outcome == B_WINS, model_b, model_a).astype(np.int64)
+        loser = np.where(outcome == B_WINS, model_a, model_b).astype(np.int64)
+        self.decisive = outcome != TIE
+        cell_w = winner * k + loser
+        cell_t = model_a.astype(np.int64) * k + model_b
+        self.cell = np.where(self.decisive, cell_w, cell_t)
+        self.group_cell = (category.astype(np.int64) + 1) * k * k + self.cell
+
+    def __len__(self):
+        return len(self.outcome)
+
+    @property
+    def n_groups(self):
+        return len(self.categories) + 1
+
+
+def load_comparisons(db_path):
+    """读取所有评测为 ComparisonData"""
+    conn = db_trace.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("""
+            SELECT p.category, t.sample_id, t.model_a, t.model_b, c.chosen_model
+            FROM comparisons c
+            JOIN tasks t ON c.task_id = t.task_id
+            JOIN prompts p ON t.sample_id = p.sample_id
+        """).fetchall()
+    finally:
+        conn.close()
+
+    models = sorted({r[2] for r in rows} | {r[3] for r in rows})
+    categories = sorted({r[0] or '' for r in rows})
+    model_idx = {m: i for i, m in enumerate(models)}
+    category_idx = {c: i for i, c in enumerate(categories)}
+    sample_idx = {}
+
+    n = len(rows)
+    model_a = np.empty(n, dtype=np.int32)
+    model_b = np.empty(n, dtype=np.int32)
+    outcome = np.empty(n, dtype=np.int8)
+    sample = np.empty(n, dtype=np.int32)
+    category = np.empty(n, dtype=np.int32)
+    for k, (cat, sample_id, a, b, chosen) in enumerate(rows):
+        model_a[k] = model_idx[a]
+        model_b[k] = model_idx[b]
+        outcome[k] = A_WINS if chosen == a else B_WINS if chosen == b else TIE
+        sample[k] = sample_idx.setdefault(sample_id, len(sample_idx))
+        category[k] = category_idx[cat or '']
+    return ComparisonData(models, categories, model_a, model_b, outcome, sample, category)
+
+
+def count_matrices(data, weights=None, by_category=True):
+    """两次 bincount 构建所有组的胜负矩阵 W[G, K, K] 与对称平局矩阵 T[G, K, K]
+
+    组0为整体，组1..C为各类别（by_category=False 时只有组0）。
+    """
+    k = len(data.models)
+    groups = data.n_groups if by_category else 1
+    size = groups * k * k
+    d = data.decisive
+    w_weights = weights[d] if weights is not None else None
+    t_weights = weights[~d] if weights is not None else None
+    if by_category:
+        W = np.bincount(data.group_cell[d], weights=w_weights, minlength=size).reshape(groups, k, k)
+        T = np.bincount(data.group_cell[~d], weights=t_weights, minlength=size).reshape(groups, k, k)
+        W[0] = W[1:].sum(axis=0)
+        T[0] = T[1:].sum(axis=0)
+    else:
+        W = np.bincount(data.cell[d], weights=w_weights, minlength=size).reshape(1, k, k)
+        T = np.bincount(data.cell[~d], weights=t_weights, minlength=size).reshape(1, k, k)
+    W = W.astype(float)
+    T = T.astype(float)
+    return W, T + T.swapaxes(-1, -2)
+
+
+def fit_davidson(W, T, prior=0.1, tol=1e-7, max_iter=2000, init=None):
+    """向量化MM迭代拟合Davidson模型（可一次求解一批互相独立的问题）
+
+    Args:
+        W: [..., K, K] 胜场矩阵（W[i, j] = i 胜 j 的次数）
+        T: [..., K, K] 对称平局矩阵
+        prior: 每对有过比较的模型之间加入的虚拟胜场（两个方向各一份），避免全胜/全负时发散
+        init: 初始 log π（热启动，bootstrap时传入点估计）
+
+    Returns:
+        (log_strength[..., K], nu[...], iterations)；未参与任何比较的模型 log_strength 为 nan
+    """
+    W = np.asarray(W, dtype=float)
+    T = np.asarray(T, dtype=float)
+    batch_shape = W.shape[:-2]
+    k = W.shape[-1]
+    W = W.reshape(-1, k, k)
+    T = T.reshape(-1, k, k)
+
+    played = (W + W.swapaxes(1, 2) + T) > 0
+    if prior:
+        W = W + prior * played
+    N = W + W.swapaxes(1, 2) + T
+    active = N.sum(axis=2) > 0
+    n_active = np.maximum(active.sum(axis=1), 1)
+    numerator = W.sum(axis=2) + T.sum(axis=2) / 2
+    total_ties = T.sum(axis=(1, 2)) / 2
+    has_ties = total_ties > 0
+    nu = np.where(has_ties, np.maximum(total_ties / np.maximum(N.sum(axis=(1, 2)) / 2, 1.0), 1e-3), 0.0)
+
+    if init is None:
+        log_pi = np.zeros(active.shape)
+    else:
+        log_pi = np.nan_to_num(np.broadcast_to(np.asarray(init, dtype=float), batch_shape + (k,)).reshape(-1, k))
+    pi = np.exp(log_pi)
+
+    iterations = 0
+    for iterations in range(1, max_iter + 1):
+        sqrt_pi = np.sqrt(pi)
+        geo = sqrt_pi[:, :, None] * sqrt_pi[:, None, :]
+        denom = pi[:, :, None] + pi[:, None, :] + nu[:, None, None] * geo
+        ratio = sqrt_pi[:, None, :] / sqrt_pi[:, :, None]
+        weight = (N * (1 + 0.5 * nu[:, None, None] * ratio) / denom).sum(axis=2)
+        new_log = np.log(np.maximum(numerator, 1e-300)) - np.log(np.maximum(weight, 1e-300))
+        # 以几何平均归一化（只在参与比较的模型上）
+        new_log -= ((new_log * active).sum(axis=1) / n_active)[:, None]
+        new_log = np.where(active, new_log, 0.0)
+        pi = np.exp(new_log)
+
+        sqrt_pi = np.sqrt(pi)
+        geo = sqrt_pi[:, :, None] * sqrt_pi[:, None, :]
+        denom = pi[:, :, None] + pi[:, None, :] + nu[:, None, None] * geo
+        tie_mass = np.triu(N * geo / denom, 1).sum(axis=(1, 2))
+        nu = np.where(has_ties, total_ties / np.maximum(tie_mass, 1e-300), 0.0)
+
+        delta = np.abs(new_log - log_pi).max()
+        log_pi = new_log
+        if delta < tol:
+            break
+
+    log_strength = np.where(active, log_pi, np.nan)
+    return log_strength.reshape(batch_shape + (k,)), nu.reshape(batch_shape), iterations
+
+
+def to_rating(log_strength):
+    """log π → Elo刻度"""
+    return 1000 + 400 * log_strength / math.log(10)
+
+
+def group_names(data, by_category=True):
+    return [OVERALL] + (data.categories if by_category else [])
+
+
+def _bootstrap_chunk(args):
+    """进程池任务：按sample整体重采样 n 次，所有重采样×分组一起批量拟合"""
+    data, n, seed, by_category, prior, init = args
+    rng = np.random.default_rng(seed)
+    W_all, T_all = [], []
+    for _ in range(n):
+        draws = rng.integers(0, data.n_samples, data.n_samples)
+        weights = np.bincount(draws, minlength=data.n_samples)[data.sample].astype(float)
+        W, T = count_matrices(data, weights, by_category)
+        W_all.append(W)
+        T_all.append(T)
+    log_strength, _, _ = fit_davidson(np.stack(W_all), np.stack(T_all), prior, init=init)
+    return to_rating(log_strength)
+
+
+def bootstrap(data, n_boot=500, workers=None, seed=42, by_category=True, prior=0.1, chunk=50, init=None):
+    """并行bootstrap，返回 ratings[n_boot, G, K]"""
+    workers = workers or os.cpu_count() or 1
+    seeds = np.random.SeedSequence(seed).generate_state(math.ceil(n_boot / chunk))
+    jobs = []
+    remaining = n_boot
+    for s in seeds:
+        jobs.append((data, min(chunk, remaining), int(s), by_category, prior, init))
+        remaining -= chunk
+
+    if workers <= 1 or len(jobs) == 1:
+        parts = [_bootstrap_chunk(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            parts = list(pool.map(_bootstrap_chunk, jobs))
+    return np.concatenate(parts)
+
+
+def rank_models(data, n_boot=500, workers=None, seed=42, by_category=True, prior=0.1, alpha=0.05):
+    """完整排名：点估计 + bootstrap置信区间 + 胜/平/负计数
+
+    Returns:
+        (rows, nu)：rows 每个 (group, model) 一行，按group、rank排序；nu 为整体平局参数
+    """
+    W, T = count_matrices(data, None, by_category)
+    log_strength, nu, _ = fit_davidson(W, T, prior)
+    point = to_rating(log_strength)
+    boot = None
+    if n_boot > 0:
+        boot = bootstrap(data, n_boot, workers, seed, by_category, prior, init=log_strength)
+
+    rows = []
+    for g, group in enumerate(group_names(data, by_category)):
+        ratings = point[g]
+        order = [i for i in np.argsort(-np.nan_to_num(ratings, nan=-np.inf)) if not np.isnan(ratings[i])]
+        for rank, i in enumerate(order, start=1):
+            wins, losses, ties = W[g, i].sum(), W[g, :, i].sum(), T[g, i].sum()
+            row = {
+                'category': group,
+                'rank': rank,
+                'model_name': data.models[i],
+                'rating': round(float(ratings[i]), 1),
+                'ci_low': '',
+                'ci_high': '',
+                'wins': int(wins),
+                'ties': int(ties),
+                'losses': int(losses),
+                'comparisons': int(wins + ties + losses),
+            }
+            if boot is not None:
+                col = boot[:, g, i]
+                col = col[~np.isnan(col)]
+                if len(col):
+                    row['ci_low'] = round(float(np.quantile(col, alpha / 2)), 1)
+                    row['ci_high'] = round(float(np.quantile(col, 1 - alpha / 2)), 1)
+            rows.append(row)
+    return rows, float(nu[0])
+
+
+def print_ranking(rows, group=OVERALL):
+    print(f"\n  {'排名':<4} {'模型':<15} {'评分':>8} {'95% CI':>17} {'胜':>6} {'平':>6} {'负':>6}")
+    print(f"  {'-' * 70}")
+    for row in rows:
+        if row['category'] != group:
+            continue
+        ci = f"[{row['ci_low']}, {row['ci_high']}]" if row['ci_low'] != '' else '-'
+        print(f"  {row['rank']:<6} {row['model_name']:<15} {row['rating']:>8.1f} {ci:>17} "
+              f"{row['wins']:>6} {row['ties']:>6} {row['losses']:>6}")
+
+
+def export_ranking(rows, export_dir=EXPORT_DIR):
+    export_dir = Path(export_dir)
+    export_dir.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_file = export_dir / f"model_ranking_{timestamp}.csv"
+    with open(output_file, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+    return output_file
+
+
+def main():
+    ap = argparse.ArgumentParser(description='比较评测 - Bradley–Terry（Davidson平局）模型排名')
+    ap.add_argument('--db', default=str(DB_PATH), help='数据库路径')
+    ap.add_argument('--out-dir', default=str(EXPORT_DIR), help='导出目录')
+    ap.add_argument('--bootstrap', type=int, default=500, help='bootstrap重复次数（0=不计算置信区间）')
+    ap.add_argument('--workers', type=int, default=None, help='bootstrap进程数（默认CPU核数）')
+    ap.add_argument('--seed', type=int, default=42)
+    ap.add_argument('--prior', type=float, default=0.1, help='每对模型之间的虚拟胜场数')
+    ap.add_argument('--no-category', action='store_true', help='不计算分类别排名')
+    args = ap.parse_args()
+
+    if not Path(args.db).exists():
+        print(f"❌ 数据库不存在: {args.db}")
+        return 1
+
+    data = load_comparisons(args.db)
+    if len(data) == 0:
+        print("ℹ️  还没有评测记录")
+        return 0
+
+    start = time.perf_counter()
+    W, T = count_matrices(data, by_category=not args.no_category)
+    _, _, iterations = fit_davidson(W, T, args.prior)
+    fit_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    rows, nu = rank_models(data, args.bootstrap, args.workers, args.seed,
+                           not args.no_category, args.prior)
+    total_s = time.perf_counter() - start
+
+    print("=" * 80)
+    print("比较评测模式 - Bradley–Terry 排名（Davidson平局模型）")
+    print("=" * 80)
+    print(f"  评测记录: {len(data)} 条，模型: {len(data.models)} 个，参考视频: {data.n_samples} 个")
+    print(f"  平局参数 ν = {nu:.3f}，整体+分类别拟合 {iterations} 次迭代 / {fit_ms:.1f} ms")
+    print(f"  bootstrap {args.bootstrap} 次（按参考视频重采样），总耗时 {total_s:.2f}s")
+    print_ranking(rows)
+
+    output_file = export_ranking(rows, args.out_dir)
+    print(f"\n  ✅ 排名（含分类别）: {output_file}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
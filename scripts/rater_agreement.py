@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+打分模式 - 评审一致性分析
+
+把 ratings 读成稠密数组 cube[任务, 评审位, 维度]（每个任务最多 --slots 个评分，缺失为 nan），
+在此基础上全部用向量化运算计算：
+- Krippendorff's alpha（ordinal，1–5分）：按任务累加 5×5 重合矩阵（coincidence matrix），允许缺失
+- ICC(1,1) / ICC(1,k)：单向随机效应（每个任务的评审员不同），只用评满 k 次的任务
+- 两两评审员一致性：同一视频上每对评审员的完全一致率、相差≤1分比例、平均绝对差
+- 每个评审员的偏差：与同一视频其他评审员平均分之差（正数=打分偏松）
+
+置信区间：按任务重采样的 bootstrap。alpha 与 ICC 都只依赖若干“按任务可加”的统计量，
+每次重采样 = 一次 bincount 得到各任务的抽中次数 + 一次矩阵乘法，1000次重采样也只需几百毫秒。
+
+用法：
+    python scripts/rater_agreement.py --db aiv_eval_v4.db
+    python scripts/rater_agreement.py --db aiv_eval_v4.db --bootstrap 2000 --out export_results/agreement.csv
+"""
+
+import argparse
+import csv
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+import db_trace  # noqa: E402
+
+if sys.platform == 'win32' and (sys.stdout.encoding or '').lower() != 'utf-8':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+DIMENSIONS = ['semantic', 'motion', 'temporal', 'realism']
+DIMENSION_NAMES = {
+    'semantic': '基本语义对齐',
+    'motion': '运动',
+    'temporal': '事件时序',
+    'realism': '世界知识',
+}
+SCORE_LEVELS = 5      # 1–5分
+DEFAULT_SLOTS = 3     # 每个任务需要的评审人数
+
+
+class RatingCube:
+    """评分立方体：scores[任务, 评审位, 维度]，judges[任务, 评审位]（缺失为 -1）"""
+
+    def __init__(self, scores, judges, video_ids, judge_ids, truncated=0):
+        self.scores = scores
+        self.judges = judges
+        self.video_ids = video_ids
+        self.judge_ids = judge_ids
+        self.truncated = truncated
+
+    @property
+    def n_tasks(self):
+        return self.scores.shape[0]
+
+    @property
+    def counts(self):
+        """每个任务的评分数"""
+        return (self.judges >= 0).sum(axis=1)
+
+
+def load_cube(conn, slots=DEFAULT_SLOTS):
+    """读取 ratings 为 RatingCube（一次查询，按视频分组后向量化计算评审位）"""
+    rows = conn.execute("""
+        SELECT video_id, judge_id, score_semantic, score_motion, score_temporal, score_realism
+        FROM ratings
+        ORDER BY video_id, id
+    """).fetchall()
+    data = np.array(rows, dtype=np.int64).reshape(-1, 6)
+    video, judge, scores = data[:, 0], data[:, 1], data[:, 2:].astype(float)
+
+    video_ids, task_idx = np.unique(video, return_inverse=True)
+    judge_ids, judge_idx = np.unique(judge, return_inverse=True)
+    # 组内序号：行号 - 该视频第一行的行号（已按video_id排序）
+    first = np.searchsorted(video, video_ids)
+    slot = np.arange(len(video)) - first[task_idx]
+    keep = slot < slots
+
+    cube = np.full((len(video_ids), slots, len(DIMENSIONS)), np.nan)
+    judges = np.full((len(video_ids), slots), -1, dtype=np.int64)
+    cube[task_idx[keep], slot[keep]] = scores[keep]
+    judges[task_idx[keep], slot[keep]] = judge_idx[keep]
+    return RatingCube(cube, judges, video_ids, judge_ids, truncated=int((~keep).sum()))
+
+
+def _ordinal_delta2(marginals):
+    """ordinal距离：δ²(c, k) = (Σ_{g=c..k} n_g − (n_c + n_k)/2)²"""
+    cum = np.concatenate([[0.0], np.cumsum(marginals)])
+    lo = np.minimum.outer(np.arange(SCORE_LEVELS), np.arange(SCORE_LEVELS))
+    hi = np.maximum.outer(np.arange(SCORE_LEVELS), np.arange(SCORE_LEVELS))
+    between = cum[hi + 1] - cum[lo]
+    return (between - (marginals[:, None] + marginals[None, :]) / 2) ** 2
+
+
+def _interval_delta2():
+    levels = np.arange(SCORE_LEVELS, dtype=float)
+    return (levels[:, None] - levels[None, :]) ** 2
+
+
+def coincidence_per_task(values):
+    """每个任务的重合矩阵贡献 [任务, 5, 5]（values: [任务, 评审位]，1–5分，缺失nan）"""
+    valid = ~np.isnan(values)
+    onehot = np.zeros(values.shape + (SCORE_LEVELS,))
+    rows, cols = np.nonzero(valid)
+    onehot[rows, cols, values[valid].astype(int) - 1] = 1
+    n_uc = onehot.sum(axis=1)                       # [任务, 5]
+    m_u = valid.sum(axis=1)
+    pairable = m_u >= 2
+    scale = np.where(pairable, 1.0 / np.maximum(m_u - 1, 1), 0.0)
+    contrib = n_uc[:, :, None] * n_uc[:, None, :]
+    contrib[:, np.arange(SCORE_LEVELS), np.arange(SCORE_LEVELS)] -= n_uc
+    return contrib * scale[:, None, None]
+
+
+def alpha_from_coincidence(o, level='ordinal'):
+    """由（可批量的）重合矩阵 o[..., 5, 5] 计算 Krippendorff's alpha"""
+    o = np.asarray(o, dtype=float)
+    batch = o.reshape(-1, SCORE_LEVELS, SCORE_LEVELS)
+    result = np.full(len(batch), np.nan)
+    for b, ob in enumerate(batch):
+        n_c = ob.sum(axis=1)
+        n = n_c.sum()
+        if n <= 1:
+            continue
+        delta2 = _ordinal_delta2(n_c) if level == 'ordinal' else _interval_delta2()
+        expected = (np.outer(n_c, n_c) * delta2).sum()
+        if expected > 0:
+            result[b] = 1 - (n - 1) * (ob * delta2).sum() / expected
+    return result.reshape(o.shape[:-2])
+
+
+def icc_stats_per_task(values, k):
+    """ICC所需的按任务可加统计量 [任务, 4]：[评满k次, Σ均值, Σ均值², 组内平方和]"""
+    complete = (~np.isnan(values[:, :k])).all(axis=1)
+    x = np.where(complete[:, None], values[:, :k], 0.0)
+    mean = x.mean(axis=1)
+    ss = ((x - mean[:, None]) ** 2).sum(axis=1)
+    e = complete.astype(float)
+    return np.stack([e, e * mean, e * mean ** 2, e * ss], axis=1)
+
+
+def icc_from_sums(sums, k):
+    """由按任务累加后的统计量计算 (ICC(1,1), ICC(1,k))；sums[..., 4]"""
+    sums = np.asarray(sums, dtype=float)
+    n, s1, s2, ssw = sums[..., 0], sums[..., 1], sums[..., 2], sums[..., 3]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        msb = k * (s2 - s1 ** 2 / n) / (n - 1)
+        msw = ssw / (n * (k - 1))
+        icc1 = (msb - msw) / (msb + (k - 1) * msw)
+        icck = (msb - msw) / msb
+    return icc1, icck
+
+
+def bootstrap_weights(n_tasks, n_boot, rng, chunk=200):
+    """逐块生成按任务重采样的抽中次数矩阵 [chunk, 任务]"""
+    for start in range(0, n_boot, chunk):
+        size = min(chunk, n_boot - start)
+        weights = np.empty((size, n_tasks))
+        for b in range(size):
+            weights[b] = np.bincount(rng.integers(0, n_tasks, n_tasks), minlength=n_tasks)
+        yield weights
+
+
+def agreement_summary(cube, n_boot=1000, seed=42, level='ordinal', ci=0.95):
+    """各维度的 alpha / ICC 及 bootstrap 置信区间
+
+    Returns:
+        [{'dimension', 'n_units', 'alpha', 'alpha_low', 'alpha_high',
+          'n_complete', 'icc1', 'icc1_low', 'icc1_high', 'icck', 'icck_low', 'icck_high'}, ...]
+    """
+    k = cube.scores.shape[1]
+    n_dims = len(DIMENSIONS)
+    # 按任务可加的特征：每个维度 25 个重合矩阵元素 + 4 个ICC统计量
+    features = []
+    for d in range(n_dims):
+        values = cube.scores[:, :, d]
+        features.append(coincidence_per_task(values).reshape(cube.n_tasks, -1))
+        features.append(icc_stats_per_task(values, k))
+    features = np.concatenate(features, axis=1)
+    width = SCORE_LEVELS * SCORE_LEVELS + 4
+
+    def metrics(totals):
+        """totals[..., n_dims·width] → alpha[..., n_dims], icc1, icck"""
+        totals = totals.reshape(totals.shape[:-1] + (n_dims, width))
+        o = totals[..., :SCORE_LEVELS * SCORE_LEVELS].reshape(totals.shape[:-1] + (SCORE_LEVELS, SCORE_LEVELS))
+        icc1, icck = icc_from_sums(totals[..., SCORE_LEVELS * SCORE_LEVELS:], k)
+        return alpha_from_coincidence(o, level), icc1, icck
+
+    point = metrics(features.sum(axis=0))
+    boot = None
+    if n_boot > 0 and cube.n_tasks > 1:
+        rng = np.random.default_rng(seed)
+        parts = [metrics(w @ features) for w in bootstrap_weights(cube.n_tasks, n_boot, rng)]
+        boot = [np.concatenate([p[i] for p in parts]) for i in range(3)]
+
+    tail = (1 - ci) / 2
+    pairable = ((~np.isnan(cube.scores)).sum(axis=1) >= 2)
+    complete = (~np.isnan(cube.scores)).all(axis=1)
+    rows = []
+    for d, dim in enumerate(DIMENSIONS):
+        row = {'dimension': dim, 'n_units': int(pairable[:, d].sum()), 'n_complete': int(complete[:, d].sum())}
+        for i, name in enumerate(['alpha', 'icc1', 'icck']):
+            value = point[i][d]
+            row[name] = None if np.isnan(value) else round(float(value), 4)
+            low = high = None
+            if boot is not None:
+                samples = boot[i][:, d]
+                samples = samples[~np.isnan(samples)]
+                if len(samples):
+                    low = round(float(np.quantile(samples, tail)), 4)
+                    high = round(float(np.quantile(samples, 1 - tail)), 4)
+            row[f'{name}_low'] = low
+            row[f'{name}_high'] = high
+        rows.append(row)
+    return rows
+
+
+def pairwise_agreement(cube):
+    """两两评审员一致性（所有维度合并）
+
+    Returns:
+        [{'judge_a', 'judge_b', 'n_items', 'exact', 'within_one', 'mean_abs_diff'}, ...]
+        n_items 为共同评过的（视频, 维度）数
+    """
+    k = cube.scores.shape[1]
+    n_judges = len(cube.judge_ids)
+    ja, jb, diffs = [], [], []
+    for s in range(k):
+        for t in range(s + 1, k):
+            both = (cube.judges[:, s] >= 0) & (cube.judges[:, t] >= 0)
+            a, b = cube.judges[both, s], cube.judges[both, t]
+            lo, hi = np.minimum(a, b), np.maximum(a, b)
+            ja.append(np.repeat(lo, len(DIMENSIONS)))
+            jb.append(np.repeat(hi, len(DIMENSIONS)))
+            diffs.append(np.abs(cube.scores[both, s] - cube.scores[both, t]).ravel())
+    if not ja:
+        return []
+    ja, jb, diffs = np.concatenate(ja), np.concatenate(jb), np.concatenate(diffs)
+    key = ja * n_judges + jb
+    size = n_judges * n_judges
+    n = np.bincount(key, minlength=size)
+    exact = np.bincount(key, weights=(diffs == 0), minlength=size)
+    within = np.bincount(key, weights=(diffs <= 1), minlength=size)
+    total = np.bincount(key, weights=diffs, minlength=size)
+
+    rows = []
+    for idx in np.nonzero(n)[0]:
+        a, b = divmod(int(idx), n_judges)
+        rows.append({
+            'judge_a': int(cube.judge_ids[a]),
+            'judge_b': int(cube.judge_ids[b]),
+            'n_items': int(n[idx]),
+            'exact': round(exact[idx] / n[idx], 4),
+            'within_one': round(within[idx] / n[idx], 4),
+            'mean_abs_diff': round(total[idx] / n[idx], 4),
+        })
+    return rows
+
+
+def judge_leniency(cube):
+    """每个评审员相对同一视频其他评审员平均分的偏差（各维度平均）
+
+    Returns:
+        [{'judge_id', 'n_ratings', 'bias', 'mean_abs_dev'}, ...]
+    """
+    valid = ~np.isnan(cube.scores)
+    counts = valid.sum(axis=1, keepdims=True)          # [任务, 1, 维度]
+    totals = np.nansum(cube.scores, axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        others = (totals - cube.scores) / (counts - 1)   # 其他人的平均分
+    dev = cube.scores - others
+    usable = valid & (counts >= 2)
+    judge = np.broadcast_to(cube.judges[:, :, None], dev.shape)[usable]
+    dev = dev[usable]
+    n_judges = len(cube.judge_ids)
+    n = np.bincount(judge, minlength=n_judges)
+    bias = np.bincount(judge, weights=dev, minlength=n_judges)
+    absdev = np.bincount(judge, weights=np.abs(dev), minlength=n_judges)
+    rows = []
+    for j in np.nonzero(n)[0]:
+        rows.append({
+            'judge_id': int(cube.judge_ids[j]),
+            'n_ratings': int(n[j] // len(DIMENSIONS)),
+            'bias': round(bias[j] / n[j], 4),
+            'mean_abs_dev': round(absdev[j] / n[j], 4),
+        })
+    return rows
+
+
+def _fmt(value, low=None, high=None):
+    if value is None:
+        return '-'
+    text = f"{value:.3f}"
+    if low is not None:
+        text += f" [{low:.3f}, {high:.3f}]"
+    return text
+
+
+def print_report(summary, pairs=None, leniency=None, judge_names=None):
+    judge_names = judge_names or {}
+    print(f"\n  {'维度':<12} {'任务数(α/ICC)':>14} {'Krippendorff α':>26} {'ICC(1,1)':>24} {'ICC(1,k)':>24}")
+    print(f"  {'-' * 98}")
+    for row in summary:
+        name = DIMENSION_NAMES.get(row['dimension'], row['dimension'])
+        units = f"{row['n_units']}/{row['n_complete']}"
+        print(f"  {name:<12} {units:>14} "
+              f"{_fmt(row['alpha'], row['alpha_low'], row['alpha_high']):>28} "
+              f"{_fmt(row['icc1'], row['icc1_low'], row['icc1_high']):>24} "
+              f"{_fmt(row['icck'], row['icck_low'], row['icck_high']):>24}")
+
+    if leniency:
+        print(f"\n  {'评审员':<15} {'评分数':>6} {'偏差':>8} {'平均绝对偏差':>12}")
+        print(f"  {'-' * 50}")
+        for row in sorted(leniency, key=lambda r: r['bias']):
+            name = judge_names.get(row['judge_id'], str(row['judge_id']))
+            print(f"  {name:<15} {row['n_ratings']:>6} {row['bias']:>+8.3f} {row['mean_abs_dev']:>12.3f}")
+
+    if pairs:
+        worst = sorted(pairs, key=lambda r: r['within_one'])[:5]
+        print(f"\n  一致性最低的评审员组合（相差≤1分比例）:")
+        for row in worst:
+            a = judge_names.get(row['judge_a'], str(row['judge_a']))
+            b = judge_names.get(row['judge_b'], str(row['judge_b']))
+            print(f"    {a} × {b}: {row['within_one'] * 100:.1f}%（完全一致 {row['exact'] * 100:.1f}%，"
+                  f"平均差 {row['mean_abs_diff']:.2f}，{row['n_items']} 项）")
+
+
+def write_summary_csv(path, summary):
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=list(summary[0].keys()))
+        writer.writeheader()
+        writer.writerows(summary)
+
+
+def write_pairs_csv(path, pairs):
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=['judge_a', 'judge_b', 'n_items', 'exact', 'within_one', 'mean_abs_diff'])
+        writer.writeheader()
+        writer.writerows(pairs)
+
+
+def judge_name_map(conn):
+    return {row[0]: row[1] for row in conn.execute("SELECT id, name FROM judges")}
+
+
+def main():
+    ap = argparse.ArgumentParser(description='打分模式 - 评审一致性（Krippendorff α、ICC、两两一致率）')
+    ap.add_argument('--db', default='aiv_eval_v4.db', help='数据库路径')
+    ap.add_argument('--slots', type=int, default=DEFAULT_SLOTS, help='每个任务的评审人数（超出部分忽略）')
+    ap.add_argument('--bootstrap', type=int, default=1000, help='bootstrap重复次数（0=不计算置信区间）')
+    ap.add_argument('--seed', type=int, default=42)
+    ap.add_argument('--level', choices=['ordinal', 'interval'], default='ordinal', help='alpha的距离度量')
+    ap.add_argument('--out', help='输出CSV路径（各维度汇总；两两一致性写到同名 _pairs.csv）')
+    args = ap.parse_args()
+
+    if not Path(args.db).exists():
+        print(f"❌ 数据库不存在: {args.db}")
+        return 1
+
+    conn = db_trace.connect(f"file:{args.db}?mode=ro", uri=True)
+    try:
+        start = time.perf_counter()
+        cube = load_cube(conn, args.slots)
+        load_s = time.perf_counter() - start
+        names = judge_name_map(conn)
+    finally:
+        conn.close()
+
+    if cube.n_tasks == 0:
+        print("ℹ️  还没有评分记录")
+        return 0
+
+    start = time.perf_counter()
+    summary = agreement_summary(cube, args.bootstrap, args.seed, args.level)
+    pairs = pairwise_agreement(cube)
+    leniency = judge_leniency(cube)
+    compute_s = time.perf_counter() - start
+
+    print("=" * 100)
+    print("打分模式 - 评审一致性")
+    print("=" * 100)
+    counts = np.bincount(cube.counts, minlength=args.slots + 1)
+    print(f"  视频: {cube.n_tasks} 个（" + "，".join(f"{i}人评 {counts[i]}" for i in range(1, len(counts))) + "）")
+    if cube.truncated:
+        print(f"  ⚠️  {cube.truncated} 条评分超出 {args.slots} 人上限，已忽略")
+    print(f"  读取 {load_s:.2f}s，计算 {compute_s:.2f}s（bootstrap {args.bootstrap} 次）")
+    print_report(summary, pairs, leniency, names)
+
+    if args.out:
+        out = Path(args.out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        write_summary_csv(out, summary)
+        pairs_path = out.with_name(out.stem + '_pairs.csv')
+        write_pairs_csv(pairs_path, pairs)
+        print(f"\n  ✅ 汇总: {out}")
+        print(f"  ✅ 两两一致性: {pairs_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
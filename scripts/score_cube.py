@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+打分模式 - 模型 × 类别 × 维度 评分立方体（物化聚合表）
+
+score_cube 每个 (modelname, category) 一行，保存评分数 n 以及四个维度的分数和、平方和（整数，精确）。
+ratings 上的触发器在插入、重新打分（UPSERT）、删除（含视频级联删除）时同步增减，
+任何切片的均值 / 标准差 / 95%置信区间都只需读取几十行，不再扫描 ratings。
+
+类别由 sample_id 按 prepare_data.py 的命名规则 {category}_{NNN}_{single|multi} 提取，不匹配的记为空字符串。
+
+用法：
+    python scripts/score_cube.py --db aiv_eval_v4.db --install      # 建表、建触发器，与ratings不一致时回填
+    python scripts/score_cube.py --db aiv_eval_v4.db                # 按模型汇总
+    python scripts/score_cube.py --db aiv_eval_v4.db --by category
+    python scripts/score_cube.py --db aiv_eval_v4.db --by model-category --category sports_competition
+    python scripts/score_cube.py --db aiv_eval_v4.db --verify       # 与直接扫描ratings的结果核对
+"""
+
+import argparse
+import math
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+import db_trace  # noqa: E402
+
+if sys.platform == 'win32' and (sys.stdout.encoding or '').lower() != 'utf-8':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+DIMENSIONS = ['semantic', 'motion', 'temporal', 'realism']
+DIMENSION_NAMES = {
+    'semantic': '基本语义对齐',
+    'motion': '运动',
+    'temporal': '事件时序',
+    'realism': '世界知识',
+}
+Z_95 = 1.959964
+
+# 与 db/schema.sql 中的定义保持一致
+CUBE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS score_cube (
+        modelname TEXT NOT NULL,
+        category TEXT NOT NULL,
+        n INTEGER NOT NULL DEFAULT 0,
+        sum_semantic INTEGER NOT NULL DEFAULT 0,
+        sumsq_semantic INTEGER NOT NULL DEFAULT 0,
+        sum_motion INTEGER NOT NULL DEFAULT 0,
+        sumsq_motion INTEGER NOT NULL DEFAULT 0,
+        sum_temporal INTEGER NOT NULL DEFAULT 0,
+        sumsq_temporal INTEGER NOT NULL DEFAULT 0,
+        sum_realism INTEGER NOT NULL DEFAULT 0,
+        sumsq_realism INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (modelname, category)
+    ) WITHOUT ROWID
+    """,
+]
+
+
+def _category_sql(sample):
+    """sample_id → 类别 的SQL表达式（与 prepare_data.sample_category 相同规则）"""
+    return (f"CASE WHEN {sample} GLOB '*_[0-9][0-9][0-9]_single' THEN substr({sample}, 1, length({sample}) - 11) "
+            f"WHEN {sample} GLOB '*_[0-9][0-9][0-9]_multi' THEN substr({sample}, 1, length({sample}) - 10) "
+            f"ELSE '' END")
+
+
+def _upsert_sql(row, sign):
+    """把一条评分（NEW/OLD）以 sign=+1/-1 累加进 score_cube 的语句"""
+    values = ', '.join(f"{sign} * {row}.score_{d}, {sign} * {row}.score_{d} * {row}.score_{d}" for d in DIMENSIONS)
+    updates = ',\n            '.join(
+        f"sum_{d} = sum_{d} + excluded.sum_{d}, sumsq_{d} = sumsq_{d} + excluded.sumsq_{d}" for d in DIMENSIONS)
+    columns = ', '.join(f"sum_{d}, sumsq_{d}" for d in DIMENSIONS)
+    return f"""
+        INSERT INTO score_cube (modelname, category, n, {columns})
+        SELECT COALESCE({row}.modelname, ''), {_category_sql('s')}, {sign}, {values}
+        FROM (SELECT COALESCE({row}.sample_id, {row}.prompt_id, '') AS s)
+        WHERE true
+        ON CONFLICT(modelname, category) DO UPDATE SET
+            n = n + excluded.n,
+            {updates};"""
+
+
+CUBE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS score_cube_on_rating_insert
+    AFTER INSERT ON ratings
+    FOR EACH ROW
+    BEGIN{_upsert_sql('NEW', 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS score_cube_on_rating_update
+    AFTER UPDATE OF score_semantic, score_motion, score_temporal, score_realism, modelname, sample_id, prompt_id
+    ON ratings
+    FOR EACH ROW
+    BEGIN{_upsert_sql('OLD', -1)}{_upsert_sql('NEW', 1)}
+        DELETE FROM score_cube WHERE n = 0;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS score_cube_on_rating_delete
+    AFTER DELETE ON ratings
+    FOR EACH ROW
+    BEGIN{_upsert_sql('OLD', -1)}
+        DELETE FROM score_cube WHERE n = 0;
+    END
+    """,
+]
+
+
+def install(conn):
+    """建表和触发器，并按现有ratings核对；不一致时重建。返回是否回填
+
+    db/schema.sql 会建出空的 score_cube（setup_project.py --keep 对已有评分的旧库也会执行），
+    所以不能以“表已存在”判断是否需要回填
+    """
+    for sql in CUBE_SCHEMA + CUBE_TRIGGERS:
+        conn.execute(sql)
+    rebuilt = bool(verify(conn))
+    if rebuilt:
+        rebuild(conn)
+    conn.commit()
+    return rebuilt
+
+
+def rebuild(conn):
+    """按ratings重建score_cube（一次分组扫描，在调用方事务中执行）"""
+    columns = ', '.join(f"sum_{d}, sumsq_{d}" for d in DIMENSIONS)
+    aggregates = ', '.join(f"SUM(score_{d}), SUM(score_{d} * score_{d})" for d in DIMENSIONS)
+    conn.execute("DELETE FROM score_cube")
+    conn.execute(f"""
+        INSERT INTO score_cube (modelname, category, n, {columns})
+        SELECT m, c, COUNT(*), {aggregates}
+        FROM (
+            SELECT COALESCE(modelname, '') AS m,
+                   {_category_sql("COALESCE(sample_id, prompt_id, '')")} AS c,
+                   score_semantic, score_motion, score_temporal, score_realism
+            FROM ratings
+        )
+        GROUP BY m, c
+    """)
+
+
+def has_cube(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'score_cube'").fetchone() is not None
+
+
+def cube_in_sync(conn):
+    """快速检查：score_cube 的总评分数与 ratings 行数一致（不一致说明未回填，需 --install / --rebuild）"""
+    cube_n = conn.execute("SELECT COALESCE(SUM(n), 0) FROM score_cube").fetchone()[0]
+    return cube_n == conn.execute("SELECT COUNT(*) FROM ratings").fetchone()[0]
+
+
+def describe(n, total, total_sq):
+    """由计数、和、平方和得到 均值 / 样本标准差 / 95%置信区间半宽"""
+    if not n:
+        return None, None, None
+    mean = total / n
+    if n < 2:
+        return mean, None, None
+    var = max(total_sq - total * total / n, 0) / (n - 1)
+    std = math.sqrt(var)
+    return mean, std, Z_95 * std / math.sqrt(n)
+
+
+def cube_slice(conn, by=('modelname',), model=None, category=None):
+    """按给定维度汇总score_cube（只读取几十行）
+
+    Args:
+        by: 分组键，取 ('modelname',) / ('category',) / ('modelname', 'category') / ()
+        model / category: 过滤条件
+
+    Returns:
+        [{'modelname'?, 'category'?, 'n', '<dim>_mean', '<dim>_std', '<dim>_ci'...}, ...]
+    """
+    where, params = [], []
+    if model is not None:
+        where.append("modelname = ?")
+        params.append(model)
+    if category is not None:
+        where.append("category = ?")
+        params.append(category)
+    keys = list(by)
+    sums = ', '.join(f"SUM(sum_{d}), SUM(sumsq_{d})" for d in DIMENSIONS)
+    sql = f"SELECT {', '.join(keys + ['SUM(n)'])}, {sums} FROM score_cube"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if keys:
+        sql += f" GROUP BY {', '.join(keys)} ORDER BY {', '.join(keys)}"
+
+    results = []
+    for row in conn.execute(sql, params):
+        record = dict(zip(keys, row[:len(keys)]))
+        n = row[len(keys)] or 0
+        if not n:
+            continue
+        record['n'] = n
+        for i, d in enumerate(DIMENSIONS):
+            total, total_sq = row[len(keys) + 1 + 2 * i], row[len(keys) + 2 + 2 * i]
+            record[f'{d}_mean'], record[f'{d}_std'], record[f'{d}_ci'] = describe(n, total, total_sq)
+        results.append(record)
+    return results
+
+
+def verify(conn):
+    """与直接扫描ratings的分组结果逐格核对，返回不一致的 (modelname, category) 列表"""
+    columns = ['n'] + [f"{p}_{d}" for d in DIMENSIONS for p in ('sum', 'sumsq')]
+    cube = {(r[0], r[1]): r[2:] for r in conn.execute(
+        f"SELECT modelname, category, {', '.join(columns)} FROM score_cube WHERE n != 0")}
+    aggregates = ', '.join(f"SUM(score_{d}), SUM(score_{d} * score_{d})" for d in DIMENSIONS)
+    scan = {(r[0], r[1]): r[2:] for r in conn.execute(f"""
+        SELECT COALESCE(modelname, ''), {_category_sql("COALESCE(sample_id, prompt_id, '')")},
+               COUNT(*), {aggregates}
+        FROM ratings
+        GROUP BY 1, 2
+    """)}
+    return sorted(key for key in set(cube) | set(scan) if cube.get(key) != scan.get(key))
+
+
+def print_slice(rows, keys):
+    header = ''.join(f"{k:<22}" for k in keys)
+    dims = ''.join(f"{DIMENSION_NAMES[d]:>18}" for d in DIMENSIONS)
+    print(f"\n  {header}{'n':>7}{dims}")
+    print(f"  {'-' * (22 * len(keys) + 7 + 18 * len(DIMENSIONS))}")
+    for row in rows:
+        cells = ''.join(f"{str(row[k]) or '-':<22}" for k in keys)
+        stats = ''
+        for d in DIMENSIONS:
+            mean, ci = row[f'{d}_mean'], row[f'{d}_ci']
+            stats += f"{mean:>11.2f} ±{ci:<5.2f}" if ci is not None else f"{mean:>11.2f}       "
+        print(f"  {cells}{row['n']:>7}{stats}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description='打分模式 - 模型×类别×维度 评分立方体')
+    ap.add_argument('--db', default='aiv_eval_v4.db', help='数据库路径')
+    ap.add_argument('--install', action='store_true', help='建表、建触发器并回填（旧库执行一次即可）')
+    ap.add_argument('--rebuild', action='store_true', help='按ratings全量重建')
+    ap.add_argument('--verify', action='store_true', help='与直接扫描ratings的结果核对')
+    ap.add_argument('--by', choices=['model', 'category', 'model-category', 'all'], default='model',
+                    help='汇总方式')
+    ap.add_argument('--model', help='只看某个模型')
+    ap.add_argument('--category', help='只看某个类别')
+    args = ap.parse_args()
+
+    if not Path(args.db).exists():
+        print(f"❌ 数据库不存在: {args.db}")
+        return 1
+
+    conn = db_trace.connect(args.db, timeout=10.0)
+    try:
+        if args.install:
+            rebuilt = install(conn)
+            print("✅ 评分立方体已按ratings回填" if rebuilt else "✅ 评分立方体与ratings一致，触发器已确认")
+        if not has_cube(conn):
+            print("❌ 数据库中没有score_cube，请先运行 --install")
+            return 1
+        if args.rebuild:
+            rebuild(conn)
+            conn.commit()
+            print("✅ 已按ratings重建")
+        if args.verify:
+            mismatched = verify(conn)
+            if mismatched:
+                print(f"❌ {len(mismatched)} 个切片与ratings不一致: {mismatched[:10]}")
+                return 1
+            print("✅ 评分立方体与ratings一致")
+
+        keys = {
+            'model': ('modelname',),
+            'category': ('category',),
+            'model-category': ('modelname', 'category'),
+            'all': (),
+        }[args.by]
+        rows = cube_slice(conn, keys, args.model, args.category)
+        print("=" * 100)
+        print("打分模式 - 各维度均值 ±95%置信区间半宽（来自score_cube）")
+        print("=" * 100)
+        print_slice(rows, keys)
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,10 +6,13 @@
 - 将未完成任务（finished=0）随机打散并重新排序
 """
 
-import sqlite3
 import random
 import sys
 import io
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+import db_trace  # noqa: E402
 
 # Windows编码支持
 if sys.platform == 'win32':
@@ -33,7 +36,7 @@ def shuffle_pending_tasks(db_path: str, seed: int = None):
     print(f"随机种子: {seed}")
     print()
     
-    conn = sqlite3.connect(db_path)
+    conn = db_trace.connect(db_path)
     cur = conn.cursor()
     
     # 1. 获取所有judge
@@ -49,7 +52,7 @@ def shuffle_pending_tasks(db_path: str, seed: int = None):
     for judge_id, judge_name in judges:
         # 2.1 获取该judge的已完成任务（finished=1）
         cur.execute("""
-            SELECT id, display_order, task_id
+            SELECT task_id, display_order
             FROM assignments
             WHERE judge_id = ? AND finished = 1
             ORDER BY display_order
@@ -58,7 +61,7 @@ def shuffle_pending_tasks(db_path: str, seed: int = None):
         
         # 2.2 获取该judge的未完成任务（finished=0）
         cur.execute("""
-            SELECT id, display_order, task_id
+            SELECT task_id, display_order
             FROM assignments
             WHERE judge_id = ? AND finished = 0
             ORDER BY display_order
@@ -77,20 +80,26 @@ def shuffle_pending_tasks(db_path: str, seed: int = None):
         
         # 2.4 随机打散未完成任务
         rnd = random.Random(f"{seed}-judge-{judge_id}")
-        pending_ids = [a[0] for a in pending_assignments]
-        rnd.shuffle(pending_ids)
+        pending_task_ids = [a[0] for a in pending_assignments]
+        rnd.shuffle(pending_task_ids)
         
         # 2.5 重新分配display_order（从max_finished_order+1开始）
+        # 先写入负数临时值再统一翻转，避免紧凑布局下 (judge_id, display_order) 主键冲突
         updates = []
-        for new_order, assign_id in enumerate(pending_ids, start=max_finished_order + 1):
-            updates.append((new_order, assign_id))
+        for new_order, task_id in enumerate(pending_task_ids, start=max_finished_order + 1):
+            updates.append((-(new_order + 1), judge_id, task_id))
         
         # 2.6 批量更新数据库
         cur.executemany("""
             UPDATE assignments
             SET display_order = ?
-            WHERE id = ?
+            WHERE judge_id = ? AND task_id = ?
         """, updates)
+        cur.execute("""
+            UPDATE assignments
+            SET display_order = -display_order - 1
+            WHERE judge_id = ? AND display_order < 0
+        """, (judge_id,))
         
         conn.commit()
         
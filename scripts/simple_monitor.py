@@ -8,7 +8,6 @@ Simple Video Monitor - 简化的视频监控服务
 3. 为新视频创建任务并分配给judges
 4. 自动复制视频到视频服务器目录
 """
-import sqlite3
 import time
 import random
 import shutil
@@ -17,6 +16,10 @@ from datetime import datetime
 import argparse
 import sys
 
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+import db_trace  # noqa: E402
+
+
 def get_local_ip():
     """获取本机IP"""
     import socket
@@ -74,7 +77,7 @@ def get_existing_videos_from_db(db_path: str) -> tuple:
     
     返回：(existing_videos_set, existing_models_set)
     """
-    conn = sqlite3.connect(db_path)
+    conn = db_trace.connect(db_path)
     cur = conn.cursor()
     
     # 获取已存在的视频 (sample_id, modelname)
@@ -122,7 +125,7 @@ def add_new_videos_to_database(db_path: str, new_videos: list, video_base_url: s
     if not new_videos:
         return 0
     
-    conn = sqlite3.connect(db_path)
+    conn = db_trace.connect(db_path)
     cur = conn.cursor()
     
     added = 0
@@ -223,7 +226,7 @@ def shuffle_pending_tasks(conn, judges):
     for judge_id in judges:
         # 获取已完成和未完成任务
         cur.execute("""
-            SELECT id, display_order
+            SELECT task_id, display_order
             FROM assignments
             WHERE judge_id = ? AND finished = 1
             ORDER BY display_order
@@ -231,7 +234,7 @@ def shuffle_pending_tasks(conn, judges):
         finished = cur.fetchall()
         
         cur.execute("""
-            SELECT id
+            SELECT task_id
             FROM assignments
             WHERE judge_id = ? AND finished = 0
             ORDER BY display_order
@@ -248,11 +251,15 @@ def shuffle_pending_tasks(conn, judges):
         rnd = random.Random(f"{seed}-judge-{judge_id}")
         rnd.shuffle(pending)
         
-        # 重新分配display_order
-        for new_order, assign_id in enumerate(pending, start=max_finished_order + 1):
+        # 重新分配display_order（先写负数临时值再翻转，避免紧凑布局下主键冲突）
+        for new_order, task_id in enumerate(pending, start=max_finished_order + 1):
             cur.execute("""
-                UPDATE assignments SET display_order = ? WHERE id = ?
-            """, (new_order, assign_id))
+                UPDATE assignments SET display_order = ? WHERE judge_id = ? AND task_id = ?
+            """, (-(new_order + 1), judge_id, task_id))
+        cur.execute("""
+            UPDATE assignments SET display_order = -display_order - 1
+            WHERE judge_id = ? AND display_order < 0
+        """, (judge_id,))
     
     print(f"    [OK] Shuffled with seed: {seed}", flush=True)
 
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+在线增量备份服务（SQLite backup API）
+
+评测进行中直接 shutil.copy2 数据库文件并不安全：WAL模式下主库与 -wal 文件不同步时会得到撕裂的副本，
+且一次性读取整个文件。本服务改用 sqlite3.Connection.backup：
+- 每步只复制一批页面（--pages），步与步之间休眠（--sleep），每步结束即释放源库读锁，
+  提交最多只需等待一步的时间（输出中的“最长单步”）
+- 备份期间源库被其他连接写入时SQLite会从头重来；重来次数过多时，
+  WAL库改为单步快照备份（只持有读快照，不阻塞写入），非WAL库加大批次重试
+- 备份先写入 .partial 文件，经 PRAGMA quick_check 和 tools/verify_backup.py 的不变量检查后才转正
+  （评测开始前ratings为空只警告），校验失败的保留为 .bad
+- 按 --keep 轮换，.bad 按 --keep-bad 单独轮换，只删除本服务生成的同名前缀备份
+
+用法：
+    python tools/backup_service.py --db aiv_eval_v4.db --once
+    python tools/backup_service.py --db aiv_eval_v4.db --interval 3600 --keep 48
+    python tools/backup_service.py --db aiv_compare_v1.db --out-dir backup --interval 1800
+"""
+
+import argparse
+import contextlib
+import functools
+import io
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+from verify_backup import verify_backup, verify_compare_backup  # noqa: E402
+import db_trace  # noqa: E402
+
+if sys.platform == 'win32' and (sys.stdout.encoding or '').lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+# 项目根目录
+PROJECT_ROOT = Path(__file__).parent.parent
+
+DEFAULT_PAGES = 256        # 每步复制的页数（4KB页约1MB）
+DEFAULT_SLEEP = 0.05       # 步间休眠（秒）
+DEFAULT_MAX_RESTARTS = 5   # 单次尝试允许的重来次数
+
+
+class BackupRestarted(Exception):
+    """备份期间源库被频繁写入，重来次数超过上限"""
+
+
+def online_backup(src_path, dest_path, pages=DEFAULT_PAGES, sleep=DEFAULT_SLEEP,
+                  max_restarts=DEFAULT_MAX_RESTARTS):
+    """用backup API分批复制数据库
+
+    Args:
+        src_path: 源数据库（可以正在被评测服务写入）
+        dest_path: 目标文件（已存在则被整体覆盖）
+        pages: 每步复制的页数
+        sleep: 步与步之间的休眠秒数
+        max_restarts: 源库被写入导致重来的次数上限
+
+    Returns:
+        {'pages': int, 'steps': int, 'restarts': int, 'max_step_ms': float,
+         'elapsed_s': float, 'mode': 'batched' | 'snapshot'}
+    """
+    src = db_trace.connect(src_path, timeout=30.0)
+    try:
+        journal_mode = src.execute("PRAGMA journal_mode").fetchone()[0].lower()
+        attempt_pages = pages
+        while True:
+            stats = {'pages': 0, 'steps': 0, 'restarts': 0, 'max_step_ms': 0.0}
+            state = {'remaining': None, 'step_start': time.perf_counter()}
+
+            def progress(status, remaining, total):
+                step_ms = (time.perf_counter() - state['step_start']) * 1000
+                stats['steps'] += 1
+                stats['pages'] = total
+                stats['max_step_ms'] = max(stats['max_step_ms'], step_ms)
+                # 源库被写入后下一步会从头复制，表现为剩余页数没有减少
+                if state['remaining'] is not None and remaining >= state['remaining']:
+                    stats['restarts'] += 1
+                    if stats['restarts'] > max_restarts:
+                        raise BackupRestarted(f"源库在备份期间被写入 {stats['restarts']} 次")
+                state['remaining'] = remaining
+                if remaining and sleep:
+                    # 此时源库读锁已释放，休眠期间提交不受影响
+                    time.sleep(sleep)
+                state['step_start'] = time.perf_counter()
+
+            dest = db_trace.connect(dest_path)
+            start = state['step_start'] = time.perf_counter()
+            try:
+                src.backup(dest, pages=attempt_pages, progress=progress, sleep=sleep)
+                stats['elapsed_s'] = time.perf_counter() - start
+                stats['mode'] = 'batched' if attempt_pages > 0 else 'snapshot'
+                return stats
+            except BackupRestarted as e:
+                if attempt_pages <= 0:
+                    raise
+                if journal_mode == 'wal':
+                    print(f"   ⚠️  {e}，改用单步快照备份（WAL下不阻塞写入）")
+                    attempt_pages = -1
+                else:
+                    attempt_pages *= 4
+                    print(f"   ⚠️  {e}，加大批次到 {attempt_pages} 页重试")
+            finally:
+                dest.close()
+    finally:
+        src.close()
+
+
+def detect_mode(db_path):
+    """根据judges表结构判断是打分模式还是比较模式"""
+    conn = db_trace.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        cols = [row[1] for row in conn.execute("PRAGMA table_info(judges)")]
+    finally:
+        conn.close()
+    return 'compare' if 'uid' in cols else 'scoring'
+
+
+def quick_check(db_path):
+    """PRAGMA quick_check，返回问题列表（空列表表示通过）"""
+    conn = db_trace.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        rows = [row[0] for row in conn.execute("PRAGMA quick_check")]
+    finally:
+        conn.close()
+    return [] if rows == ['ok'] else rows
+
+
+def check_backup(db_path, verbose=False):
+    """quick_check + 业务不变量检查，返回 (是否通过, 说明)"""
+    problems = quick_check(db_path)
+    if problems:
+        return False, f"quick_check失败：{'; '.join(problems[:5])}"
+
+    if detect_mode(db_path) == 'compare':
+        verify = verify_compare_backup
+    else:
+        # 评测开始前ratings为空，这时的备份同样有效，只警告
+        verify = functools.partial(verify_backup, allow_empty_ratings=True)
+    if verbose:
+        ok = verify(str(db_path))
+    else:
+        with contextlib.redirect_stdout(io.StringIO()) as buf:
+            ok = verify(str(db_path))
+        if not ok:
+            print(buf.getvalue())
+    return ok, 'quick_check通过，不变量检查通过' if ok else '不变量检查失败'
+
+
+def rotate_backups(out_dir, prefix, keep, suffix='.db'):
+    """只保留最新的keep个备份（suffix='.bad' 时为校验失败的备份），返回删除的文件列表"""
+    backups = sorted(Path(out_dir).glob(f"{prefix}_*{suffix}"))
+    removed = backups[:-keep] if keep > 0 else []
+    for path in removed:
+        path.unlink()
+    return removed
+
+
+def run_once(args):
+    """执行一次备份 → 校验 → 转正 → 轮换"""
+    db_path = Path(args.db)
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    prefix = f"{db_path.stem}_online"
+    final_path = out_dir / f"{prefix}_{timestamp}.db"
+    partial_path = final_path.with_suffix('.partial')
+
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 📦 备份 {db_path} → {final_path}")
+    try:
+        stats = online_backup(db_path, partial_path, pages=args.pages, sleep=args.sleep,
+                              max_restarts=args.max_restarts)
+    except (sqlite3.Error, BackupRestarted) as e:
+        print(f"   ❌ 备份失败：{e}")
+        partial_path.unlink(missing_ok=True)
+        return False
+
+    print(f"   ✓ {stats['pages']} 页，{stats['steps']} 步，重来 {stats['restarts']} 次，"
+          f"用时 {stats['elapsed_s']:.2f}s，最长单步 {stats['max_step_ms']:.1f}ms（{stats['mode']}）")
+
+    ok, message = check_backup(partial_path, verbose=args.verbose)
+    if not ok:
+        bad_path = final_path.with_suffix('.bad')
+        partial_path.replace(bad_path)
+        print(f"   ❌ 校验失败（{message}），已保留为: {bad_path}")
+        for path in rotate_backups(out_dir, prefix, args.keep_bad, suffix='.bad'):
+            print(f"   🗑️  轮换删除: {path.name}")
+        return False
+
+    partial_path.replace(final_path)
+    size_mb = final_path.stat().st_size / 1048576
+    print(f"   ✅ {message}，{size_mb:.1f} MB")
+
+    for path in rotate_backups(out_dir, prefix, args.keep):
+        print(f"   🗑️  轮换删除: {path.name}")
+    return True
+
+
+def main():
+    ap = argparse.ArgumentParser(description='SQLite在线增量备份（定时、校验、轮换）')
+    ap.add_argument('--db', default='aiv_eval_v4.db', help='数据库路径（打分模式或比较模式）')
+    ap.add_argument('--out-dir', default=str(PROJECT_ROOT / 'backup'), help='备份目录')
+    ap.add_argument('--interval', type=int, default=3600, help='备份间隔（秒），默认3600秒=1小时')
+    ap.add_argument('--keep', type=int, default=24, help='保留的备份数量')
+    ap.add_argument('--keep-bad', type=int, default=3, help='保留的校验失败备份（.bad）数量')
+    ap.add_argument('--pages', type=int, default=DEFAULT_PAGES, help='每步复制的页数')
+    ap.add_argument('--sleep', type=float, default=DEFAULT_SLEEP, help='步间休眠（秒）')
+    ap.add_argument('--max-restarts', type=int, default=DEFAULT_MAX_RESTARTS,
+                    help='源库被写入导致重来的次数上限，超过后切换策略')
+    ap.add_argument('--once', action='store_true', help='只备份一次，不持续运行')
+    ap.add_argument('--verbose', action='store_true', help='输出完整的不变量检查过程')
+    args = ap.parse_args()
+
+    if not Path(args.db).exists():
+        print(f"[ERROR] 数据库不存在: {args.db}")
+        return 1
+
+    if args.once:
+        return 0 if run_once(args) else 1
+
+    print("=" * 70)
+    print(f"  在线备份服务：每 {args.interval} 秒备份一次，保留 {args.keep} 个")
+    print("=" * 70)
+    try:
+        while True:
+            run_once(args)
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("\n[STOP] 备份服务已停止")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
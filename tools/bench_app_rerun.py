@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评测页面端到端rerun耗时基准（streamlit.testing.v1.AppTest，无需浏览器）
+
+在合成数据库的副本上用 AppTest 无头驱动 app/streamlit_app.py 和 app/streamlit_app_compare.py，
+测量评审员能感受到的每一步交互耗时（一步 = 一次完整的脚本执行，含 st.rerun() 触发的重跑）：
+  打分：cold_start / first_render / slider_change / submit / back
+  比较：cold_start / first_render / submit / history_prev / history_next
+- cold_start：清空 st.cache_* 并卸载 app/ 下的辅助模块后的首次渲染
+- first_render：缓存已热、新会话（新评审员打开链接）的首次渲染
+- submit 含页面中提交成功后的 0.5s 提示停顿（评审员实际等待的时间）
+- AppTest 每次交互都整页重跑、不模拟 st.fragment 的局部重跑，slider_change 是整页重跑的上限
+每一轮使用不同的评审员；耗时取各轮中位数，与基线文件比较，变慢超过阈值即判定失败；
+基线中没有的项记为 NO BASELINE（同样判定失败），先在目标机器上运行 --update-baseline
+
+用法：
+    python tools/bench_app_rerun.py                       # 1×/10× 规模，两种模式
+    python tools/bench_app_rerun.py --kinds compare --scales 1 10 100 --timeout 60
+    python tools/bench_app_rerun.py --update-baseline     # 记录当前耗时为基线
+
+退出码：0=全部通过，1=存在性能回退、缺少基线或页面异常
+"""
+
+import argparse
+import io
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+if sys.platform == 'win32' and (sys.stdout.encoding or '').lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+sys.path.insert(0, str(Path(__file__).parent))
+import synth_campaign  # noqa: E402
+from bench_hot_queries import load_baseline, save_baseline  # noqa: E402
+
+# 项目根目录
+PROJECT_ROOT = Path(__file__).parent.parent
+
+DEFAULT_WORK_DIR = PROJECT_ROOT / "bench_work"
+DEFAULT_BASELINE = Path(__file__).parent / "baselines" / "app_rerun.json"
+
+APPS = {
+    'scoring': PROJECT_ROOT / 'app' / 'streamlit_app.py',
+    'compare': PROJECT_ROOT / 'app' / 'streamlit_app_compare.py',
+}
+DB_ENV = {'scoring': 'AIV_DB', 'compare': 'AIV_COMPARE_DB'}
+STEPS = {
+    'scoring': ['cold_start', 'first_render', 'slider_change', 'submit', 'back'],
+    'compare': ['cold_start', 'first_render', 'submit', 'history_prev', 'history_next'],
+}
+# app/ 下被页面导入的辅助模块，冷启动时卸载以重新导入
+APP_MODULES = ('auto_scores', 'perf_timing', 'db_trace', 'elo_compare', 'task_board', 'versioned_cache')
+
+
+class PageError(RuntimeError):
+    pass
+
+
+def judge_tokens(kind, db_path, n):
+    """前n个评审员的访问令牌（页面链接中的 uid 参数）"""
+    sql = ("SELECT token FROM judges ORDER BY id LIMIT ?" if kind == 'scoring'
+           else "SELECT uid FROM judges ORDER BY judge_id LIMIT ?")
+    conn = sqlite3.connect(db_path)
+    try:
+        return [row[0] for row in conn.execute(sql, (n,))]
+    finally:
+        conn.close()
+
+
+def make_cold():
+    """清空 Streamlit 缓存并卸载辅助模块，模拟服务刚启动"""
+    import streamlit as st
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    for name in APP_MODULES:
+        sys.modules.pop(name, None)
+
+
+def timed_run(at, name, timings):
+    """执行一次（或一串由st.rerun触发的）脚本运行并记录耗时，页面出现异常时报错"""
+    start = time.perf_counter()
+    at.run()
+    timings.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+    if at.exception:
+        raise PageError(f"{name}: {at.exception[0].message}")
+    return at
+
+
+def find(elements, prefix, attr='key'):
+    for el in elements:
+        if (getattr(el, attr, None) or '').startswith(prefix):
+            return el
+    raise PageError(f"页面上找不到 {attr} 以 {prefix!r} 开头的控件")
+
+
+def scoring_round(new_app, token, timings):
+    at = new_app(token)
+    make_cold()
+    timed_run(at, 'cold_start', timings)
+
+    at = timed_run(new_app(token), 'first_render', timings)
+    slider = find(at.slider, 'sem_')
+    slider.set_value(5 if slider.value != 5 else 1)
+    timed_run(at, 'slider_change', timings)
+
+    find(at.button, '✅', attr='label').click()
+    timed_run(at, 'submit', timings)
+
+    find(at.button, 'back_').click()
+    timed_run(at, 'back', timings)
+
+
+def compare_round(new_app, token, timings):
+    at = new_app(token)
+    make_cold()
+    timed_run(at, 'cold_start', timings)
+
+    at = timed_run(new_app(token), 'first_render', timings)
+    at.button(key='btn_a').click()
+    timed_run(at, 'submit', timings)
+
+    at.button(key='btn_prev_nav').click()
+    timed_run(at, 'history_prev', timings)
+
+    at.button(key='btn_next_nav').click()
+    timed_run(at, 'history_next', timings)
+
+
+ROUNDS = {'scoring': scoring_round, 'compare': compare_round}
+
+
+def run_suite(kind, scale, args, tmp_dir):
+    """对一个 (模式, 规模) 跑 args.repeat 轮，返回 {step: median_ms}"""
+    from streamlit.testing.v1 import AppTest
+
+    src = synth_campaign.cached_db(kind, scale, args.work_dir, seed=args.seed,
+                                   judges=max(args.repeat, synth_campaign.SCORING_BASE['judges']))
+    # 提交会写库，每个 (模式, 规模) 使用一份新副本
+    db_path = Path(tmp_dir) / f"{kind}_x{scale:g}.db"
+    shutil.copy2(src, db_path)
+    os.environ[DB_ENV[kind]] = str(db_path)
+
+    def new_app(token):
+        at = AppTest.from_file(str(APPS[kind]), default_timeout=args.timeout)
+        at.query_params['uid'] = token
+        return at
+
+    timings = {}
+    for token in judge_tokens(kind, db_path, args.repeat):
+        ROUNDS[kind](new_app, token, timings)
+    return {name: statistics.median(timings[name]) for name in STEPS[kind]}
+
+
+def main():
+    ap = argparse.ArgumentParser(description='评测页面端到端rerun耗时基准（AppTest）')
+    ap.add_argument('--kinds', nargs='+', choices=sorted(APPS), default=['scoring', 'compare'])
+    ap.add_argument('--scales', nargs='+', type=float, default=[1, 10], help='数据规模倍数（默认 1 10）')
+    ap.add_argument('--work-dir', default=str(DEFAULT_WORK_DIR), help='合成数据库缓存目录')
+    ap.add_argument('--seed', type=int, default=42)
+    ap.add_argument('--repeat', type=int, default=5, help='轮数（每轮一个评审员）')
+    ap.add_argument('--timeout', type=float, default=30, help='单次脚本运行超时（秒）')
+    ap.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='耗时基线JSON')
+    ap.add_argument('--update-baseline', action='store_true', help='将本次耗时写入基线')
+    ap.add_argument('--tolerance', type=float, default=1.5, help='允许的变慢倍数（默认1.5）')
+    ap.add_argument('--min-delta-ms', type=float, default=50.0, help='低于该绝对差值不判定回退（毫秒）')
+    args = ap.parse_args()
+
+    os.environ.setdefault('STREAMLIT_LOGGER_LEVEL', 'error')
+    try:
+        import streamlit.testing.v1  # noqa: F401
+    except ImportError:
+        print("[ERROR] 需要 streamlit>=1.28（streamlit.testing.v1.AppTest）")
+        return 1
+
+    # 页面计时/慢查询日志不参与基准，避免写盘干扰
+    os.environ['AIV_TIMING'] = '0'
+    os.environ['AIV_SQL_TRACE'] = '0'
+    baseline = load_baseline(args.baseline)
+    if not baseline and not args.update_baseline:
+        print(f"[WARN] 基线文件不存在或为空: {args.baseline}")
+        print("       耗时无法比较，各项记为 NO BASELINE；请先运行 --update-baseline 记录本机基线")
+    failures = 0
+    all_results = []
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for kind in args.kinds:
+            for scale in args.scales:
+                print(f"\n[{kind} x{scale:g}]")
+                try:
+                    medians = run_suite(kind, scale, args, tmp_dir)
+                except PageError as e:
+                    print(f"  ❌ 页面异常: {e}")
+                    failures += 1
+                    continue
+                for name, ms in medians.items():
+                    key = f"{kind}/x{scale:g}/{name}"
+                    all_results.append({'key': key, 'median_ms': round(ms, 3)})
+                    base = baseline.get(key)
+                    status = 'OK'
+                    if base is None and not args.update_baseline:
+                        status = 'NO BASELINE'
+                        failures += 1
+                    elif (base is not None and not args.update_baseline
+                            and ms > base * args.tolerance and ms - base > args.min_delta_ms):
+                        status = 'SLOWER'
+                        failures += 1
+                    base_text = f"{base:>10.1f}" if base is not None else f"{'-':>10}"
+                    print(f"  {name:<16} {ms:>10.1f} ms  base {base_text}  {status}")
+
+    if args.update_baseline:
+        save_baseline(args.baseline, all_results)
+        print(f"\n[OK] 基线已更新: {args.baseline}")
+
+    print(f"\n{'[FAIL]' if failures else '[OK]'} {len(all_results)} 项检查，{failures} 项失败")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
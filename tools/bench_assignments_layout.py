@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+assignments布局对比基准：默认rowid表 vs WITHOUT ROWID紧凑布局
+
+对同一个合成数据库（tools/synth_campaign.py）分别在两种布局上测量：
+- 数据库大小：VACUUM后的文件大小、page_count，以及assignments表+索引占用（dbstat）
+- 提交延迟：按相同顺序重放同一批提交，统计 p50 / p99
+  - 打分模式：next_assign → save → mark_done（app/streamlit_app.py）
+  - 比较模式：get_current_task → submit_comparison（app/streamlit_app_compare.py）
+
+用法：
+    python tools/bench_assignments_layout.py
+    python tools/bench_assignments_layout.py --kinds scoring --scales 1 10 --submits 500
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import synth_campaign  # noqa: E402
+from bench_hot_queries import DEFAULT_WORK_DIR, PROJECT_ROOT, load_module, quiet  # noqa: E402
+
+LAYOUTS = ['rowid', 'compact']
+
+
+def storage_stats(db_path):
+    """VACUUM后的大小统计"""
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("VACUUM")
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        objects = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE tbl_name = 'assignments' AND type IN ('table', 'index')")]
+        try:
+            placeholders = ','.join('?' * len(objects))
+            assign_bytes = conn.execute(
+                f"SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name IN ({placeholders})", objects
+            ).fetchone()[0]
+        except sqlite3.OperationalError:
+            assign_bytes = None  # SQLite未编译dbstat
+    finally:
+        conn.close()
+    return {
+        'file_bytes': Path(db_path).stat().st_size,
+        'page_count': page_count,
+        'page_size': page_size,
+        'assign_bytes': assign_bytes,
+    }
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def judge_schedule(judge_ids, submits, seed):
+    """固定的评审员提交顺序（两种布局重放同一序列）"""
+    rnd = random.Random(seed)
+    return [rnd.choice(judge_ids) for _ in range(submits)]
+
+
+def scoring_submits(db_path, schedule):
+    """打分模式：每次提交 = next_assign + save + mark_done"""
+    os.environ['AIV_DB'] = str(db_path)
+    app = load_module('bench_layout_streamlit_app', PROJECT_ROOT / 'app' / 'streamlit_app.py')
+    app.DB_PATH = str(db_path)
+    rnd = random.Random(7)
+    conn = app.get_conn()
+    latencies = []
+    try:
+        for judge_id in schedule:
+            start = time.perf_counter()
+            nxt = app.next_assign(conn, judge_id)
+            if not nxt:
+                continue
+            task_id, _, video_id = nxt[:3]
+            scores = {k: rnd.randint(1, 5) for k in ('semantic', 'motion', 'temporal', 'realism')}
+            app.save(conn, judge_id, video_id, scores)
+            app.mark_done(conn, judge_id, task_id)
+            latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        conn.close()
+    return latencies
+
+
+def compare_submits(db_path, schedule):
+    """比较模式：每次提交 = get_current_task + submit_comparison"""
+    app = load_module('bench_layout_streamlit_app_compare', PROJECT_ROOT / 'app' / 'streamlit_app_compare.py')
+    app.DB_PATH = Path(db_path)
+    rnd = random.Random(7)
+    latencies = []
+    for judge_id in schedule:
+        start = time.perf_counter()
+        task = app.get_current_task(judge_id)
+        if not task:
+            continue
+        chosen = rnd.choice([task['model_a'], task['model_b'], 'tie'])
+        app.submit_comparison(task['task_id'], judge_id, chosen)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+SUBMITTERS = {
+    'scoring': scoring_submits,
+    'compare': compare_submits,
+}
+
+
+def judge_ids(db_path, kind):
+    column = 'judge_id' if kind == 'compare' else 'id'
+    conn = sqlite3.connect(db_path)
+    try:
+        return [row[0] for row in conn.execute(f"SELECT {column} FROM judges ORDER BY {column}")]
+    finally:
+        conn.close()
+
+
+def run_layout(kind, scale, layout, args, tmp_dir):
+    source = synth_campaign.cached_db(kind, scale, args.work_dir, seed=args.seed, layout=layout)
+    work_path = Path(tmp_dir) / f"{kind}_x{scale:g}_{layout}.db"
+    shutil.copy2(source, work_path)
+
+    result = storage_stats(work_path)
+    schedule = judge_schedule(judge_ids(work_path, kind), args.submits, args.seed)
+    with quiet():
+        latencies = SUBMITTERS[kind](work_path, schedule)
+    result.update({
+        'submits': len(latencies),
+        'p50_ms': percentile(latencies, 50) if latencies else 0.0,
+        'p99_ms': percentile(latencies, 99) if latencies else 0.0,
+        'mean_ms': statistics.mean(latencies) if latencies else 0.0,
+    })
+    return result
+
+
+def _ratio(new, old):
+    return f"{(new / old - 1) * 100:+.1f}%" if old else '-'
+
+
+def main():
+    ap = argparse.ArgumentParser(description='assignments布局（rowid vs WITHOUT ROWID）大小与提交延迟对比')
+    ap.add_argument('--kinds', nargs='+', choices=sorted(SUBMITTERS), default=['scoring', 'compare'])
+    ap.add_argument('--scales', nargs='+', type=float, default=[1, 10], help='数据规模倍数（默认 1 10）')
+    ap.add_argument('--submits', type=int, default=300, help='每种布局重放的提交次数')
+    ap.add_argument('--work-dir', default=str(DEFAULT_WORK_DIR), help='合成数据库缓存目录')
+    ap.add_argument('--seed', type=int, default=42)
+    args = ap.parse_args()
+
+    os.environ.setdefault('STREAMLIT_LOGGER_LEVEL', 'error')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for kind in args.kinds:
+            for scale in args.scales:
+                print(f"\n[{kind} x{scale:g}]")
+                print(f"  {'layout':<10} {'file MB':>10} {'pages':>10} {'assign KB':>10} "
+                      f"{'submits':>8} {'p50 ms':>9} {'p99 ms':>9} {'mean ms':>9}")
+                results = {}
+                for layout in LAYOUTS:
+                    r = results[layout] = run_layout(kind, scale, layout, args, tmp_dir)
+                    assign_kb = f"{r['assign_bytes'] / 1024:>10.1f}" if r['assign_bytes'] is not None else f"{'-':>10}"
+                    print(f"  {layout:<10} {r['file_bytes'] / 1048576:>10.2f} {r['page_count']:>10} {assign_kb} "
+                          f"{r['submits']:>8} {r['p50_ms']:>9.3f} {r['p99_ms']:>9.3f} {r['mean_ms']:>9.3f}")
+                old, new = results['rowid'], results['compact']
+                assign_delta = (_ratio(new['assign_bytes'], old['assign_bytes'])
+                                if old['assign_bytes'] is not None else '-')
+                print(f"  {'delta':<10} {_ratio(new['file_bytes'], old['file_bytes']):>10} "
+                      f"{_ratio(new['page_count'], old['page_count']):>10} {assign_delta:>10} "
+                      f"{'':>8} {_ratio(new['p50_ms'], old['p50_ms']):>9} "
+                      f"{_ratio(new['p99_ms'], old['p99_ms']):>9} {_ratio(new['mean_ms'], old['mean_ms']):>9}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
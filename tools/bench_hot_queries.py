@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+热点查询执行计划回归检查（打分模式 + 比较模式）
+
+在 1×/10×/100× 规模的合成数据库上运行应用、导出和监控中的真实函数：
+1. 记录每个函数实际执行的SQL，逐条运行 EXPLAIN QUERY PLAN，
+   出现未在白名单中的全表扫描（SCAN <table>）即判定失败
+2. 统计每个函数的耗时中位数，与基线文件比较，变慢超过阈值即判定失败；
+   基线中没有的项记为 NO BASELINE（同样判定失败），先在目标机器上运行 --update-baseline
+
+用法：
+    python tools/bench_hot_queries.py                       # 1×/10×/100× 全部检查
+    python tools/bench_hot_queries.py --scales 1 10         # 只跑部分规模
+    python tools/bench_hot_queries.py --update-baseline     # 记录当前耗时为基线
+
+退出码：0=全部通过，1=存在全表扫描、性能回退或缺少基线
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import synth_campaign  # noqa: E402
+
+# 项目根目录
+PROJECT_ROOT = Path(__file__).parent.parent
+
+DEFAULT_WORK_DIR = PROJECT_ROOT / "bench_work"
+DEFAULT_BASELINE = Path(__file__).parent / "baselines" / "hot_queries.json"
+
+_SCAN_RE = re.compile(r'^SCAN (\w+)')
+
+
+class HotQuery:
+    """一个热点查询：调用真实函数，并声明允许全表扫描的表（按计划中显示的名称/别名）"""
+
+    def __init__(self, name, run, allowed_scans=(), heavy=False):
+        self.name = name
+        self.run = run
+        self.allowed_scans = set(allowed_scans)
+        self.heavy = heavy
+
+
+def load_module(name, path):
+    """按文件路径加载模块（scripts/ 和 app/ 下的脚本都不是包）"""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@contextlib.contextmanager
+def capture_sql(statements):
+    """临时替换 sqlite3.connect，记录所有连接执行的SQL（参数已展开）"""
+    real_connect = sqlite3.connect
+
+    def traced_connect(*args, **kwargs):
+        conn = real_connect(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    sqlite3.connect = traced_connect
+    try:
+        yield statements
+    finally:
+        sqlite3.connect = real_connect
+
+
+@contextlib.contextmanager
+def quiet():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def explain(db_path, sql):
+    """返回一条SQL的执行计划明细"""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+    finally:
+        conn.close()
+
+
+def full_scans(db_path, statements, allowed):
+    """找出不在白名单中的全表扫描"""
+    offenders = []
+    seen = set()
+    for sql in statements:
+        sql = sql.strip()
+        head = sql.split(None, 1)[0].upper() if sql else ''
+        if head not in ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT') or sql in seen:
+            continue
+        seen.add(sql)
+        for detail in explain(db_path, sql):
+            m = _SCAN_RE.match(detail)
+            if m and m.group(1) != 'CONSTANT' and m.group(1) not in allowed:
+                offenders.append((detail, ' '.join(sql.split())[:160]))
+    return offenders
+
+
+# ==================== 打分模式 ====================
+
+def scoring_queries(db_path, tmp_dir):
+    """打分模式热点：app/streamlit_app.py + scripts/export_ratings.py + scripts/monitor_new_videos.py"""
+    os.environ['AIV_DB'] = str(db_path)
+    app = load_module('bench_streamlit_app', PROJECT_ROOT / 'app' / 'streamlit_app.py')
+    app.DB_PATH = str(db_path)
+    export = load_module('bench_export_ratings', PROJECT_ROOT / 'scripts' / 'export_ratings.py')
+    monitor = load_module('bench_monitor_new_videos', PROJECT_ROOT / 'scripts' / 'monitor_new_videos.py')
+    judge_id = 1
+
+    def with_conn(fn):
+        def run():
+            conn = app.get_conn()
+            try:
+                return fn(conn)
+            finally:
+                conn.close()
+        return run
+
+    def previous(conn):
+        nxt = app.next_assign(conn, judge_id)
+        return app.previous_assign(conn, judge_id, nxt[0]) if nxt else None
+
+    # 页面实际走的是进程内任务看板（app/task_board.py）：读只查内存，
+    # 其他连接提交后整体重新加载（board_load = 新建看板 + 加载一个评审员的分配）
+    board = app.TaskBoard(str(db_path))
+
+    def board_previous():
+        nxt = board.next_assign(judge_id)
+        return board.previous_assign(judge_id, nxt[0]) if nxt else None
+
+    def run_export(fmt):
+        def run():
+            argv = sys.argv
+            sys.argv = ['export_ratings.py', '--db', str(db_path),
+                        '--out', str(Path(tmp_dir) / f'ratings_{fmt}.csv'), '--format', fmt]
+            try:
+                with quiet():
+                    export.main()
+            finally:
+                sys.argv = argv
+        return run
+
+    return [
+        HotQuery('next_assign', with_conn(lambda c: app.next_assign(c, judge_id))),
+        HotQuery('previous_assign', with_conn(previous)),
+        HotQuery('progress', with_conn(lambda c: app.progress(c, judge_id))),
+        HotQuery('board_next_assign', lambda: board.next_assign(judge_id)),
+        HotQuery('board_previous_assign', board_previous),
+        HotQuery('board_progress', lambda: board.progress(judge_id)),
+        HotQuery('board_load', lambda: app.TaskBoard(str(db_path)).progress(judge_id),
+                 allowed_scans={'tasks', 'judges', 'prompts'}, heavy=True),
+        HotQuery('export_long', run_export('long'), allowed_scans={'r', 'j', 'v', 'p'}, heavy=True),
+        HotQuery('export_wide', run_export('wide'), allowed_scans={'r', 'j', 'v', 'p'}, heavy=True),
+        HotQuery('monitor_existing_data', lambda: monitor.get_existing_data(str(db_path)),
+                 allowed_scans={'prompts', 'videos', 'v'}, heavy=True),
+    ]
+
+
+# ==================== 比较模式 ====================
+
+def compare_queries(db_path, tmp_dir):
+    """比较模式热点：app/streamlit_app_compare.py + scripts/export_ratings_compare.py + scripts/monitor_new_videos_compare.py"""
+    app = load_module('bench_streamlit_app_compare', PROJECT_ROOT / 'app' / 'streamlit_app_compare.py')
+    app.DB_PATH = Path(db_path)
+    export = load_module('bench_export_ratings_compare', PROJECT_ROOT / 'scripts' / 'export_ratings_compare.py')
+    export.DB_PATH = Path(db_path)
+    export.EXPORT_DIR = Path(tmp_dir)
+    monitor = load_module('bench_monitor_new_videos_compare', PROJECT_ROOT / 'scripts' / 'monitor_new_videos_compare.py')
+    monitor.DB_PATH = Path(db_path)
+    judge_id = 1
+
+    # 以数据库现有视频构造“扫描结果”，create_new_tasks 只会执行存在性检查（无写入）
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        gen_videos = defaultdict(list)
+        for sample_id, model_name, video_path in conn.execute("SELECT sample_id, model_name, video_path FROM videos"):
+            gen_videos[sample_id].append((model_name, video_path))
+
+    def exporting(fn):
+        def run():
+            with quiet():
+                return fn()
+        return run
+
+    return [
+        HotQuery('get_current_task', lambda: app.get_current_task(judge_id)),
+        HotQuery('get_history_task', lambda: app.get_history_task(judge_id, 0)),
+        HotQuery('get_history_task_deep', lambda: app.get_history_task(judge_id, 20)),
+        HotQuery('progress', lambda: app.get_progress(judge_id)),
+        HotQuery('export_long', exporting(export.export_long_format),
+                 allowed_scans={'c', 't', 'p', 'j'}, heavy=True),
+        HotQuery('export_task_summary', exporting(export.export_task_summary),
+                 allowed_scans={'t', 'p', 'c', 'j'}, heavy=True),
+        HotQuery('export_model_stats', exporting(export.export_model_stats),
+                 allowed_scans={'videos', 't'}, heavy=True),
+        HotQuery('export_progress_summary', exporting(export.export_progress_summary),
+                 allowed_scans={'tasks', 'comparisons', 'j', 'c'}, heavy=True),
+        HotQuery('monitor_db_videos', monitor.get_db_videos, allowed_scans={'videos'}, heavy=True),
+        HotQuery('monitor_db_tasks', monitor.get_db_tasks, allowed_scans={'tasks'}, heavy=True),
+        HotQuery('monitor_create_new_tasks', lambda: monitor.create_new_tasks(gen_videos),
+                 allowed_scans={'judges'}, heavy=True),
+    ]
+
+
+SUITES = {
+    'scoring': scoring_queries,
+    'compare': compare_queries,
+}
+
+
+def time_query(query, repeat):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        query.run()
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
+
+
+def run_suite(kind, scale, args, tmp_dir):
+    """对一个 (模式, 规模) 运行所有热点查询，返回结果列表"""
+    db_path = synth_campaign.cached_db(kind, scale, args.work_dir, seed=args.seed, layout=args.layout)
+    results = []
+    for query in SUITES[kind](db_path, tmp_dir):
+        statements = []
+        with capture_sql(statements):
+            query.run()
+        scans = full_scans(db_path, statements, query.allowed_scans)
+        repeat = args.heavy_repeat if query.heavy else args.repeat
+        layout = '' if args.layout == 'rowid' else f"/{args.layout}"
+        results.append({
+            'key': f"{kind}/x{scale:g}{layout}/{query.name}",
+            'median_ms': round(time_query(query, repeat), 3),
+            'statements': len(statements),
+            'scans': scans,
+        })
+    return results
+
+
+def load_baseline(path):
+    if not Path(path).exists():
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('timings', {})
+
+
+def save_baseline(path, results):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    timings = load_baseline(path)
+    timings.update({r['key']: r['median_ms'] for r in results})
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'machine': platform.platform(),
+            'timings': dict(sorted(timings.items())),
+        }, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='热点查询执行计划与耗时回归检查')
+    ap.add_argument('--kinds', nargs='+', choices=sorted(SUITES), default=['scoring', 'compare'])
+    ap.add_argument('--scales', nargs='+', type=float, default=[1, 10, 100], help='数据规模倍数（默认 1 10 100）')
+    ap.add_argument('--work-dir', default=str(DEFAULT_WORK_DIR), help='合成数据库缓存目录')
+    ap.add_argument('--seed', type=int, default=42)
+    ap.add_argument('--layout', choices=['rowid', 'compact'], default='rowid',
+                    help='assignments表布局（compact为WITHOUT ROWID，见 scripts/migrate_assignments_compact.py）')
+    ap.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='耗时基线JSON')
+    ap.add_argument('--update-baseline', action='store_true', help='将本次耗时写入基线')
+    ap.add_argument('--repeat', type=int, default=20, help='轻量查询重复次数')
+    ap.add_argument('--heavy-repeat', type=int, default=3, help='导出/监控类查询重复次数')
+    ap.add_argument('--tolerance', type=float, default=1.5, help='允许的变慢倍数（默认1.5）')
+    ap.add_argument('--min-delta-ms', type=float, default=2.0, help='低于该绝对差值不判定回退（毫秒）')
+    args = ap.parse_args()
+
+    os.environ.setdefault('STREAMLIT_LOGGER_LEVEL', 'error')
+    baseline = load_baseline(args.baseline)
+    if not baseline and not args.update_baseline:
+        print(f"[WARN] 基线文件不存在或为空: {args.baseline}")
+        print("       耗时无法比较，各项记为 NO BASELINE；请先运行 --update-baseline 记录本机基线")
+    failures = 0
+    all_results = []
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for kind in args.kinds:
+            for scale in args.scales:
+                print(f"\n[{kind} x{scale:g}]")
+                for r in run_suite(kind, scale, args, tmp_dir):
+                    all_results.append(r)
+                    base = baseline.get(r['key'])
+                    status = 'OK'
+                    if r['scans']:
+                        status = 'FULL SCAN'
+                    elif base is None and not args.update_baseline:
+                        status = 'NO BASELINE'
+                    elif (base is not None and not args.update_baseline
+                          and r['median_ms'] > base * args.tolerance
+                          and r['median_ms'] - base > args.min_delta_ms):
+                        status = 'SLOWER'
+                    base_text = f"{base:>10.3f}" if base is not None else f"{'-':>10}"
+                    print(f"  {r['key'].split('/')[-1]:<28} {r['median_ms']:>10.3f} ms  base {base_text}  {status}")
+                    for detail, sql in r['scans']:
+                        print(f"      {detail}  <-  {sql}")
+                    if status != 'OK':
+                        failures += 1
+
+    if args.update_baseline:
+        save_baseline(args.baseline, all_results)
+        print(f"\n[OK] 基线已更新: {args.baseline}")
+
+    print(f"\n{'[FAIL]' if failures else '[OK]'} {len(all_results)} 项检查，{failures} 项失败")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
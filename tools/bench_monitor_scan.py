@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监控扫描/入库基准（1k / 10k / 100k 个生成视频）
+
+在 tools/synth_campaign.py 生成的测试床（文件树 + 数据库）上运行监控脚本中的真实函数：
+- 打分监控（scripts/monitor_new_videos.py）：
+    scan_all_videos → get_existing_data → detect_new_content → detect_deleted_videos → update_database
+- 简易监控（scripts/simple_monitor.py）：scan_genvideo_directory → get_existing_videos_from_db → detect_new_content
+- 比较监控（scripts/monitor_new_videos_compare.py）：scan_gen_videos → get_db_videos → add_new_videos → create_new_tasks
+运行前临时放入一批新视频（--new-frac）并移走一批已有视频（--deleted-frac），结束后还原，测试床可重复使用。
+
+每个函数记录：耗时、文件系统调用次数（stat / scandir / listdir / open）、数据库写语句数、峰值RSS（及该函数带来的增量）。
+每个规模在独立子进程中运行（峰值RSS互不影响），并把一轮监控的总耗时与扫描间隔（默认300秒）对比。
+
+用法：
+    python tools/bench_monitor_scan.py                          # 1k/10k/100k
+    python tools/bench_monitor_scan.py --clips 1000 10000 --judges 20
+    python tools/bench_monitor_scan.py --new-frac 0.05 --out monitor_scan.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import synth_campaign  # noqa: E402
+from bench_hot_queries import load_module, quiet  # noqa: E402
+
+if sys.platform == 'win32' and (sys.stdout.encoding or '').lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+# 项目根目录
+PROJECT_ROOT = Path(__file__).parent.parent
+
+DEFAULT_WORK_DIR = PROJECT_ROOT / "bench_work"
+DEFAULT_CLIPS = [1000, 10000, 100000]
+MONITOR_INTERVAL = 300
+
+_WRITE_HEADS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+def peak_rss_mb():
+    """进程峰值常驻内存（MB）"""
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                 ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize / 1024 / 1024
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为KB，macOS 为字节
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+class Probe:
+    """统计一段代码的文件系统调用与数据库写语句
+
+    - stat/lstat：替换 os.stat / os.lstat（pathlib 的 exists/is_dir、os.path.getsize 都经由它们）
+    - scandir/listdir/open：审计钩子事件（glob、iterdir、open）
+    - 数据库写：替换 sqlite3.connect，用 trace 回调统计 INSERT/UPDATE/DELETE 的执行次数（executemany按行计）
+    """
+
+    _hooked = False
+    _current = None
+
+    def __init__(self):
+        self.counts = {'stat': 0, 'scandir': 0, 'listdir': 0, 'open': 0, 'db_writes': 0}
+
+    @classmethod
+    def _audit(cls, event, _args):
+        probe = cls._current
+        if probe is None:
+            return
+        if event == 'os.scandir':
+            probe.counts['scandir'] += 1
+        elif event == 'os.listdir':
+            probe.counts['listdir'] += 1
+        elif event == 'open':
+            probe.counts['open'] += 1
+
+    def __enter__(self):
+        if not Probe._hooked:
+            sys.addaudithook(Probe._audit)
+            Probe._hooked = True
+        counts = self.counts
+        self._saved = (os.stat, os.lstat, sqlite3.connect)
+        real_stat, real_lstat, real_connect = self._saved
+
+        def stat(*args, **kwargs):
+            counts['stat'] += 1
+            return real_stat(*args, **kwargs)
+
+        def lstat(*args, **kwargs):
+            counts['stat'] += 1
+            return real_lstat(*args, **kwargs)
+
+        def on_sql(sql):
+            if sql.lstrip()[:7].upper().startswith(_WRITE_HEADS):
+                counts['db_writes'] += 1
+
+        def connect(*args, **kwargs):
+            conn = real_connect(*args, **kwargs)
+            conn.set_trace_callback(on_sql)
+            return conn
+
+        os.stat, os.lstat, sqlite3.connect = stat, lstat, connect
+        Probe._current = self
+        return self
+
+    def __exit__(self, *exc):
+        Probe._current = None
+        os.stat, os.lstat, sqlite3.connect = self._saved
+        return False
+
+
+def measure(results, group, name, fn, *args):
+    """运行一个监控函数并记录耗时/调用次数/内存"""
+    rss_before = peak_rss_mb()
+    with Probe() as probe, quiet():
+        start = time.perf_counter()
+        value = fn(*args)
+        elapsed = time.perf_counter() - start
+    rss_after = peak_rss_mb()
+    results.append({
+        'group': group, 'step': name, 'ms': round(elapsed * 1000, 2), **probe.counts,
+        'peak_rss_mb': round(rss_after, 1), 'rss_growth_mb': round(rss_after - rss_before, 1),
+    })
+    return value
+
+
+# ==================== 测试床变更（新增/删除视频） ====================
+
+def _existing_pairs(gen_root):
+    pairs = set()
+    for model_dir in gen_root.iterdir():
+        for p in (model_dir / model_dir.name).glob('*.mp4'):
+            pairs.add((p.stem, model_dir.name))
+    return pairs
+
+
+def mutate_tree(root, hold_dir, models, n_new, n_deleted, seed):
+    """放入新视频、移走已有视频；返回用于还原的 (新增文件, [(移走后路径, 原路径)])"""
+    rnd = random.Random(f"{seed}-monitor-bench")
+    added, moved = [], []
+    for gen_dir in synth_campaign.GEN_DIRS.values():
+        gen_root = root / gen_dir
+        existing = sorted(_existing_pairs(gen_root))
+        samples = sorted({sid for sid, _m in existing})
+        present = set(existing)
+
+        # 为已有样本补一个尚未生成的模型
+        for sample_id in rnd.sample(samples, min(n_new, len(samples))):
+            missing = [m for m in models if (sample_id, m) not in present]
+            if not missing:
+                continue
+            model = rnd.choice(missing)
+            path = gen_root / model / model / f"{sample_id}.mp4"
+            synth_campaign.write_video_stub(path)
+            added.append(path)
+
+        for sample_id, model in rnd.sample(existing, min(n_deleted, len(existing))):
+            src = gen_root / model / model / f"{sample_id}.mp4"
+            dst = hold_dir / f"{len(moved)}.mp4"
+            shutil.move(src, dst)
+            moved.append((dst, src))
+    return added, moved
+
+
+def restore_tree(added, moved):
+    for path in added:
+        path.unlink(missing_ok=True)
+    for held, original in moved:
+        shutil.move(held, original)
+
+
+# ==================== 各监控的一轮 ====================
+
+def scoring_pass(root, db_path, tmp_dir, results):
+    monitor = load_module('bench_monitor_new_videos', PROJECT_ROOT / 'scripts' / 'monitor_new_videos.py')
+    simple = load_module('bench_simple_monitor', PROJECT_ROOT / 'scripts' / 'simple_monitor.py')
+    gen_root = root / synth_campaign.GEN_DIRS['scoring']
+    ref_root = root / synth_campaign.REF_DIR
+
+    # 简易监控先跑（只读），避免读到打分监控刚写入的新视频
+    scanned_simple = measure(results, 'simple', 'scan_genvideo_directory', simple.scan_genvideo_directory, gen_root)
+    existing_videos, existing_models = measure(results, 'simple', 'get_existing_videos_from_db',
+                                               simple.get_existing_videos_from_db, str(db_path))
+    measure(results, 'simple', 'detect_new_content', simple.detect_new_content,
+            scanned_simple, existing_videos, existing_models)
+
+    scanned = measure(results, 'scoring', 'scan_all_videos', monitor.scan_all_videos, gen_root, ref_root)
+    existing = measure(results, 'scoring', 'get_existing_data', monitor.get_existing_data, str(db_path))
+    new_content = measure(results, 'scoring', 'detect_new_content', monitor.detect_new_content, scanned, existing)
+    deleted = measure(results, 'scoring', 'detect_deleted_videos', monitor.detect_deleted_videos,
+                      existing['video_records'], scanned)
+    measure(results, 'scoring', 'update_database', monitor.update_database, str(db_path), new_content, scanned,
+            root / synth_campaign.PROMPT_DIR, synth_campaign.VIDEO_BASE, Path(tmp_dir) / 'static')
+    return {'new_videos': len(new_content['new_videos']), 'deleted_videos': len(deleted)}
+
+
+def compare_pass(root, db_path, results):
+    monitor = load_module('bench_monitor_new_videos_compare',
+                          PROJECT_ROOT / 'scripts' / 'monitor_new_videos_compare.py')
+    monitor.PROJECT_ROOT = root
+    monitor.DB_PATH = db_path
+    monitor.GEN_VIDEO_DIR = root / synth_campaign.GEN_DIRS['compare']
+    monitor.REF_VIDEO_DIR = root / synth_campaign.REF_DIR
+    monitor.PROMPT_DIR = root / synth_campaign.PROMPT_DIR
+
+    fs_videos = measure(results, 'compare', 'scan_gen_videos', monitor.scan_gen_videos)
+    db_videos = measure(results, 'compare', 'get_db_videos', monitor.get_db_videos)
+    # 与 monitor_once 相同的新增/删除判定
+    fs_flat = {(sid, m): path for sid, models in fs_videos.items() for m, path in models}
+    new_videos = {key: path for key, path in fs_flat.items() if key not in db_videos}
+    deleted = [key for key in db_videos if key not in fs_flat]
+    measure(results, 'compare', 'add_new_videos', monitor.add_new_videos, new_videos)
+    measure(results, 'compare', 'create_new_tasks', monitor.create_new_tasks, fs_videos)
+    return {'new_videos': len(new_videos), 'deleted_videos': len(deleted)}
+
+
+def run_size(clips, opts):
+    """在子进程中运行一个规模：准备测试床 → 变更文件树 → 跑三个监控 → 还原"""
+    per_sample = synth_campaign.SCORING_BASE['models_per_sample']
+    root = Path(opts['work_dir']) / f"testbed_c{clips}_s{opts['seed']}_j{opts['judges']}"
+    with quiet():
+        synth_campaign.build_testbed(root, max(1, clips // per_sample), seed=opts['seed'], judges=opts['judges'])
+    with open(root / 'testbed.json', 'r', encoding='utf-8') as f:
+        models = json.load(f)['models']
+
+    results, summary = [], {'clips': clips}
+    with tempfile.TemporaryDirectory(prefix='monitor_bench_') as tmp_dir:
+        tmp = Path(tmp_dir)
+        # 入库会写库，使用数据库副本
+        dbs = {}
+        for kind, name in synth_campaign.TESTBED_DB_NAMES.items():
+            dbs[kind] = tmp / name
+            shutil.copy2(root / name, dbs[kind])
+        hold_dir = root / '_bench_hold'
+        hold_dir.mkdir(exist_ok=True)
+        added, moved = mutate_tree(root, hold_dir, models, max(1, int(clips * opts['new_frac'])),
+                                   int(clips * opts['deleted_frac']), opts['seed'])
+        try:
+            summary['scoring'] = scoring_pass(root, dbs['scoring'], tmp_dir, results)
+            summary['compare'] = compare_pass(root, dbs['compare'], results)
+        finally:
+            restore_tree(added, moved)
+            shutil.rmtree(hold_dir, ignore_errors=True)
+
+    for group in ('scoring', 'simple', 'compare'):
+        summary[f'{group}_pass_s'] = round(sum(r['ms'] for r in results if r['group'] == group) / 1000, 3)
+    summary['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    return {'summary': summary, 'steps': results}
+
+
+def print_size(report, interval):
+    s = report['summary']
+    print(f"\n[{s['clips']} 个生成视频]  打分新增 {s['scoring']['new_videos']} / 删除 {s['scoring']['deleted_videos']}，"
+          f"比较新增 {s['compare']['new_videos']} / 删除 {s['compare']['deleted_videos']}")
+    print(f"  {'监控':<8} {'函数':<28} {'耗时ms':>10} {'stat':>8} {'scandir':>8} {'open':>7} "
+          f"{'写语句':>8} {'峰值MB':>8} {'增量MB':>7}")
+    for r in report['steps']:
+        print(f"  {r['group']:<8} {r['step']:<28} {r['ms']:>10.1f} {r['stat']:>8} {r['scandir'] + r['listdir']:>8} "
+              f"{r['open']:>7} {r['db_writes']:>8} {r['peak_rss_mb']:>8.1f} {r['rss_growth_mb']:>7.1f}")
+    for group in ('scoring', 'simple', 'compare'):
+        seconds = s[f'{group}_pass_s']
+        share = seconds / interval
+        flag = '❌ 超过扫描间隔' if share >= 1 else ('⚠️  超过间隔的一半' if share >= 0.5 else '✓')
+        print(f"  {group:<8} 一轮 {seconds:>9.2f} s / 间隔 {interval} s（{share * 100:5.1f}%）{flag}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description='监控扫描/入库基准（真实监控函数 + 合成测试床）')
+    ap.add_argument('--clips', nargs='+', type=int, default=DEFAULT_CLIPS,
+                    help='打分模式生成视频数（默认 1000 10000 100000；样本数=视频数/4）')
+    ap.add_argument('--judges', type=int, default=10, help='评审员数量（影响入库时的assignments写入量）')
+    ap.add_argument('--new-frac', type=float, default=0.01, help='临时新增的视频比例')
+    ap.add_argument('--deleted-frac', type=float, default=0.005, help='临时移走的视频比例')
+    ap.add_argument('--interval', type=int, default=MONITOR_INTERVAL, help='监控扫描间隔（秒，默认300）')
+    ap.add_argument('--seed', type=int, default=42)
+    ap.add_argument('--work-dir', default=str(DEFAULT_WORK_DIR), help='测试床缓存目录')
+    ap.add_argument('--out', default=None, help='结果JSON路径（可选）')
+    args = ap.parse_args()
+
+    opts = {'work_dir': args.work_dir, 'seed': args.seed, 'judges': args.judges,
+            'new_frac': args.new_frac, 'deleted_frac': args.deleted_frac}
+    print("=" * 100)
+    print(f"  监控扫描/入库基准：{', '.join(str(c) for c in args.clips)} 个生成视频，"
+          f"新增 {args.new_frac:.1%} / 删除 {args.deleted_frac:.1%}，{args.judges} 名评审员")
+    print("=" * 100)
+
+    reports = []
+    for clips in sorted(set(args.clips)):
+        print(f"⏳ {clips} 个视频：准备测试床并运行...")
+        # 每个规模一个新进程，峰值RSS只反映该规模
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+            report = pool.submit(run_size, clips, opts).result()
+        reports.append(report)
+        print_size(report, args.interval)
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({
+                'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'interval_s': args.interval, 'judges': args.judges,
+                'new_frac': args.new_frac, 'deleted_frac': args.deleted_frac,
+                'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+                'machine': platform.platform(), 'sizes': reports,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 结果已保存: {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库维护调度（WAL检查点 + 增量VACUUM）
+
+长时间评测中，完成触发器不断删除assignments，数据库空闲页和 -wal 文件持续增长，读延迟随之上升。
+本服务常驻运行，定期采样 WAL 大小与 freelist_count，并在空闲窗口内执行维护：
+- WAL 超过 --wal-passive-mb：执行 wal_checkpoint(PASSIVE)，不等待任何读写
+- WAL 超过 --wal-truncate-mb 且处于空闲窗口：执行 wal_checkpoint(TRUNCATE)，把 -wal 文件截断为0
+- 空闲页超过 --freelist-pages 且处于空闲窗口：分批 PRAGMA incremental_vacuum，批间重新确认空闲
+  （需要 auto_vacuum=INCREMENTAL；旧库可用 --enable-incremental 在空闲窗口内一次性转换）
+
+空闲窗口：连续 --idle-seconds 秒内 PRAGMA data_version 没有变化（即没有其他连接提交）。
+每次维护前后记录文件大小、空闲页和探测查询耗时，追加到 --log（JSON Lines）。
+
+用法：
+    python tools/db_maintenance.py --db aiv_eval_v4.db
+    python tools/db_maintenance.py --db aiv_eval_v4.db --once --force
+    python tools/db_maintenance.py --db aiv_compare_v1.db --enable-incremental --once --force
+"""
+
+import argparse
+import io
+import json
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+if sys.platform == 'win32' and (sys.stdout.encoding or '').lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+# 项目根目录
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'app'))
+import db_trace  # noqa: E402
+
+DEFAULT_LOG = PROJECT_ROOT / "logs" / "db_maintenance.jsonl"
+
+# 探测查询：评测页面最常用的读路径（打分模式 next_assign / 比较模式 get_current_task 的简化形式）
+PROBE_QUERIES = {
+    'scoring': """
+        SELECT a.task_id FROM assignments a
+        JOIN tasks t ON a.task_id = t.id
+        LEFT JOIN ratings r ON r.judge_id = a.judge_id AND r.video_id = t.video_id
+        WHERE a.judge_id = ? AND a.finished = 0
+        ORDER BY a.display_order LIMIT 1
+    """,
+    'compare': """
+        SELECT a.task_id FROM assignments a
+        WHERE a.judge_id = ?
+        AND NOT EXISTS (SELECT 1 FROM comparisons c WHERE c.task_id = a.task_id AND c.judge_id = ?)
+        ORDER BY a.position LIMIT 1
+    """,
+}
+
+
+def _mb(n):
+    return n / 1048576
+
+
+def wal_path(db_path):
+    return Path(f"{db_path}-wal")
+
+
+def detect_mode(conn):
+    """根据judges表结构判断是打分模式还是比较模式"""
+    cols = [row[1] for row in conn.execute("PRAGMA table_info(judges)")]
+    return 'compare' if 'uid' in cols else 'scoring'
+
+
+def collect_stats(conn, db_path):
+    """采样数据库文件、WAL与空闲页状态"""
+    wal = wal_path(db_path)
+    return {
+        'db_bytes': Path(db_path).stat().st_size,
+        'wal_bytes': wal.stat().st_size if wal.exists() else 0,
+        'page_size': conn.execute("PRAGMA page_size").fetchone()[0],
+        'page_count': conn.execute("PRAGMA page_count").fetchone()[0],
+        'freelist_count': conn.execute("PRAGMA freelist_count").fetchone()[0],
+        'auto_vacuum': conn.execute("PRAGMA auto_vacuum").fetchone()[0],
+    }
+
+
+def probe_latency(conn, mode, repeat=5):
+    """探测查询耗时中位数（毫秒），按评审员轮流查询"""
+    judge_col = 'judge_id' if mode == 'compare' else 'id'
+    judge_ids = [row[0] for row in conn.execute(f"SELECT {judge_col} FROM judges ORDER BY {judge_col}")]
+    if not judge_ids:
+        return None
+    sql = PROBE_QUERIES[mode]
+    durations = []
+    for i in range(repeat):
+        judge_id = judge_ids[i % len(judge_ids)]
+        params = (judge_id, judge_id) if mode == 'compare' else (judge_id,)
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        durations.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(durations), 3)
+
+
+class IdleDetector:
+    """通过 PRAGMA data_version 判断其他连接是否有提交"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.version = self._read()
+        self.last_change = time.monotonic()
+
+    def _read(self):
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def poll(self):
+        version = self._read()
+        if version != self.version:
+            self.version = version
+            self.last_change = time.monotonic()
+
+    def idle_for(self):
+        self.poll()
+        return time.monotonic() - self.last_change
+
+
+def checkpoint(conn, mode):
+    """执行检查点，返回 (busy, wal_frames, checkpointed_frames)"""
+    return tuple(conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone())
+
+
+def incremental_vacuum(conn, idle, pages, batch, idle_seconds):
+    """分批回收空闲页；其他连接开始提交时立即停止，返回回收的页数
+
+    data_version 只随其他连接的提交变化（本连接的回收不会计入），每批之前的 idle_for 即可发现评审员写入
+    """
+    freed = 0
+    while freed < pages:
+        if idle is not None and idle.idle_for() < idle_seconds:
+            break
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if before == 0:
+            break
+        conn.execute(f"PRAGMA incremental_vacuum({min(batch, pages - freed)})").fetchall()
+        after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if after >= before:
+            break
+        freed += before - after
+    return freed
+
+
+def enable_incremental(conn):
+    """将 auto_vacuum 切换为 INCREMENTAL（需要一次完整VACUUM，期间阻塞写入）"""
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+    # WAL模式下VACUUM的结果全部写在WAL里，立即截断以免WAL膨胀到整库大小
+    checkpoint(conn, 'TRUNCATE')
+
+
+def append_log(log_path, record):
+    log_path = Path(log_path)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def run_maintenance(conn, db_path, args, idle=None, mode=None):
+    """检查阈值并执行需要的维护动作
+
+    Returns:
+        执行记录（dict），没有执行任何动作时返回None
+    """
+    mode = mode or detect_mode(conn)
+    before = collect_stats(conn, db_path)
+    is_idle = args.force or (idle is not None and idle.idle_for() >= args.idle_seconds)
+
+    vacuum_actions = []
+    if args.enable_incremental and before['auto_vacuum'] != 2 and is_idle:
+        vacuum_actions.append('enable_incremental')
+    if before['freelist_count'] >= args.freelist_pages and is_idle and (
+            before['auto_vacuum'] == 2 or vacuum_actions):
+        vacuum_actions.append('incremental_vacuum')
+    wal_due = (before['wal_bytes'] >= args.wal_passive_mb * 1048576
+               or (is_idle and before['wal_bytes'] >= args.wal_truncate_mb * 1048576))
+    if not vacuum_actions and not wal_due:
+        return None
+
+    record = {
+        'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'db': str(db_path),
+        'mode': mode,
+        'idle': is_idle,
+        'before': before,
+        'probe_ms_before': probe_latency(conn, mode),
+        'actions': {},
+    }
+
+    def timed(action, fn, *fn_args):
+        t0 = time.perf_counter()
+        result = fn(*fn_args)
+        record['actions'][action] = {'result': result, 'ms': round((time.perf_counter() - t0) * 1000, 1)}
+
+    start = time.perf_counter()
+    if 'enable_incremental' in vacuum_actions:
+        timed('enable_incremental', enable_incremental, conn)
+    if 'incremental_vacuum' in vacuum_actions:
+        free_now = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        timed('incremental_vacuum', incremental_vacuum, conn, None if args.force else idle,
+              free_now, args.vacuum_batch, args.idle_seconds)
+
+    # 回收空闲页产生的写入也在WAL里，检查点放在最后按当前WAL大小决定
+    wal_bytes = wal_path(db_path).stat().st_size if wal_path(db_path).exists() else 0
+    if is_idle and wal_bytes >= args.wal_truncate_mb * 1048576:
+        timed('checkpoint_truncate', checkpoint, conn, 'TRUNCATE')
+    elif wal_bytes >= args.wal_passive_mb * 1048576 or vacuum_actions:
+        timed('checkpoint_passive', checkpoint, conn, 'PASSIVE')
+
+    record['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    record['after'] = collect_stats(conn, db_path)
+    record['probe_ms_after'] = probe_latency(conn, mode)
+    return record
+
+
+def print_record(record):
+    before, after = record['before'], record['after']
+    page_size = before['page_size']
+    print(f"[{record['time']}] 🧹 {', '.join(record['actions'])}（{record['elapsed_ms']:.0f} ms）")
+    print(f"   数据库: {_mb(before['db_bytes']):.2f} MB → {_mb(after['db_bytes']):.2f} MB")
+    print(f"   WAL:    {_mb(before['wal_bytes']):.2f} MB → {_mb(after['wal_bytes']):.2f} MB")
+    print(f"   空闲页: {before['freelist_count']} ({_mb(before['freelist_count'] * page_size):.2f} MB)"
+          f" → {after['freelist_count']}")
+    if record['probe_ms_before'] is not None:
+        print(f"   探测查询: {record['probe_ms_before']:.3f} ms → {record['probe_ms_after']:.3f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser(description='WAL检查点与增量VACUUM维护调度')
+    ap.add_argument('--db', default='aiv_eval_v4.db', help='数据库路径（打分模式或比较模式）')
+    ap.add_argument('--interval', type=int, default=60, help='采样间隔（秒）')
+    ap.add_argument('--idle-seconds', type=float, default=30, help='无提交持续多少秒视为空闲窗口')
+    ap.add_argument('--wal-passive-mb', type=float, default=16, help='WAL超过该大小执行PASSIVE检查点')
+    ap.add_argument('--wal-truncate-mb', type=float, default=64, help='WAL超过该大小在空闲时执行TRUNCATE检查点')
+    ap.add_argument('--freelist-pages', type=int, default=1000, help='空闲页超过该数量在空闲时执行增量VACUUM')
+    ap.add_argument('--vacuum-batch', type=int, default=200, help='每批incremental_vacuum回收的页数')
+    ap.add_argument('--enable-incremental', action='store_true',
+                    help='在空闲窗口内将auto_vacuum一次性切换为INCREMENTAL（执行一次完整VACUUM）')
+    ap.add_argument('--log', default=str(DEFAULT_LOG), help='维护记录（JSON Lines）')
+    ap.add_argument('--once', action='store_true', help='只检查一次，不持续运行')
+    ap.add_argument('--force', action='store_true', help='不等待空闲窗口（仅在评测服务停止时使用）')
+    args = ap.parse_args()
+
+    db_path = Path(args.db)
+    if not db_path.exists():
+        print(f"[ERROR] 数据库不存在: {db_path}")
+        return 1
+
+    # 短超时：维护动作拿不到锁时宁可放弃本轮，也不能让评审员提交排队
+    conn = db_trace.connect(db_path, timeout=0.1, isolation_level=None)
+    mode = detect_mode(conn)
+    idle = IdleDetector(conn)
+
+    stats = collect_stats(conn, db_path)
+    print("=" * 70)
+    print(f"  数据库维护：{db_path}（{mode}模式）")
+    print(f"  当前: {_mb(stats['db_bytes']):.2f} MB，WAL {_mb(stats['wal_bytes']):.2f} MB，"
+          f"空闲页 {stats['freelist_count']}，auto_vacuum={stats['auto_vacuum']}")
+    print("=" * 70)
+    if stats['auto_vacuum'] != 2 and not args.enable_incremental:
+        print("ℹ️  auto_vacuum不是INCREMENTAL，只做检查点；可加 --enable-incremental 启用空闲页回收")
+
+    if args.once and not args.force:
+        print(f"⏳ 观察 {args.idle_seconds:g} 秒内是否有提交...")
+        time.sleep(args.idle_seconds)
+
+    try:
+        while True:
+            try:
+                record = run_maintenance(conn, db_path, args, idle, mode)
+            except sqlite3.OperationalError as e:
+                # database is locked：评测正在写入，留到下一轮
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] ⏳ 数据库忙，跳过本轮：{e}")
+                record = None
+            if record:
+                print_record(record)
+                append_log(args.log, record)
+            if args.once:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("\n[STOP] 维护服务已停止")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并发评审员压测（打分模式 / 比较模式）
+
+在合成数据库（tools/synth_campaign.py）的副本上，用 N 个线程模拟 N 个同时在线的评审员，
+每个评审员循环执行评测页面里的真实函数：
+- 打分模式（app/streamlit_app.py）：
+    页面  judge_by_token → progress → next_assign → get_video_info → previous_assign → existing
+    提交  save → mark_done
+    默认与页面一致，judge_by_token / progress / next_assign / previous_assign 走进程内任务看板
+    （app/task_board.py，每个进程一个，提交经 write_through）；--sql 时改为直接调用对应的SQL函数
+- 比较模式（app/streamlit_app_compare.py）：
+    页面  verify_judge → get_progress → get_completed_count → get_current_task
+    提交  submit_comparison
+同时在后台按间隔运行监控脚本（scripts/monitor_new_videos*.py）的数据库部分；
+--monitor-churn K 时每轮再用真实的 cleanup_deleted_videos 清理 K 个未评视频（模拟删除视频）。
+
+每个并发档位使用一份新的数据库副本，报告吞吐（提交/秒）、页面与提交的 p50/p99 延迟、
+“database is locked” 比例以及监控每轮耗时。Streamlit 在单进程内用线程服务所有会话，
+默认即按此方式压测；--procs P 把评审员分散到 P 个进程（每个进程内仍是线程）。
+
+用法：
+    python tools/load_test_judges.py --kind scoring
+    python tools/load_test_judges.py --kind compare --judges 1 10 50 200 --duration 30
+    python tools/load_test_judges.py --kind compare --wal --monitor-churn 5 --out load_compare.json
+    python tools/load_test_judges.py --kind scoring --think-ms 3000 --procs 4
+    python tools/load_test_judges.py --kind scoring --sql              # 对照：不用任务看板
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing as mp
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import synth_campaign  # noqa: E402
+from bench_hot_queries import load_module, quiet  # noqa: E402
+
+if sys.platform == 'win32' and (sys.stdout.encoding or '').lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+# 项目根目录
+PROJECT_ROOT = Path(__file__).parent.parent
+
+DEFAULT_WORK_DIR = PROJECT_ROOT / "bench_work"
+DEFAULT_LEVELS = [1, 10, 25, 50, 100, 200]
+
+
+def _is_locked(exc):
+    msg = str(exc).lower()
+    return 'locked' in msg or 'busy' in msg
+
+
+def percentile(values, q):
+    if not values:
+        return float('nan')
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * len(s)))]
+
+
+class Recorder:
+    """单个评审员（或合并后）的统计：每个操作的延迟、尝试次数、锁冲突与其他错误"""
+
+    def __init__(self):
+        self.latency = defaultdict(list)
+        self.attempts = defaultdict(int)
+        self.locked = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.tasks = 0
+        self.exhausted = 0
+
+    def call(self, name, fn, *args):
+        self.attempts[name] += 1
+        t0 = time.perf_counter()
+        try:
+            return fn(*args)
+        except sqlite3.OperationalError as e:
+            if _is_locked(e):
+                self.locked[name] += 1
+            else:
+                self.errors[name] += 1
+            raise
+        finally:
+            self.latency[name].append((time.perf_counter() - t0) * 1000)
+
+    def merge(self, other):
+        for name, values in other.latency.items():
+            self.latency[name].extend(values)
+        for field in ('attempts', 'locked', 'errors'):
+            mine = getattr(self, field)
+            for name, n in getattr(other, field).items():
+                mine[name] += n
+        self.tasks += other.tasks
+        self.exhausted += other.exhausted
+
+    def to_dict(self):
+        return {
+            'latency': dict(self.latency), 'attempts': dict(self.attempts),
+            'locked': dict(self.locked), 'errors': dict(self.errors),
+            'tasks': self.tasks, 'exhausted': self.exhausted,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        rec = cls()
+        rec.latency.update(d['latency'])
+        rec.attempts.update(d['attempts'])
+        rec.locked.update(d['locked'])
+        rec.errors.update(d['errors'])
+        rec.tasks = d['tasks']
+        rec.exhausted = d['exhausted']
+        return rec
+
+
+# ==================== 模拟评审员 ====================
+
+def load_app(kind, db_path, use_board=True):
+    """加载真实的评测页面模块并指向压测数据库；打分模式下 app.board 为本进程的任务看板（--sql 时为 None）"""
+    os.environ['AIV_DB'] = str(db_path)
+    with quiet():
+        if kind == 'scoring':
+            app = load_module('load_streamlit_app', PROJECT_ROOT / 'app' / 'streamlit_app.py')
+            app.DB_PATH = str(db_path)
+            app.board = app.TaskBoard(str(db_path)) if use_board else None
+        else:
+            app = load_module('load_streamlit_app_compare', PROJECT_ROOT / 'app' / 'streamlit_app_compare.py')
+            app.DB_PATH = Path(db_path)
+    return app
+
+
+def scoring_task(app, rec, judge_id, token, think, rnd):
+    """打分模式：一次页面加载 + 一次提交；返回 False 表示已无任务"""
+    board = app.board
+    conn = app.get_conn()
+    try:
+        t0 = time.perf_counter()
+        try:
+            if board:
+                jid, _name = rec.call('judge_by_token', board.judge_by_token, token)
+                rec.call('progress', board.progress, jid)
+                nxt = rec.call('next_assign', board.next_assign, jid)
+            else:
+                jid, _name = rec.call('judge_by_token', app.judge_by_token, conn, token)
+                rec.call('progress', app.progress, conn, jid)
+                nxt = rec.call('next_assign', app.next_assign, conn, jid)
+            if not nxt:
+                return False
+            task_id, _pid, video_id, _text, _ref = nxt
+            rec.call('get_video_info', app.get_video_info, conn, video_id)
+            if board:
+                rec.call('previous_assign', board.previous_assign, jid, task_id)
+            else:
+                rec.call('previous_assign', app.previous_assign, conn, jid, task_id)
+            rec.call('existing', app.existing, conn, jid, video_id)
+        finally:
+            rec.latency['page'].append((time.perf_counter() - t0) * 1000)
+
+        if think:
+            time.sleep(rnd.expovariate(1.0 / think))
+
+        scores = {k: rnd.randint(1, 5) for k in ('semantic', 'motion', 'temporal', 'realism')}
+        t0 = time.perf_counter()
+        try:
+            if board:
+                # 与页面的提交按钮相同：save + mark_done 在看板连接上执行，随后更新内存
+                def submit(c):
+                    app.save(c, jid, video_id, scores)
+                    app.mark_done(c, jid, task_id)
+                rec.call('write_through', board.write_through, jid, task_id, True, submit)
+            else:
+                rec.call('save', app.save, conn, jid, video_id, scores)
+                rec.call('mark_done', app.mark_done, conn, jid, task_id)
+        finally:
+            rec.latency['submit'].append((time.perf_counter() - t0) * 1000)
+        rec.tasks += 1
+        return True
+    finally:
+        conn.close()
+
+
+def compare_task(app, rec, judge_id, uid, think, rnd):
+    """比较模式：一次页面加载 + 一次提交；返回 False 表示已无任务"""
+    t0 = time.perf_counter()
+    try:
+        judge = rec.call('verify_judge', app.verify_judge, uid)
+        jid = judge['judge_id']
+        rec.call('get_progress', app.get_progress, jid)
+        rec.call('get_completed_count', app.get_completed_count, jid)
+        task = rec.call('get_current_task', app.get_current_task, jid)
+        if not task:
+            return False
+    finally:
+        rec.latency['page'].append((time.perf_counter() - t0) * 1000)
+
+    if think:
+        time.sleep(rnd.expovariate(1.0 / think))
+
+    chosen = rnd.choice([task['model_a'], task['model_b'], 'tie'])
+    t0 = time.perf_counter()
+    try:
+        ok = rec.call('submit_comparison', app.submit_comparison, task['task_id'], jid, chosen, "")
+    finally:
+        rec.latency['submit'].append((time.perf_counter() - t0) * 1000)
+    if ok:
+        rec.tasks += 1
+    return True
+
+
+TASKS = {
+    'scoring': scoring_task,
+    'compare': compare_task,
+}
+
+
+def judge_loop(kind, app, rec, judge_id, credential, stop_at, think, seed):
+    rnd = random.Random(f"{seed}-{judge_id}")
+    run_task = TASKS[kind]
+    while time.time() < stop_at:
+        try:
+            if not run_task(app, rec, judge_id, credential, think, rnd):
+                rec.exhausted += 1
+                return
+        except sqlite3.OperationalError:
+            # 与页面上的“提交失败”一致：评审员稍后重试（已由 Recorder 计数）
+            time.sleep(rnd.uniform(0.05, 0.2))
+        except Exception as e:
+            rec.errors[type(e).__name__] += 1
+            time.sleep(0.1)
+
+
+def judge_credentials(kind, db_path, n):
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        if kind == 'scoring':
+            rows = conn.execute("SELECT id, token FROM judges ORDER BY id LIMIT ?", (n,)).fetchall()
+        else:
+            rows = conn.execute("SELECT judge_id, uid FROM judges ORDER BY judge_id LIMIT ?", (n,)).fetchall()
+    return rows
+
+
+def run_shard(kind, db_path, judges, duration, think, seed, use_board=True,
+              ready=None, start=None, results=None, app=None):
+    """在当前进程内用线程运行一组评审员；进程模式下通过 ready/start/results 与主进程同步"""
+    if app is None:
+        app = load_app(kind, db_path, use_board)
+    recs = [Recorder() for _ in judges]
+    if ready is not None:
+        ready.put(os.getpid())
+        start.wait()
+    stop_at = time.time() + duration
+    threads = [
+        threading.Thread(target=judge_loop, args=(kind, app, rec, jid, cred, stop_at, think, seed), daemon=True)
+        for rec, (jid, cred) in zip(recs, judges)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    total = Recorder()
+    for rec in recs:
+        total.merge(rec)
+    if results is not None:
+        results.put(total.to_dict())
+    return total
+
+
+# ==================== 后台监控 ====================
+
+class MonitorThread(threading.Thread):
+    """按间隔运行监控脚本的数据库部分（读取现有数据 + 可选的删除清理）"""
+
+    def __init__(self, kind, db_path, interval, churn, seed):
+        super().__init__(daemon=True)
+        self.kind = kind
+        self.db_path = str(db_path)
+        self.interval = interval
+        self.churn = churn
+        self.rnd = random.Random(f"{seed}-monitor")
+        self.stop_event = threading.Event()
+        self.passes = []
+        self.locked = 0
+        self.errors = 0
+        with quiet():
+            if kind == 'scoring':
+                self.monitor = load_module('load_monitor_new_videos', PROJECT_ROOT / 'scripts' / 'monitor_new_videos.py')
+            else:
+                self.monitor = load_module('load_monitor_new_videos_compare',
+                                           PROJECT_ROOT / 'scripts' / 'monitor_new_videos_compare.py')
+                self.monitor.DB_PATH = Path(db_path)
+
+    def _pending_videos(self, sql):
+        with contextlib.closing(sqlite3.connect(self.db_path, timeout=10.0)) as conn:
+            rows = conn.execute(sql).fetchall()
+        return self.rnd.sample(rows, min(self.churn, len(rows)))
+
+    def scoring_pass(self):
+        m = self.monitor
+        existing = m.get_existing_data(self.db_path)
+        gone = set()
+        if self.churn:
+            gone = {vid for (vid,) in self._pending_videos(
+                "SELECT v.id FROM videos v WHERE NOT EXISTS (SELECT 1 FROM ratings r WHERE r.video_id = v.id)")}
+        # 以数据库记录构造“扫描结果”（去掉被删除的视频），走真实的删除检测与清理
+        gen_videos = defaultdict(dict)
+        for vid, (sample_id, model) in existing['video_records'].items():
+            if vid not in gone:
+                gen_videos[sample_id][model] = None
+        deleted = m.detect_deleted_videos(existing['video_records'], {'gen_videos': gen_videos})
+        if deleted:
+            m.cleanup_deleted_videos(self.db_path, deleted)
+
+    def compare_pass(self):
+        m = self.monitor
+        db_videos = m.get_db_videos()
+        m.get_db_tasks()
+        gen_videos = defaultdict(list)
+        for (sample_id, model), info in db_videos.items():
+            gen_videos[sample_id].append((model, info['video_path']))
+        m.create_new_tasks(gen_videos)
+        if self.churn:
+            m.cleanup_deleted_videos(self._pending_videos(
+                "SELECT v.sample_id, v.model_name FROM videos v WHERE NOT EXISTS ("
+                " SELECT 1 FROM tasks t JOIN comparisons c ON c.task_id = t.task_id"
+                " WHERE t.sample_id = v.sample_id AND (t.model_a = v.model_name OR t.model_b = v.model_name))"))
+
+    def run(self):
+        run_pass = self.scoring_pass if self.kind == 'scoring' else self.compare_pass
+        while not self.stop_event.is_set():
+            t0 = time.perf_counter()
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    run_pass()
+            except sqlite3.OperationalError as e:
+                if _is_locked(e):
+                    self.locked += 1
+                else:
+                    self.errors += 1
+            self.passes.append((time.perf_counter() - t0) * 1000)
+            self.stop_event.wait(self.interval)
+
+
+# ==================== 压测 ====================
+
+def prepare_db(base_db, tmp_dir, n, wal):
+    """每个并发档位使用一份新的数据库副本"""
+    db_path = Path(tmp_dir) / f"load_{n}.db"
+    shutil.copy2(base_db, db_path)
+    if wal:
+        with contextlib.closing(sqlite3.connect(db_path)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+    return db_path
+
+
+def run_level(kind, db_path, n, args):
+    judges = judge_credentials(kind, db_path, n)
+    monitor = None
+    if args.monitor_interval > 0:
+        monitor = MonitorThread(kind, db_path, args.monitor_interval, args.monitor_churn, args.seed)
+
+    think = args.think_ms / 1000.0
+    procs = max(1, min(args.procs, n))
+    wall0 = time.perf_counter()
+    if procs == 1:
+        # 先加载页面再启动监控：两者都会临时替换 sys.stdout，交错时主线程的输出会被吞掉
+        app = load_app(kind, db_path, not args.sql)
+        if monitor:
+            monitor.start()
+        wall0 = time.perf_counter()
+        total = run_shard(kind, db_path, judges, args.duration, think, args.seed, app=app)
+    else:
+        ctx = mp.get_context()
+        ready, results, start = ctx.Queue(), ctx.Queue(), ctx.Event()
+        shards = [judges[i::procs] for i in range(procs)]
+        workers = [ctx.Process(target=run_shard,
+                               args=(kind, db_path, shard, args.duration, think, args.seed, not args.sql,
+                                     ready, start, results))
+                   for shard in shards]
+        for w in workers:
+            w.start()
+        for _ in workers:
+            ready.get()
+        if monitor:
+            monitor.start()
+        wall0 = time.perf_counter()
+        start.set()
+        total = Recorder()
+        for _ in workers:
+            total.merge(Recorder.from_dict(results.get()))
+        for w in workers:
+            w.join()
+    elapsed = time.perf_counter() - wall0
+
+    if monitor:
+        monitor.stop_event.set()
+        monitor.join()
+
+    attempts = sum(total.attempts.values())
+    locked = sum(total.locked.values())
+    result = {
+        'judges': n,
+        'elapsed_s': round(elapsed, 2),
+        'tasks': total.tasks,
+        'throughput': round(total.tasks / elapsed, 2) if elapsed else 0.0,
+        'page_p50_ms': round(percentile(total.latency['page'], 0.50), 2),
+        'page_p99_ms': round(percentile(total.latency['page'], 0.99), 2),
+        'submit_p50_ms': round(percentile(total.latency['submit'], 0.50), 2),
+        'submit_p99_ms': round(percentile(total.latency['submit'], 0.99), 2),
+        'db_calls': attempts,
+        'locked': locked,
+        'locked_rate': round(locked / attempts, 5) if attempts else 0.0,
+        'errors': sum(total.errors.values()),
+        'exhausted_judges': total.exhausted,
+        'ops': {
+            name: {'calls': total.attempts[name], 'locked': total.locked[name],
+                   'p50_ms': round(percentile(values, 0.50), 2), 'p99_ms': round(percentile(values, 0.99), 2)}
+            for name, values in sorted(total.latency.items()) if name not in ('page', 'submit')
+        },
+    }
+    if monitor:
+        result['monitor'] = {
+            'passes': len(monitor.passes),
+            'p50_ms': round(percentile(monitor.passes, 0.50), 2),
+            'max_ms': round(max(monitor.passes), 2) if monitor.passes else 0.0,
+            'locked': monitor.locked,
+            'errors': monitor.errors,
+        }
+    return result
+
+
+def print_row(r):
+    mon = r.get('monitor')
+    mon_text = f"{mon['passes']:>3}轮 max {mon['max_ms']:>7.0f}" if mon else '-'
+    print(f"  {r['judges']:>5} {r['throughput']:>9.1f} {r['page_p50_ms']:>9.1f} {r['page_p99_ms']:>9.1f} "
+          f"{r['submit_p50_ms']:>9.1f} {r['submit_p99_ms']:>9.1f} {r['locked_rate'] * 100:>8.2f}% "
+          f"{r['errors']:>5}  {mon_text}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description='并发评审员压测（真实页面函数 + 后台监控）')
+    ap.add_argument('--kind', choices=sorted(TASKS), default='scoring', help='评测模式')
+    ap.add_argument('--judges', nargs='+', type=int, default=DEFAULT_LEVELS,
+                    help='并发评审员档位（默认 1 10 25 50 100 200）')
+    ap.add_argument('--duration', type=float, default=15, help='每个档位持续时间（秒）')
+    ap.add_argument('--think-ms', type=float, default=0,
+                    help='评审员看视频/打分的平均思考时间（指数分布，毫秒；0=不停顿的极限压测）')
+    ap.add_argument('--procs', type=int, default=1, help='评审员分布到多少个进程（默认1，与Streamlit一致）')
+    ap.add_argument('--scale', type=float, default=1, help='合成数据库规模倍数')
+    ap.add_argument('--seed', type=int, default=42)
+    ap.add_argument('--work-dir', default=str(DEFAULT_WORK_DIR), help='合成数据库缓存目录')
+    ap.add_argument('--wal', action='store_true',
+                    help='压测前把副本切换为WAL（打分页面每次连接都会设置WAL；比较模式默认保持原日志模式）')
+    ap.add_argument('--monitor-interval', type=float, default=5, help='后台监控每轮间隔（秒，0=不运行监控）')
+    ap.add_argument('--monitor-churn', type=int, default=0, help='监控每轮清理的未评视频数（模拟删除视频）')
+    ap.add_argument('--sql', action='store_true',
+                    help='打分模式不使用任务看板，页面读取直接走SQL函数（对照旧路径）')
+    ap.add_argument('--out', default=None, help='结果JSON路径（可选）')
+    args = ap.parse_args()
+
+    os.environ.setdefault('STREAMLIT_LOGGER_LEVEL', 'error')
+    levels = sorted(set(args.judges))
+    print(f"⏳ 准备合成数据库（{args.kind}，x{args.scale:g}，{max(levels)} 名评审员）...")
+    base_db = synth_campaign.cached_db(args.kind, args.scale, args.work_dir, seed=args.seed, judges=max(levels))
+
+    print("=" * 100)
+    print(f"  并发压测：{args.kind}模式，每档 {args.duration:g}s，思考时间 {args.think_ms:g}ms，"
+          f"{args.procs} 个进程，监控间隔 {args.monitor_interval:g}s（churn {args.monitor_churn}）"
+          + ("，SQL直查" if args.kind == 'scoring' and args.sql else ""))
+    print("=" * 100)
+    print(f"  {'评审员':>5} {'提交/秒':>9} {'页面p50':>9} {'页面p99':>9} {'提交p50':>9} {'提交p99':>9} "
+          f"{'锁冲突':>9} {'错误':>5}  监控")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='load_test_') as tmp_dir:
+        for n in levels:
+            db_path = prepare_db(base_db, tmp_dir, n, args.wal)
+            r = run_level(args.kind, db_path, n, args)
+            results.append(r)
+            print_row(r)
+            if r['exhausted_judges']:
+                print(f"        ℹ️  {r['exhausted_judges']} 名评审员已无任务，可加大 --scale 或 --think-ms")
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({
+                'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'kind': args.kind, 'scale': args.scale, 'duration_s': args.duration,
+                'think_ms': args.think_ms, 'procs': args.procs, 'wal': args.wal,
+                'task_board': args.kind == 'scoring' and not args.sql,
+                'monitor_interval_s': args.monitor_interval, 'monitor_churn': args.monitor_churn,
+                'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+                'levels': results,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 结果已保存: {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -10,12 +10,15 @@
 4. 应用所有数据库修复
 """
 import sys
-import sqlite3
-import shutil
 from pathlib import Path
 from datetime import datetime
 
-if sys.platform == 'win32':
+from backup_service import online_backup
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+import db_trace  # noqa: E402
+
+if sys.platform == 'win32' and (sys.stdout.encoding or '').lower() != 'utf-8':
     import io
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
@@ -29,12 +32,13 @@ def backup_current_db(db_path):
     backup_path = f"backup/aiv_eval_v4_before_restore_{timestamp}.db"
     
     print(f"📦 备份当前数据库...")
-    shutil.copy2(db_path, backup_path)
+    # 在线备份：评测服务运行中也能得到一致的副本（包含WAL中未检查点的数据）
+    online_backup(db_path, backup_path)
     print(f"   ✓ 备份到: {backup_path}")
 
 def check_db_structure(db_path):
     """检查数据库结构"""
-    conn = sqlite3.connect(db_path)
+    conn = db_trace.connect(db_path)
     cur = conn.cursor()
     
     # 检查是否有tasks表（V2系统）
@@ -63,7 +67,7 @@ def apply_unique_constraint(db_path):
     """应用UNIQUE约束"""
     print("\n🔧 应用UNIQUE约束...")
     
-    conn = sqlite3.connect(db_path)
+    conn = db_trace.connect(db_path)
     cur = conn.cursor()
     
     try:
@@ -142,7 +146,7 @@ def apply_unique_constraint(db_path):
             SELECT 
                 j.id,
                 j.name,
-                COUNT(DISTINCT a.id) as total_assignments,
+                COUNT(DISTINCT a.task_id) as total_assignments,
                 SUM(CASE WHEN a.finished=1 THEN 1 ELSE 0 END) as finished_assignments,
                 SUM(CASE WHEN a.finished=0 AND t.completed=0 THEN 1 ELSE 0 END) as pending_assignments
             FROM judges j
@@ -182,7 +186,7 @@ def fix_triggers(db_path):
     """修复触发器"""
     print("\n🔧 修复触发器...")
     
-    conn = sqlite3.connect(db_path)
+    conn = db_trace.connect(db_path)
     cur = conn.cursor()
     
     try:
@@ -249,7 +253,7 @@ def recalculate_task_stats(db_path):
     """重新计算所有task的统计数据"""
     print("\n🔧 重新计算task统计...")
     
-    conn = sqlite3.connect(db_path)
+    conn = db_trace.connect(db_path)
     cur = conn.cursor()
     
     try:
@@ -320,7 +324,8 @@ def main():
     
     # 恢复备份
     print(f"\n🔄 恢复备份数据库...")
-    shutil.copy2(backup_db, target_db)
+    # 通过backup API写入目标库，避免残留的 -wal 文件与新文件不匹配
+    online_backup(backup_db, target_db)
     print(f"   ✓ 恢复到: {target_db}")
     
     # 检查恢复后的数据库
@@ -357,7 +362,7 @@ def main():
     
     # 显示统计
     print(f"\n📊 数据库统计:")
-    conn = sqlite3.connect(target_db)
+    conn = db_trace.connect(target_db)
     cur = conn.cursor()
     
     cur.execute("SELECT COUNT(*) FROM tasks")
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+慢查询日志汇总（读取 app/db_trace.py 写出的 logs/slow_queries.jsonl）
+
+- 按总耗时排序的语句（来自各进程定期写出的 stats 增量记录，含未超阈值的调用）
+- 按等待时间排序的语句（busy_timeout 等锁，定位“谁在写、谁在等”）
+- 最近的慢语句明细（调用方、耗时、等待、参数形状）
+
+开启记录：启动评测页面/监控/导出前设置 AIV_SQL_TRACE=1（阈值见 AIV_SLOW_MS / AIV_BUSY_MS）
+
+用法：
+    python tools/slow_query_report.py
+    python tools/slow_query_report.py --since-hours 2 --top 10
+    python tools/slow_query_report.py --source monitor_compare
+"""
+
+import argparse
+import io
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+if sys.platform == 'win32' and (sys.stdout.encoding or '').lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+# 项目根目录
+PROJECT_ROOT = Path(__file__).parent.parent
+
+DEFAULT_LOG = PROJECT_ROOT / "logs" / "slow_queries.jsonl"
+
+
+def load_records(path, since=None, source=None):
+    stats, slow = [], []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                # 进程被强杀时可能留下半行
+                continue
+            if since is not None and rec.get('ts', 0) < since:
+                continue
+            if source and rec.get('source') != source:
+                continue
+            (stats if rec.get('type') == 'stats' else slow).append(rec)
+    return stats, slow
+
+
+def aggregate(stats):
+    """合并各进程、各时段的增量：(source, sql) -> 汇总"""
+    agg = {}
+    for rec in stats:
+        for s in rec['statements']:
+            key = (rec['source'], s['sql'])
+            a = agg.get(key)
+            if a is None:
+                a = agg[key] = {'source': rec['source'], 'sql': s['sql'], 'shape': None,
+                                'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'wait_ms': 0.0, 'slow': 0}
+            a['calls'] += s['calls']
+            a['total_ms'] += s['total_ms']
+            a['max_ms'] = max(a['max_ms'], s['max_ms'])
+            a['wait_ms'] += s['wait_ms']
+            a['slow'] += s['slow']
+            a['shape'] = s.get('shape') or a['shape']
+    return list(agg.values())
+
+
+def _short(sql, width=90):
+    return sql if len(sql) <= width else sql[:width - 3] + '...'
+
+
+def print_top(rows, key, title, top):
+    rows = sorted((r for r in rows if r[key] > 0), key=lambda r: -r[key])[:top]
+    print(f"\n{title}")
+    print("-" * 70)
+    if not rows:
+        print("  （无）")
+        return
+    print(f"  {'总耗时ms':>10} {'次数':>7} {'平均ms':>8} {'最大ms':>8} {'等待ms':>9} {'慢':>4}  调用方 / SQL")
+    for r in rows:
+        avg = r['total_ms'] / r['calls'] if r['calls'] else 0.0
+        print(f"  {r['total_ms']:>10.1f} {r['calls']:>7} {avg:>8.2f} {r['max_ms']:>8.1f} "
+              f"{r['wait_ms']:>9.1f} {r['slow']:>4}  [{r['source']}] {_short(r['sql'])}")
+
+
+def print_recent(slow, top):
+    print(f"\n最近的慢语句（共 {len(slow)} 条）")
+    print("-" * 70)
+    for rec in slow[-top:]:
+        ts = datetime.fromtimestamp(rec['ts']).strftime('%m-%d %H:%M:%S')
+        err = f"  ❌ {rec['error']}" if rec.get('error') else ''
+        print(f"  {ts} [{rec['source']}] {rec['ms']:.1f}ms（等待 {rec['wait_ms']:.1f}ms） "
+              f"{rec.get('shape') or ''}{err}")
+        print(f"      {_short(rec['sql'], 110)}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description='慢查询日志汇总')
+    ap.add_argument('--log', default=str(DEFAULT_LOG), help='慢查询日志（JSON Lines）')
+    ap.add_argument('--since-hours', type=float, default=None, help='只看最近若干小时')
+    ap.add_argument('--source', default=None, help='只看某个调用方（如 scoring_app、monitor）')
+    ap.add_argument('--top', type=int, default=15, help='每个列表显示的条数')
+    args = ap.parse_args()
+
+    log = Path(args.log)
+    if not log.exists():
+        print(f"[ERROR] 日志不存在: {log}（启动服务前设置 AIV_SQL_TRACE=1）")
+        return 1
+
+    since = time.time() - args.since_hours * 3600 if args.since_hours else None
+    stats, slow = load_records(log, since, args.source)
+    rows = aggregate(stats)
+
+    print("=" * 70)
+    print(f"  慢查询汇总：{log}")
+    by_source = {}
+    for r in rows:
+        by_source[r['source']] = by_source.get(r['source'], 0.0) + r['total_ms']
+    for source, total in sorted(by_source.items(), key=lambda kv: -kv[1]):
+        print(f"  {source:<24} 总耗时 {total / 1000:>9.2f} s")
+    print("=" * 70)
+
+    print_top(rows, 'total_ms', f"按总耗时 Top {args.top}", args.top)
+    print_top(rows, 'wait_ms', f"按等待时间 Top {args.top}（busy_timeout 等锁）", args.top)
+    print_recent(slow, args.top)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
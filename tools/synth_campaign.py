@@ -0,0 +1,567 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成评测数据库生成器（用于基准测试）
+
+按照 db/schema.sql 和 db/schema_compare.sql 构建与线上规模成比例的合成数据库：
+- 1× ≈ 当前规模（打分模式约720个样本×4个模型、比较模式约600个样本×3组配对、10个评审员）
+- 评审进度通过“评审员按各自随机顺序轮流答题”模拟，完成任务的未评分配会像触发器一样被清理
+- 同一 (kind, scale, seed, schema) 组合的数据库会缓存在工作目录中，重复运行无需重建
+
+也可生成完整的测试床（视频/提示词文件树 + 两种模式的数据库，样本数/模型数/类别数可调）：
+    <root>/video/refvideo/<cat>/<cat>/<sample_id>.mp4
+    <root>/video/genvideo/<model>/<model>/<sample_id>.mp4   （打分模式）
+    <root>/video2/<model>/<model>/<sample_id>.mp4           （比较模式）
+    <root>/prompt/<cat>/<sample_id>.txt
+    <root>/aiv_eval_v4.db、<root>/aiv_compare_v1.db
+视频文件为最小的合法MP4（ftyp+moov，约150字节），或用 --sparse-mb 生成指定大小的稀疏文件（不占实际磁盘）
+
+用法：
+    python tools/synth_campaign.py --root bench_work/testbed_small --samples 2000
+    python tools/synth_campaign.py --root bench_work/testbed_100k --samples 100000 --models 8 --sparse-mb 8
+    python tools/synth_campaign.py --root bench_work/testbed_tree --samples 100000 --no-db
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import io
+import itertools
+import json
+import math
+import random
+import shutil
+import sqlite3
+import struct
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+if sys.platform == 'win32' and (sys.stdout.encoding or '').lower() != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+# 项目根目录
+PROJECT_ROOT = Path(__file__).parent.parent
+
+SCHEMA_FILE = PROJECT_ROOT / "db" / "schema.sql"
+SCHEMA_COMPARE_FILE = PROJECT_ROOT / "db" / "schema_compare.sql"
+
+CATEGORIES = [
+    'animals_and_ecology', 'architecture', 'commercial_marketing', 'food',
+    'industrial_activity', 'landscape', 'people_daily', 'sports_competition',
+    'transportation',
+]
+SCORING_MODELS = ['wan21', 'vidu', 'cogfun', 'cogvideo5b', 'videocrafter']
+COMPARE_MODELS = ['cogfun', 'cogvideo5b', 'jimeng', 'kling', 'sora2', 'videocrafter', 'vidu', 'wan21']
+
+# 1× 规模（与 data/prompts.csv、data/comparison_tasks.csv 的量级一致）
+SCORING_BASE = {'samples': 720, 'models_per_sample': 4, 'judges': 10}
+COMPARE_BASE = {'samples': 600, 'models_per_sample': 3, 'judges': 10}
+
+REQUIRED_RATINGS = 3
+VIDEO_BASE = "http://127.0.0.1:8010"
+START_TIME = datetime(2025, 11, 1, 9, 0, 0)
+
+_WORDS = (
+    "a the small large young old red green blue golden quiet busy person dog bird car "
+    "train boat crowd chef worker player ball field street river mountain building window "
+    "table light shadow camera slowly quickly moves walks runs turns looks holds opens "
+    "behind across through under near while then scene frame background foreground"
+).split()
+
+
+def _schema_sql(schema_file):
+    with open(schema_file, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _open_for_build(db_path, schema_file):
+    """创建空数据库并执行schema（构建期间关闭同步以加快写入）"""
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        p = Path(str(db_path) + suffix)
+        if p.exists():
+            p.unlink()
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=MEMORY")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executescript(_schema_sql(schema_file))
+    return conn
+
+
+def _finish_build(conn):
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.commit()
+    conn.close()
+
+
+def _prompt_text(rnd):
+    return ' '.join(rnd.choice(_WORDS) for _ in range(rnd.randint(45, 80))).capitalize() + '.'
+
+
+def _sample_ids(n, rnd, categories=CATEGORIES):
+    """生成形如 animals_and_ecology_001_single 的样本ID"""
+    samples = []
+    for i in range(n):
+        cat = categories[i % len(categories)]
+        idx = i // len(categories) + 1
+        kind = 'single' if rnd.random() < 0.45 else 'multi'
+        samples.append((f"{cat}_{idx:03d}_{kind}", cat))
+    return samples
+
+
+def _timestamp(step):
+    return (START_TIME + timedelta(seconds=7 * step)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def simulate_progress(n_tasks, judge_ids, rnd, progress=0.4, required=REQUIRED_RATINGS):
+    """模拟评审员按各自随机顺序答题
+
+    每个评审员拥有全部任务的随机顺序；评审员按不同速度轮流“提交”下一道
+    尚未完成的任务，直到总评测数达到 progress × 需要评测总数。
+
+    Returns:
+        (orders, raters)
+        orders: {judge_id: [task_index, ...]}（即display_order/position）
+        raters: [[(judge_id, step), ...] for each task]
+    """
+    orders = {}
+    for j in judge_ids:
+        order = list(range(n_tasks))
+        rnd.shuffle(order)
+        orders[j] = order
+
+    raters = [[] for _ in range(n_tasks)]
+    pointers = {j: 0 for j in judge_ids}
+    speeds = [rnd.uniform(0.5, 1.5) for _ in judge_ids]
+    active = list(judge_ids)
+    target = int(n_tasks * required * progress)
+
+    step = 0
+    while step < target and active:
+        j = rnd.choices(active, weights=[speeds[judge_ids.index(a)] for a in active])[0]
+        order = orders[j]
+        ptr = pointers[j]
+        while ptr < n_tasks and len(raters[order[ptr]]) >= required:
+            ptr += 1
+        if ptr >= n_tasks:
+            active.remove(j)
+            continue
+        raters[order[ptr]].append((j, step))
+        pointers[j] = ptr + 1
+        step += 1
+
+    return orders, raters
+
+
+def build_scoring_db(db_path, scale=1.0, seed=42, progress=0.4, judges=None, schema_file=SCHEMA_FILE,
+                     samples=None, models=None):
+    """构建打分模式（db/schema.sql）的合成数据库
+
+    samples / models 用于测试床：指定样本列表 [(sample_id, category), ...] 与模型列表，
+    此时忽略 scale；不指定时按 scale 生成（与缓存库结果一致）。
+    """
+    rnd = random.Random(f"{seed}-scoring")
+    n_samples = max(1, int(round(SCORING_BASE['samples'] * scale)))
+    n_judges = judges or SCORING_BASE['judges']
+    models = models or SCORING_MODELS
+    per_sample = min(SCORING_BASE['models_per_sample'], len(models))
+
+    conn = _open_for_build(db_path, schema_file)
+    cur = conn.cursor()
+
+    judge_ids = list(range(1, n_judges + 1))
+    cur.executemany(
+        "INSERT INTO judges (id, name, token) VALUES (?, ?, ?)",
+        [(j, f"Judge-{j:02d}", f"tok-{seed}-{j:03d}") for j in judge_ids]
+    )
+
+    # 模型质量 / 评审员宽严偏差，用于生成有结构的评分
+    model_quality = {m: rnd.uniform(-0.8, 0.8) for m in models}
+    judge_bias = {j: rnd.gauss(0, 0.4) for j in judge_ids}
+
+    prompts = []
+    videos = []  # (video_id, prompt_id, variant_index, path, modelname, sample_id)
+    video_id = 0
+    for sample_id, _cat in (samples if samples is not None else _sample_ids(n_samples, rnd)):
+        prompts.append((sample_id, _prompt_text(rnd), f"{VIDEO_BASE}/ref/{sample_id}/ref.mp4", sample_id))
+        for variant, model in enumerate(rnd.sample(models, per_sample), 1):
+            video_id += 1
+            videos.append((video_id, sample_id, variant, f"{VIDEO_BASE}/gen/{sample_id}/{model}.mp4", model, sample_id))
+    cur.executemany("INSERT INTO prompts (id, text, ref_path, sample_id) VALUES (?, ?, ?, ?)", prompts)
+    cur.executemany(
+        "INSERT INTO videos (id, prompt_id, variant_index, path, modelname, sample_id) VALUES (?, ?, ?, ?, ?, ?)",
+        videos
+    )
+
+    # 任务 = 每个生成视频一个（task_id 与 video 顺序一致）
+    orders, raters = simulate_progress(len(videos), judge_ids, rnd, progress)
+
+    task_rows = []
+    for idx, (vid, pid, *_rest) in enumerate(videos):
+        n = len(raters[idx])
+        done = 1 if n >= REQUIRED_RATINGS else 0
+        completed_at = _timestamp(max(s for _, s in raters[idx])) if done else None
+        task_rows.append((idx + 1, pid, vid, REQUIRED_RATINGS, n, done, completed_at))
+    cur.executemany(
+        """INSERT INTO tasks (id, prompt_id, video_id, required_ratings, current_ratings, completed, completed_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        task_rows
+    )
+
+    def rating_rows():
+        for idx, (vid, pid, _variant, _path, model, sample_id) in enumerate(videos):
+            base = 3.2 + model_quality[model] + rnd.gauss(0, 0.3)
+            for j, step in raters[idx]:
+                ts = _timestamp(step)
+                scores = [min(5, max(1, int(round(base + judge_bias[j] + rnd.gauss(0, 0.7))))) for _ in range(4)]
+                yield (j, pid, vid, model, sample_id, *scores, ts, ts)
+
+    cur.executemany(
+        """INSERT INTO ratings (judge_id, prompt_id, video_id, modelname, sample_id,
+                                score_semantic, score_motion, score_temporal, score_realism,
+                                created_at, submitted_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        rating_rows()
+    )
+
+    # 分配：评审员评过的保留为finished=1；任务已完成且未参与的分配已被触发器清理
+    def assignment_rows():
+        for j in judge_ids:
+            for display_order, idx in enumerate(orders[j]):
+                steps = [s for rj, s in raters[idx] if rj == j]
+                if steps:
+                    yield (j, idx + 1, display_order, 1, _timestamp(steps[0]))
+                elif len(raters[idx]) < REQUIRED_RATINGS:
+                    yield (j, idx + 1, display_order, 0, None)
+
+    cur.executemany(
+        "INSERT INTO assignments (judge_id, task_id, display_order, finished, finished_at) VALUES (?, ?, ?, ?, ?)",
+        assignment_rows()
+    )
+
+    conn.commit()
+    _finish_build(conn)
+    return Path(db_path)
+
+
+def build_compare_db(db_path, scale=1.0, seed=42, progress=0.4, judges=None, schema_file=SCHEMA_COMPARE_FILE,
+                     samples=None, models=None):
+    """构建比较模式（db/schema_compare.sql）的合成数据库（samples / models 同 build_scoring_db）"""
+    rnd = random.Random(f"{seed}-compare")
+    n_samples = max(1, int(round(COMPARE_BASE['samples'] * scale)))
+    n_judges = judges or COMPARE_BASE['judges']
+    all_models = models or COMPARE_MODELS
+    per_sample = min(COMPARE_BASE['models_per_sample'], len(all_models))
+
+    conn = _open_for_build(db_path, schema_file)
+    cur = conn.cursor()
+
+    judge_ids = list(range(1, n_judges + 1))
+    cur.executemany(
+        "INSERT INTO judges (judge_id, uid, judge_name) VALUES (?, ?, ?)",
+        [(j, f"uid-{seed}-{j:03d}", f"Judge-{j:02d}") for j in judge_ids]
+    )
+
+    # Davidson模型的模型强度与平局参数，用于生成有结构的比较结果
+    strength = {m: math.exp(rnd.gauss(0, 0.6)) for m in all_models}
+    tie_nu = 0.3
+
+    prompts = []
+    videos = {}  # (sample_id, model) -> video_id
+    tasks = []  # (sample_id, model_a, model_b, video_a_id, video_b_id)
+    for sample_id, cat in (samples if samples is not None else _sample_ids(n_samples, rnd)):
+        ref = f"video/refvideo/{cat}/{cat}/{sample_id}.mp4"
+        prompts.append((sample_id, cat, _prompt_text(rnd), ref))
+        models = sorted(rnd.sample(all_models, per_sample))
+        for model in models:
+            videos[(sample_id, model)] = len(videos) + 1
+        for model_a, model_b in itertools.combinations(models, 2):
+            tasks.append((sample_id, model_a, model_b, videos[(sample_id, model_a)], videos[(sample_id, model_b)]))
+
+    cur.executemany(
+        "INSERT INTO prompts (sample_id, category, prompt_text, ref_video_path) VALUES (?, ?, ?, ?)",
+        prompts
+    )
+    cur.executemany(
+        "INSERT INTO videos (video_id, sample_id, model_name, video_path) VALUES (?, ?, ?, ?)",
+        [(vid, sid, m, f"video2/{m}/{sid}.mp4") for (sid, m), vid in videos.items()]
+    )
+
+    orders, raters = simulate_progress(len(tasks), judge_ids, rnd, progress)
+
+    cur.executemany(
+        """INSERT INTO tasks (task_id, sample_id, model_a, model_b, video_a_id, video_b_id, completed, current_ratings)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        [(idx + 1, *t, 1 if len(raters[idx]) >= REQUIRED_RATINGS else 0, len(raters[idx]))
+         for idx, t in enumerate(tasks)]
+    )
+
+    def comparison_rows():
+        for idx, (_sid, model_a, model_b, _va, _vb) in enumerate(tasks):
+            pa, pb = strength[model_a], strength[model_b]
+            tie = tie_nu * math.sqrt(pa * pb)
+            for j, step in raters[idx]:
+                r = rnd.random() * (pa + pb + tie)
+                chosen = model_a if r < pa else (model_b if r < pa + pb else 'tie')
+                yield (idx + 1, j, chosen, '', _timestamp(step))
+
+    cur.executemany(
+        "INSERT INTO comparisons (task_id, judge_id, chosen_model, comment, rating_time) VALUES (?, ?, ?, ?, ?)",
+        comparison_rows()
+    )
+
+    def assignment_rows():
+        for j in judge_ids:
+            for position, idx in enumerate(orders[j], start=1):
+                if any(rj == j for rj, _ in raters[idx]) or len(raters[idx]) < REQUIRED_RATINGS:
+                    yield (j, idx + 1, position)
+
+    cur.executemany("INSERT INTO assignments (judge_id, task_id, position) VALUES (?, ?, ?)", assignment_rows())
+
+    conn.commit()
+    _finish_build(conn)
+    return Path(db_path)
+
+
+BUILDERS = {
+    'scoring': (build_scoring_db, SCHEMA_FILE),
+    'compare': (build_compare_db, SCHEMA_COMPARE_FILE),
+}
+
+
+def _apply_layout(db_path, layout):
+    """用 scripts/migrate_assignments_compact.py 将assignments切换为指定布局"""
+    spec = importlib.util.spec_from_file_location(
+        'migrate_assignments_compact', PROJECT_ROOT / 'scripts' / 'migrate_assignments_compact.py')
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    conn = sqlite3.connect(db_path)
+    try:
+        migration.migrate(conn, layout)
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+def cached_db(kind, scale, work_dir, seed=42, progress=0.4, layout='rowid', judges=None):
+    """获取（必要时构建）指定规模的合成数据库
+
+    文件名包含schema内容的哈希，schema变化后会自动重建。
+    layout='compact' 时在默认库的副本上执行assignments紧凑布局迁移。
+    judges 指定评审员数量（默认10，并发压测时按最大并发数构建）。
+    """
+    builder, schema_file = BUILDERS[kind]
+    digest = hashlib.sha1(_schema_sql(schema_file).encode('utf-8')).hexdigest()[:8]
+    judge_tag = f"_j{judges}" if judges else ''
+    db_path = Path(work_dir) / f"{kind}_x{scale:g}_s{seed}_p{progress:g}{judge_tag}_{digest}.db"
+    if not db_path.exists():
+        tmp_path = db_path.with_suffix('.building')
+        builder(tmp_path, scale=scale, seed=seed, progress=progress, judges=judges)
+        tmp_path.replace(db_path)
+    if layout == 'rowid':
+        return db_path
+
+    layout_path = db_path.with_name(f"{db_path.stem}_{layout}.db")
+    if not layout_path.exists():
+        tmp_path = layout_path.with_suffix('.building')
+        shutil.copy2(db_path, tmp_path)
+        _apply_layout(tmp_path, layout)
+        tmp_path.replace(layout_path)
+    return layout_path
+
+
+# ========== 测试床（文件树 + 数据库） ==========
+
+REF_DIR = Path("video") / "refvideo"
+PROMPT_DIR = Path("prompt")
+GEN_DIRS = {'scoring': Path("video") / "genvideo", 'compare': Path("video2")}
+TESTBED_DB_NAMES = {'scoring': "aiv_eval_v4.db", 'compare': "aiv_compare_v1.db"}
+MAX_PER_CATEGORY = 999  # 样本编号固定三位（prepare_data.sample_category 按 \d{3} 解析）
+
+
+def _box(kind, payload):
+    return struct.pack('>I', 8 + len(payload)) + kind + payload
+
+
+# 最小的合法MP4：ftyp + moov(mvhd)，没有音视频轨道，能被 ffprobe / 浏览器识别为MP4容器
+_MVHD = _box(b'mvhd', bytes(4)                                   # version + flags
+             + struct.pack('>IIII', 0, 0, 1000, 0)                # 创建/修改时间、timescale、时长
+             + struct.pack('>IH', 0x00010000, 0x0100) + bytes(10)  # rate、volume、保留
+             + struct.pack('>9I', 0x00010000, 0, 0, 0, 0x00010000, 0, 0, 0, 0x40000000)
+             + bytes(24) + struct.pack('>I', 1))                  # pre_defined、next_track_ID
+MP4_STUB = _box(b'ftyp', b'isom' + struct.pack('>I', 512) + b'isomiso2mp41') + _box(b'moov', _MVHD)
+
+
+def synth_categories(n):
+    """前 len(CATEGORIES) 个为真实类别名，其余补 synthetic_category_XX"""
+    if n <= len(CATEGORIES):
+        return CATEGORIES[:n]
+    return CATEGORIES + [f"synthetic_category_{i:02d}" for i in range(len(CATEGORIES) + 1, n + 1)]
+
+
+def synth_models(n):
+    """前 len(COMPARE_MODELS) 个为真实模型名，其余补 modelXX"""
+    if n <= len(COMPARE_MODELS):
+        return COMPARE_MODELS[:n]
+    return COMPARE_MODELS + [f"model{i:02d}" for i in range(len(COMPARE_MODELS) + 1, n + 1)]
+
+
+def make_samples(n, categories, seed=42):
+    """两种模式共用的样本列表 [(sample_id, category), ...]"""
+    return _sample_ids(n, random.Random(f"{seed}-samples"), categories)
+
+
+def write_video_stub(path, size=0):
+    """写入MP4桩文件；size 大于桩长度时截断扩展为稀疏文件"""
+    with open(path, 'wb') as f:
+        f.write(MP4_STUB)
+        if size > len(MP4_STUB):
+            f.truncate(size)
+
+
+def write_tree(root, samples, gen_videos, prompt_texts, size=0):
+    """按线上目录结构写出视频/提示词文件树
+
+    Args:
+        samples: [(sample_id, category), ...]，每个样本一个参考视频和一个提示词文件
+        gen_videos: {相对生成视频目录: [(sample_id, model), ...]}
+        prompt_texts: {sample_id: 提示词}
+    Returns:
+        写出的文件数
+    """
+    root = Path(root)
+    made = set()
+
+    def ensure_dir(d):
+        if d not in made:
+            d.mkdir(parents=True, exist_ok=True)
+            made.add(d)
+
+    count = 0
+    for sample_id, cat in samples:
+        ref_dir = root / REF_DIR / cat / cat
+        ensure_dir(ref_dir)
+        write_video_stub(ref_dir / f"{sample_id}.mp4", size)
+        prompt_dir = root / PROMPT_DIR / cat
+        ensure_dir(prompt_dir)
+        (prompt_dir / f"{sample_id}.txt").write_text(prompt_texts.get(sample_id, sample_id), encoding='utf-8')
+        count += 2
+
+    for gen_dir, pairs in gen_videos.items():
+        for sample_id, model in pairs:
+            model_dir = root / gen_dir / model / model
+            ensure_dir(model_dir)
+            write_video_stub(model_dir / f"{sample_id}.mp4", size)
+            count += 1
+    return count
+
+
+def _db_contents(kind, db_path):
+    """读取测试床数据库中的 (sample_id, model) 列表与提示词"""
+    conn = sqlite3.connect(db_path)
+    try:
+        if kind == 'scoring':
+            pairs = conn.execute("SELECT sample_id, modelname FROM videos ORDER BY id").fetchall()
+            texts = dict(conn.execute("SELECT sample_id, text FROM prompts"))
+        else:
+            pairs = conn.execute("SELECT sample_id, model_name FROM videos ORDER BY video_id").fetchall()
+            texts = dict(conn.execute("SELECT sample_id, prompt_text FROM prompts"))
+    finally:
+        conn.close()
+    return pairs, texts
+
+
+def build_testbed(root, n_samples, n_models=len(COMPARE_MODELS), n_categories=None, seed=42, progress=0.4,
+                  judges=None, kinds=('scoring', 'compare'), size=0, with_db=True):
+    """生成可复现的测试床：文件树与数据库中的样本、模型一一对应
+
+    同一组参数再次运行时直接复用（以 testbed.json 记录参数）。
+    n_categories 默认取 max(9, ⌈样本数/999⌉)，保证样本编号保持三位。
+    """
+    root = Path(root)
+    if n_categories is None:
+        n_categories = max(len(CATEGORIES), math.ceil(n_samples / MAX_PER_CATEGORY))
+    params = {'samples': n_samples, 'models': n_models, 'categories': n_categories, 'seed': seed,
+              'progress': progress, 'judges': judges, 'kinds': sorted(kinds), 'size': size, 'with_db': with_db}
+    manifest = root / "testbed.json"
+    if manifest.exists():
+        with open(manifest, 'r', encoding='utf-8') as f:
+            if json.load(f).get('params') == params:
+                print(f"✓ 测试床已存在，直接复用: {root}")
+                return root
+        print("⚠️  参数与已有测试床不同，重新生成")
+    for sub in (REF_DIR, PROMPT_DIR, *GEN_DIRS.values()):
+        if (root / sub).exists():
+            shutil.rmtree(root / sub)
+
+    if n_samples > n_categories * MAX_PER_CATEGORY:
+        print(f"⚠️  每个类别超过 {MAX_PER_CATEGORY} 个样本，编号将超过三位，prepare_data 无法解析其类别")
+
+    categories = synth_categories(n_categories)
+    models = synth_models(n_models)
+    samples = make_samples(n_samples, categories, seed)
+    print(f"样本 {n_samples}，模型 {len(models)}，类别 {len(categories)}，seed={seed}")
+
+    gen_videos, prompt_texts = {}, {}
+    for kind in kinds:
+        gen_dir = GEN_DIRS[kind]
+        if with_db:
+            t0 = time.perf_counter()
+            builder, _schema = BUILDERS[kind]
+            db_path = root / TESTBED_DB_NAMES[kind]
+            tmp_path = db_path.with_suffix('.building')
+            builder(tmp_path, seed=seed, progress=progress, judges=judges, samples=samples, models=models)
+            tmp_path.replace(db_path)
+            pairs, texts = _db_contents(kind, db_path)
+            print(f"  ✓ {db_path.name}: {len(pairs)} 个生成视频（{time.perf_counter() - t0:.1f}s）")
+        else:
+            # 只要文件树时按与数据库相同的每样本模型数随机抽取
+            rnd = random.Random(f"{seed}-{kind}-tree")
+            per_sample = min((SCORING_BASE if kind == 'scoring' else COMPARE_BASE)['models_per_sample'], len(models))
+            pairs = [(sid, m) for sid, _cat in samples for m in rnd.sample(models, per_sample)]
+            texts = {}
+        gen_videos[gen_dir] = pairs
+        for sid, text in texts.items():
+            prompt_texts.setdefault(sid, text)
+
+    if not prompt_texts:
+        rnd = random.Random(f"{seed}-prompts")
+        prompt_texts = {sid: _prompt_text(rnd) for sid, _cat in samples}
+
+    t0 = time.perf_counter()
+    count = write_tree(root, samples, gen_videos, prompt_texts, size)
+    print(f"  ✓ 文件树: {count} 个文件（{time.perf_counter() - t0:.1f}s）")
+
+    with open(manifest, 'w', encoding='utf-8') as f:
+        json.dump({'params': params, 'created_at': datetime.now().isoformat(timespec='seconds'),
+                   'models': models, 'categories': categories}, f, ensure_ascii=False, indent=2)
+    return root
+
+
+def main():
+    ap = argparse.ArgumentParser(description='生成合成测试床（视频/提示词文件树 + 数据库）')
+    ap.add_argument('--root', required=True, help='测试床目录')
+    ap.add_argument('--samples', type=int, default=SCORING_BASE['samples'], help='样本数')
+    ap.add_argument('--models', type=int, default=len(COMPARE_MODELS), help='模型数')
+    ap.add_argument('--categories', type=int, default=None, help='类别数（默认按样本数保证编号三位）')
+    ap.add_argument('--kinds', nargs='+', choices=list(BUILDERS), default=list(BUILDERS), help='生成哪些模式')
+    ap.add_argument('--seed', type=int, default=42)
+    ap.add_argument('--progress', type=float, default=0.4, help='评测进度（0~1）')
+    ap.add_argument('--judges', type=int, default=None, help='评审员数量（默认10）')
+    ap.add_argument('--sparse-mb', type=float, default=0, help='视频文件扩展为指定大小的稀疏文件（MB）')
+    ap.add_argument('--no-db', action='store_true', help='只生成文件树')
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    build_testbed(args.root, args.samples, n_models=args.models, n_categories=args.categories, seed=args.seed,
+                  progress=args.progress, judges=args.judges, kinds=args.kinds,
+                  size=int(args.sparse_mb * 1024 * 1024), with_db=not args.no_db)
+    print(f"✅ 完成: {args.root}（{time.perf_counter() - t0:.1f}s）")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,19 +2,25 @@
 # -*- coding: utf-8 -*-
 """验证备份完整性"""
 import sys
-import sqlite3
+from pathlib import Path
 
-if sys.platform == 'win32':
+sys.path.insert(0, str(Path(__file__).parent.parent / 'app'))
+import db_trace  # noqa: E402
+
+if sys.platform == 'win32' and (sys.stdout.encoding or '').lower() != 'utf-8':
     import io
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
-def verify_backup(db_path):
-    """验证备份数据库"""
+def verify_backup(db_path, allow_empty_ratings=False):
+    """验证备份数据库
+
+    allow_empty_ratings: 没有评分记录时只警告不判失败（在线备份服务使用：评测开始前的备份也是有效备份）
+    """
     print(f"\n验证备份：{db_path}")
     print("="*80)
     
     try:
-        conn = sqlite3.connect(db_path)
+        conn = db_trace.connect(db_path)
         cur = conn.cursor()
         
         # 1. 检查表
@@ -58,8 +64,10 @@ def verify_backup(db_path):
         print(f"   - Assignments: {assignments_count}")
         
         if ratings_count == 0:
-            print("   ❌ 没有评分记录")
-            return False
+            if not allow_empty_ratings:
+                print("   ❌ 没有评分记录")
+                return False
+            print("   ⚠️  没有评分记录（评测尚未开始）")
         
         # 3. 检查UNIQUE约束
         print("\n3. 检查UNIQUE约束...")
@@ -134,8 +142,88 @@ def verify_backup(db_path):
         traceback.print_exc()
         return False
 
+def verify_compare_backup(db_path):
+    """验证比较模式备份数据库（db/schema_compare.sql）"""
+    print(f"\n验证备份（比较模式）：{db_path}")
+    print("="*80)
+    
+    try:
+        conn = db_trace.connect(db_path)
+        cur = conn.cursor()
+        
+        # 1. 检查表
+        print("\n1. 检查表结构...")
+        cur.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
+        tables = [row[0] for row in cur.fetchall()]
+        
+        required_tables = ['judges', 'prompts', 'videos', 'tasks', 'assignments', 'comparisons']
+        missing_tables = [t for t in required_tables if t not in tables]
+        
+        if missing_tables:
+            print(f"   ❌ 缺少表：{missing_tables}")
+            return False
+        else:
+            print(f"   ✅ 所有必需的表都存在：{required_tables}")
+        
+        # 2. 检查数据量
+        print("\n2. 检查数据量...")
+        for table in required_tables:
+            cur.execute(f"SELECT COUNT(*) FROM {table}")
+            print(f"   - {table}: {cur.fetchone()[0]}")
+        
+        cur.execute("SELECT COUNT(*) FROM judges")
+        if cur.fetchone()[0] == 0:
+            print("   ❌ 没有评审员记录")
+            return False
+        
+        # 3. 检查UNIQUE约束
+        print("\n3. 检查UNIQUE约束...")
+        cur.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='comparisons'")
+        comparisons_sql = cur.fetchone()[0]
+        
+        if "UNIQUE" in comparisons_sql and "task_id" in comparisons_sql and "judge_id" in comparisons_sql:
+            print("   ✅ comparisons表包含UNIQUE(task_id, judge_id)约束")
+        else:
+            print("   ❌ comparisons表缺少UNIQUE约束")
+            return False
+        
+        # 4. 检查触发器
+        print("\n4. 检查触发器...")
+        cur.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='trigger' AND tbl_name='comparisons'")
+        if cur.fetchone()[0] == 0:
+            print("   ⚠️  comparisons表没有触发器")
+        else:
+            print("   ✅ comparisons触发器存在")
+        
+        # 5. 检查数据一致性
+        print("\n5. 检查数据一致性...")
+        cur.execute("""
+            SELECT COUNT(*) FROM tasks t
+            WHERE t.current_ratings != (
+                SELECT COUNT(*) FROM comparisons c WHERE c.task_id = t.task_id
+            )
+        """)
+        inconsistent_tasks = cur.fetchone()[0]
+        
+        if inconsistent_tasks > 0:
+            print(f"   ⚠️  有 {inconsistent_tasks} 个tasks的current_ratings不一致")
+        else:
+            print(f"   ✅ 所有tasks的current_ratings一致")
+        
+        conn.close()
+        
+        print("\n" + "="*80)
+        print("✅ 备份验证通过！备份可以安全使用。")
+        return True
+        
+    except Exception as e:
+        print(f"\n❌ 验证失败：{e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
 def main():
-    backup_path = "backup/aiv_eval_v4_v2_clean_restored_20251101.db"
+    backup_path = sys.argv[1] if len(sys.argv) > 1 else "backup/aiv_eval_v4_v2_clean_restored_20251101.db"
     
     print("="*80)
     print("  备份完整性验证")